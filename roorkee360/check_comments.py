@@ -201,6 +201,43 @@ def check_settings():
         else:
             print(f"❌ {mw} - MISSING!")
 
+def check_query_plans(article):
+    """Check the comment query of the article page uses its index"""
+    print_header("6. Checking Query Plans")
+    
+    if not article:
+        print("❌ No article available for testing")
+        return False
+    
+    try:
+        from django.db import connection
+        
+        if connection.vendor != 'sqlite':
+            print(f"⚠️  Skipped: EXPLAIN QUERY PLAN needs SQLite (using {connection.vendor})")
+            return True
+        
+        # Same query as article_detail_view
+        comments = article.comments.filter(is_approved=True).order_by('-created_at')
+        sql, params = comments.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        
+        for detail in plan:
+            print(f"   {detail}")
+        
+        if any('news_comment_approved_idx' in detail for detail in plan):
+            print("✅ Approved comments are read from news_comment_approved_idx")
+            return True
+        
+        print("❌ Comment query does not use news_comment_approved_idx")
+        print("   Run: python manage.py migrate")
+        print("   Full report: python manage.py diagnose_queries")
+        return False
+    except Exception as e:
+        print(f"❌ Error checking query plans: {e}")
+        return False
+
 def run_all_checks():
     """Run all diagnostic checks"""
     print("\n" + "="*60)
@@ -215,6 +252,7 @@ def run_all_checks():
     
     check_urls()
     check_settings()
+    check_query_plans(article)
     
     print_header("SUMMARY")
     
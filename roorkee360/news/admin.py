@@ -1,7 +1,12 @@
 # admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.urls import reverse
 from django.utils.html import format_html
-from .models import Category, Tag, NewsArticle, ArticleImage, Comment, NewsletterSubscriber
+from .models import (
+    Category, Tag, NewsArticle, ArticleImage, Comment, NewsletterSubscriber,
+    TrafficStat, SearchQueryStat, ArchivedArticle, StorePromotion, MediaBlob, ArticleSignature,
+)
+from . import tag_stats, live
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -17,23 +22,58 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'article_count']
+    list_select_related = ['stat']
     search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
+    actions = ['merge_tags']
     
     def article_count(self, obj):
-        return obj.articles.count()
-    article_count.short_description = 'Articles'
+        # Read from the denormalised TagStat row instead of counting per row
+        stat = getattr(obj, 'stat', None)
+        return stat.published_count if stat else 0
+    article_count.short_description = 'Published Articles'
+    article_count.admin_order_field = 'stat__published_count'
+    
+    def merge_tags(self, request, queryset):
+        tags = sorted(queryset.select_related('stat'), key=lambda t: -self.article_count(t))
+        if len(tags) < 2:
+            self.message_user(request, 'Select at least two tags to merge.', level=messages.WARNING)
+            return
+        target = tags[0]
+        moved = sum(tag_stats.merge_tags(source, target) for source in tags[1:])
+        self.message_user(request, f'Merged {len(tags) - 1} tags into "{target.name}" ({moved} articles moved).')
+    merge_tags.short_description = "Merge selected tags into the most used one"
 
 class ArticleImageInline(admin.TabularInline):
     model = ArticleImage
     extra = 0
     fields = ['image', 'caption', 'order']
 
+class NearDuplicateFilter(admin.SimpleListFilter):
+    title = 'near duplicate'
+    parameter_name = 'near_duplicate'
+    
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(signature__duplicate_of__isnull=False)
+        if self.value() == 'no':
+            return queryset.exclude(signature__duplicate_of__isnull=False)
+        return queryset
+
+def near_duplicate_link(signature):
+    original = signature.duplicate_of
+    url = reverse('admin:news_newsarticle_change', args=[original.pk])
+    return format_html('≈ <a href="{}">{}</a> ({}%)', url, original.title, round(signature.similarity * 100))
+
 @admin.register(NewsArticle)
 class NewsArticleAdmin(admin.ModelAdmin):
     list_display = ['title', 'category', 'author', 'status', 'priority', 'is_featured', 
-                   'views_count', 'published_at', 'created_at']
-    list_filter = ['status', 'category', 'is_featured', 'is_breaking', 'priority', 'created_at']
+                   'views_count', 'published_at', 'created_at', 'near_duplicate']
+    list_filter = ['status', 'category', 'is_featured', 'is_breaking', 'priority', 'created_at',
+                   NearDuplicateFilter]
     search_fields = ['title', 'content', 'author__username']
     prepopulated_fields = {'slug': ('title',)}
     filter_horizontal = ['tags']
@@ -59,7 +99,24 @@ class NewsArticleAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('category', 'author')
+        return super().get_queryset(request).select_related('category', 'author', 'signature__duplicate_of')
+    
+    def near_duplicate(self, obj):
+        # Flagged when the article was saved (news/near_duplicates.py)
+        signature = getattr(obj, 'signature', None)
+        if signature is None or signature.duplicate_of is None:
+            return ''
+        return near_duplicate_link(signature)
+    near_duplicate.short_description = 'Near duplicate of'
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        if request.method == 'GET':
+            signature = (ArticleSignature.objects.select_related('duplicate_of')
+                         .filter(article_id=object_id, duplicate_of__isnull=False).first())
+            if signature:
+                self.message_user(request, format_html('This article looks like a near duplicate of {}',
+                                                       near_duplicate_link(signature)), level=messages.WARNING)
+        return super().change_view(request, object_id, form_url, extra_context)
 
 
 @admin.register(Comment)
@@ -70,7 +127,11 @@ class CommentAdmin(admin.ModelAdmin):
     actions = ['approve_comments', 'reject_comments']
     
     def approve_comments(self, request, queryset):
+        # update() sends no signals, so push the newly approved ones to live readers here
+        newly_approved = list(queryset.filter(is_approved=False))
         updated = queryset.update(is_approved=True)
+        for comment in newly_approved:
+            live.comment_approved(comment)
         self.message_user(request, f'{updated} comments approved successfully.')
     approve_comments.short_description = "Approve selected comments"
     
@@ -85,3 +146,58 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
     list_display = ['email', 'is_active', 'subscribed_at']
     list_filter = ['is_active', 'subscribed_at']
     search_fields = ['email']
+
+
+@admin.register(StorePromotion)
+class StorePromotionAdmin(admin.ModelAdmin):
+    list_display = ['title', 'store_name', 'location', 'weight', 'valid_from', 'valid_until', 'is_active', 'impressions']
+    list_filter = ['is_active', 'categories', 'valid_from']
+    search_fields = ['store_name', 'title', 'location']
+    filter_horizontal = ['categories']
+    readonly_fields = ['impressions']
+
+
+@admin.register(ArchivedArticle)
+class ArchivedArticleAdmin(admin.ModelAdmin):
+    list_display = ['title', 'category', 'author', 'status', 'views_count', 'published_at', 'archived_at']
+    list_filter = ['status', 'category', 'archived_at']
+    search_fields = ['title', 'slug']
+    readonly_fields = ['archived_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('category', 'author')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TrafficStat)
+class TrafficStatAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'event', 'article_id', 'category_id', 'location', 'count']
+    list_filter = ['event', 'hour']
+    search_fields = ['location']
+    date_hierarchy = 'hour'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SearchQueryStat)
+class SearchQueryStatAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'query', 'count', 'zero_result_count']
+    list_filter = ['hour']
+    search_fields = ['query']
+    date_hierarchy = 'hour'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at']
+    search_fields = ['name', 'digest']
+    readonly_fields = ['name', 'digest', 'size', 'refcount', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,176 @@
+"""
+Append-only analytics event log.
+
+record() only appends a compact JSON line to an in-memory buffer; a
+background thread (or a full buffer) writes it out to the current segment
+file. Each process writes its own segments under ANALYTICS_DIR:
+
+    events-<YYYYmmddHH>-<pid>-<seq>.open    being written
+    events-<YYYYmmddHH>-<pid>-<seq>.jsonl   sealed, ready for aggregation
+
+Segments are sealed when the hour changes or they grow past
+ANALYTICS_SEGMENT_BYTES. `manage.py aggregate_analytics` rolls sealed
+segments into the TrafficStat / SearchQueryStat tables.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Event types
+VIEW = 'view'
+COMMENT = 'comment'
+SEARCH = 'search'
+ZERO_RESULT_SEARCH = 'search_zero'
+
+
+class EventLog:
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, buffer_size=512, flush_interval=2.0):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()  # the buffer
+        self._write_lock = threading.Lock()  # the segment file
+        self._buffer = []
+        self._file = None
+        self._segment = None
+        self._segment_hour = None
+        self._seq = 0
+        self._pid = os.getpid()
+        self._flusher = None
+
+    def record(self, event_type, **fields):
+        fields['t'] = event_type
+        fields['ts'] = int(time.time())
+        line = json.dumps(fields, separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.buffer_size
+        if full:
+            self.flush()
+        self._ensure_flusher()
+
+    def flush(self):
+        # record() only waits for the buffer swap, never for the disk
+        with self._write_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                lines, self._buffer = self._buffer, []
+            try:
+                self._write('\n'.join(lines) + '\n')
+            except OSError as e:
+                logger.error(f'Could not write analytics events: {e}')
+
+    def seal(self):
+        """Flush and close the current segment so it can be aggregated"""
+        self.flush()
+        with self._write_lock:
+            self._close_segment()
+
+    def _write(self, data):
+        hour = time.strftime('%Y%m%d%H', time.gmtime())
+        if (self._file is None or self._pid != os.getpid() or hour != self._segment_hour
+                or self._file.tell() >= self.segment_bytes):
+            self._close_segment()
+            self._open_segment(hour)
+        self._file.write(data)
+        self._file.flush()
+
+    def _open_segment(self, hour):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._seq += 1
+        self._segment_hour = hour
+        self._segment = self.directory / f'events-{hour}-{self._pid}-{self._seq}.open'
+        self._file = open(self._segment, 'a', encoding='utf-8')
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        # Only the process that opened a segment may seal it
+        if self._pid == os.getpid():
+            try:
+                os.replace(self._segment, self._segment.with_suffix('.jsonl'))
+            except FileNotFoundError:
+                pass  # already adopted by the aggregator as a stale segment
+        self._file = None
+        self._segment = None
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name='analytics-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _after_fork(self):
+        # The child must not write the parent's buffer or append to its segment
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._segment = None
+        self._flusher = None
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log():
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = EventLog(
+                    getattr(settings, 'ANALYTICS_DIR', Path(settings.BASE_DIR) / 'analytics'),
+                    segment_bytes=getattr(settings, 'ANALYTICS_SEGMENT_BYTES', 64 * 1024 * 1024),
+                    buffer_size=getattr(settings, 'ANALYTICS_BUFFER_SIZE', 512),
+                    flush_interval=getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 2.0),
+                )
+                atexit.register(_log.seal)
+                os.register_at_fork(after_in_child=_log._after_fork)
+    return _log
+
+
+@receiver(setting_changed)
+def _settings_changed(setting, **kwargs):
+    """Start a new log when ANALYTICS_DIR or the log sizes change (tests)"""
+    global _log
+    if setting.startswith('ANALYTICS_') and setting != 'ANALYTICS_ENABLED':
+        with _log_lock:
+            if _log is not None:
+                _log.seal()
+            _log = None
+
+
+def record(event_type, **fields):
+    """Append an analytics event; never raises into the request path"""
+    if not getattr(settings, 'ANALYTICS_ENABLED', True):
+        return
+    try:
+        get_event_log().record(event_type, **fields)
+    except Exception as e:
+        logger.error(f'Analytics event dropped: {e}')
+
+
+def record_article_event(event_type, article):
+    record(event_type, a=article.id, c=article.category_id, l=article.location)
@@ -0,0 +1,252 @@
+"""
+Read-only syndication API for published articles.
+
+    GET /api/articles/                  JSON page, keyset paginated by (updated_at, id)
+    GET /api/articles/export.ndjson     whole archive streamed as NDJSON
+    GET /api/promotions/                store promotions live now
+    GET /api/cache-stats/               this worker's cache counters (staff only)
+
+Both accept the same filters: category=<name>, tag=<slug>, location=<text>,
+since=<ISO datetime> (updated_at >= since) and fields=<comma separated list>.
+Partners sync incrementally by passing the newest updated_at they have seen
+as `since`, or by following `next_cursor`.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.db.models import Q
+
+from .models import NewsArticle, Category
+from . import promotions
+from .invalidation import bus
+from .object_cache import article_cache
+from .search_cache import search_cache
+
+
+# Public field name -> model fields needed to produce it
+API_FIELDS = {
+    'id': ['id'],
+    'title': ['title'],
+    'slug': ['slug'],
+    'subtitle': ['subtitle'],
+    'summary': ['summary'],
+    'content_html': ['content_html'],
+    'category': ['category__name'],
+    'tags': [],
+    'location': ['location'],
+    'author': ['author__username'],
+    'image': ['featured_image'],
+    'url': ['slug'],
+    'word_count': ['word_count'],
+    'reading_time': ['reading_time'],
+    'is_breaking': ['is_breaking'],
+    'is_featured': ['is_featured'],
+    'published_at': ['published_at'],
+    'updated_at': ['updated_at'],
+}
+DEFAULT_FIELDS = ['id', 'title', 'slug', 'summary', 'category', 'tags', 'location',
+                  'url', 'image', 'published_at', 'updated_at']
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+EXPORT_CHUNK_SIZE = 500
+
+
+class ApiError(Exception):
+    pass
+
+
+def parse_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def filtered_articles(request, fields):
+    """Published articles matching the request filters, loading only what `fields` needs"""
+    articles = NewsArticle.objects.filter(status='published')
+
+    if request.GET.get('category'):
+        articles = articles.filter(category__name=request.GET['category'])
+    if request.GET.get('tag'):
+        articles = articles.filter(tags__slug=request.GET['tag'])
+    if request.GET.get('location'):
+        articles = articles.filter(location__iexact=request.GET['location'])
+    if request.GET.get('since'):
+        since = parse_datetime(request.GET['since'])
+        if since is None:
+            raise ApiError("'since' must be an ISO 8601 datetime")
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
+        articles = articles.filter(updated_at__gte=since)
+
+    columns = {'id', 'updated_at'}
+    related = set()
+    for field in fields:
+        for column in API_FIELDS[field]:
+            columns.add(column)
+            if '__' in column:
+                related.add(column.split('__')[0])
+    articles = articles.select_related(*related).only(*columns)
+    if 'tags' in fields:
+        articles = articles.prefetch_related('tags')
+    return articles.order_by('updated_at', 'id')
+
+
+def serialize(article, fields, request):
+    data = {}
+    for field in fields:
+        if field == 'category':
+            data[field] = article.category.name
+        elif field == 'author':
+            data[field] = article.author.username
+        elif field == 'tags':
+            data[field] = [tag.slug for tag in article.tags.all()]
+        elif field == 'url':
+            data[field] = request.build_absolute_uri(article.get_absolute_url())
+        elif field == 'image':
+            data[field] = request.build_absolute_uri(article.featured_image.url) if article.featured_image else None
+        else:
+            data[field] = getattr(article, field)
+    return data
+
+
+def encode_cursor(article, field='updated_at'):
+    raw = f'{getattr(article, field).isoformat()}|{article.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        updated_at, pk = raw.rsplit('|', 1)
+        updated_at = parse_datetime(updated_at)
+        if updated_at is None:
+            raise ValueError
+        return updated_at, int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ApiError('Invalid cursor')
+
+
+def articles_api(request):
+    """One page of articles, ordered by (updated_at, id)"""
+    try:
+        fields = parse_fields(request)
+        articles = filtered_articles(request, fields)
+        if request.GET.get('cursor'):
+            updated_at, pk = decode_cursor(request.GET['cursor'])
+            articles = articles.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ApiError("'limit' must be an integer")
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Fetch one extra row to know whether another page exists
+    page = list(articles[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    return JsonResponse({
+        'results': [serialize(article, fields, request) for article in page],
+        'next_cursor': next_cursor,
+    })
+
+
+def articles_export(request):
+    """Stream every matching article as one JSON object per line"""
+    try:
+        fields = parse_fields(request)
+        articles = filtered_articles(request, fields)
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    def lines():
+        # iterator() keeps memory constant; tags are prefetched per chunk
+        for article in articles.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield json.dumps(serialize(article, fields, request), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="articles.ndjson"'
+    return response
+
+
+def serialize_promotion(promo, request):
+    return {
+        'id': promo.id,
+        'store_name': promo.store_name,
+        'title': promo.title,
+        'description': promo.description,
+        'image': request.build_absolute_uri(promo.image.url) if promo.image else None,
+        'discount_percentage': promo.discount_percentage,
+        'contact_info': promo.contact_info,
+        'valid_from': promo.valid_from,
+        'valid_until': promo.valid_until,
+        'weight': promo.weight,
+    }
+
+
+def promotions_api(request):
+    """
+    Promotions live now for ?category=<name>&location=<text>.
+
+    With ?pick=N, returns N weighted picks and counts them as impressions
+    (for widgets that display them); otherwise every live promotion.
+    Responses may be cached until the set of live promotions next changes.
+    """
+    category_id = None
+    if request.GET.get('category'):
+        category_id = Category.objects.filter(name=request.GET['category']).values_list('id', flat=True).first()
+        if category_id is None:
+            return JsonResponse({'error': 'Unknown category'}, status=400)
+    location = request.GET.get('location', '')
+
+    if request.GET.get('pick'):
+        try:
+            pick = min(max(int(request.GET['pick']), 1), 10)
+        except ValueError:
+            return JsonResponse({'error': "'pick' must be an integer"}, status=400)
+        live = promotions.choose(category_id, location, pick)
+    else:
+        live = promotions.promotion_index.live(category_id, location)
+
+    next_change = promotions.promotion_index.next_change()
+    response = JsonResponse({
+        'promotions': [serialize_promotion(promo, request) for promo in live],
+        'next_change': next_change,
+    })
+    if request.GET.get('pick'):
+        patch_cache_control(response, no_store=True)
+    else:
+        max_age = 300
+        if next_change:
+            max_age = max(0, min(max_age, int((next_change - timezone.now()).total_seconds())))
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def cache_stats_api(request):
+    """Cache hit counts and invalidation lag of the worker process that answers"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    response = JsonResponse({
+        'pid': os.getpid(),
+        'invalidation_bus': bus.stats(),
+        'article_cache': dict(article_cache.hits, local_size=len(article_cache.local)),
+        'search_cache': search_cache.stats(),
+    })
+    patch_cache_control(response, no_store=True)
+    return response
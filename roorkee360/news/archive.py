@@ -0,0 +1,116 @@
+"""
+Moving articles into the archive tables.
+
+archive_articles() copies articles with their tags, comments and extra
+images into ArchivedArticle / ArchivedComment / ArchivedArticleImage and
+deletes the originals, one batch per transaction. Image files stay where
+they are; the archived rows point at the same storage names (and hold their
+own references to content-addressed blobs).
+
+Archived rows keep their slugs, so /article/<slug>/ keeps showing the same
+article. A live article may reuse the slug of one archived earlier (that
+URL then showed the live one); when it is archived in turn it keeps the
+slug and the earlier archived row moves to "<slug>-<id>".
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    NewsArticle, ArticleImage, Comment,
+    ArchivedArticle, ArchivedArticleImage, ArchivedComment,
+)
+
+logger = logging.getLogger(__name__)
+
+# Archived articles readers may open (drafts moved for their age stay hidden)
+PUBLIC_STATUSES = ('published', 'archived')
+
+
+def _copy_values(source, target_model, **overrides):
+    """Field values shared by source and target_model, by attname"""
+    target_fields = {f.attname for f in target_model._meta.concrete_fields}
+    values = {
+        f.attname: getattr(source, f.attname)
+        for f in source._meta.concrete_fields
+        if f.attname in target_fields
+    }
+    values.update(overrides)
+    return target_model(**values)
+
+
+def archive_candidates(older_than_months=None, include_archived_status=True):
+    """Articles that should move to the archive"""
+    condition = Q(pk__in=[])
+    if include_archived_status:
+        condition |= Q(status='archived')
+    if older_than_months:
+        cutoff = timezone.now() - timedelta(days=30 * older_than_months)
+        condition |= Q(published_at__lt=cutoff) | Q(published_at__isnull=True, created_at__lt=cutoff)
+    return NewsArticle.objects.filter(condition)
+
+
+def archive_batch(ids):
+    """Archive the given article ids in one transaction; returns the number moved"""
+    with transaction.atomic():
+        articles = list(NewsArticle.objects.filter(id__in=ids).select_for_update())
+        if not articles:
+            return 0
+        ids = [article.id for article in articles]
+
+        copies = [_copy_values(article, ArchivedArticle) for article in articles]
+        # The URL belongs to the article that held it last (see the module docstring)
+        taken = ArchivedArticle.objects.filter(slug__in=[c.slug for c in copies]).values_list('id', 'slug')
+        for pk, slug in list(taken):
+            renamed = f'{slug[:250 - len(str(pk)) - 1]}-{pk}'
+            logger.warning(f'Archived article {pk} moved to "{renamed}": "{slug}" now belongs to a newer article')
+            ArchivedArticle.objects.filter(pk=pk).update(slug=renamed)
+        ArchivedArticle.objects.bulk_create(copies)
+
+        tag_links = NewsArticle.tags.through.objects.filter(newsarticle_id__in=ids)
+        ArchivedArticle.tags.through.objects.bulk_create([
+            ArchivedArticle.tags.through(archivedarticle_id=article_id, tag_id=tag_id)
+            for article_id, tag_id in tag_links.values_list('newsarticle_id', 'tag_id')
+        ])
+
+        ArchivedComment.objects.bulk_create([
+            _copy_values(comment, ArchivedComment)
+            for comment in Comment.objects.filter(article_id__in=ids).iterator(chunk_size=1000)
+        ], batch_size=1000)
+
+        images = list(ArticleImage.objects.filter(article_id__in=ids))
+        ArchivedArticleImage.objects.bulk_create([
+            _copy_values(image, ArchivedArticleImage) for image in images
+        ])
+
+        # The archived rows share the files; reference them before the
+        # originals' delete signals release theirs
+        storage = NewsArticle._meta.get_field('featured_image').storage
+        if hasattr(storage, 'retain'):
+            storage.retain([a.featured_image.name for a in articles if a.featured_image]
+                           + [image.image.name for image in images])
+
+        # Cascades to comments, images and tag links; fires post_delete for caches
+        NewsArticle.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+
+def archive_articles(queryset, batch_size=200):
+    """Archive every article in queryset in batches; returns the number moved"""
+    moved = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return moved
+        moved += archive_batch(ids)
+
+
+def search_archive(filters):
+    """Public archived articles matching a search Q object"""
+    return (ArchivedArticle.objects
+            .filter(filters, status__in=PUBLIC_STATUSES)
+            .select_related('category')
+            .order_by('-published_at', '-created_at'))
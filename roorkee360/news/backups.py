@@ -0,0 +1,228 @@
+"""
+Online backups of the SQLite database and MEDIA_ROOT.
+
+copy_database() copies a live database with SQLite's backup API, a few
+pages per step with a pause in between. The source is read inside one read
+transaction: in WAL mode writers carry on, and the copy is the database as
+of the start. Without it every commit by another connection makes SQLite
+restart the copy from the first page, so a throttled copy of a busy
+database never finishes. With the rollback journal (no `manage.py
+enable_wal`) that read transaction would block every writer for the whole
+copy, so such a database is copied in a single step instead.
+
+Media files are kept once per unique content in BACKUP_DIR/objects/<aa>/<sha256>.
+A backup copies only content that is not stored yet; unchanged files are
+recognised by size and modification time from the previous manifest, blobs
+(news/storage.py) by their name, so nothing else is read again.
+
+Each backup is BACKUP_DIR/<name>.tar.gz holding manifest.json (database
+checksum and migrations, media path -> sha256) and db.sqlite3, optionally
+with the media objects it needs, plus <name>.json, a copy of the manifest
+read by the next backup. `manage.py backup` writes them, `manage.py
+restore_backup` puts them back.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .storage import BLOB_DIR, CHUNK_SIZE, blob_digest, is_blob
+
+FORMAT = 1
+ARCHIVE_SUFFIX = '.tar.gz'
+MANIFEST = 'manifest.json'
+DATABASE = 'db.sqlite3'
+
+# Generated or temporary content under MEDIA_ROOT
+SKIP_DIRS = {'derivatives', f'{BLOB_DIR}/tmp'}
+
+logger = logging.getLogger(__name__)
+
+
+def backup_dir():
+    return Path(getattr(settings, 'BACKUP_DIR', Path(settings.BASE_DIR) / 'backups'))
+
+
+def object_name(digest):
+    return f'objects/{digest[:2]}/{digest}'
+
+
+def manifest_copy(archive):
+    """<name>.json beside <name>.tar.gz"""
+    return archive.with_name(archive.name[:-len(ARCHIVE_SUFFIX)] + '.json')
+
+
+# Database -----------------------------------------------------------------
+
+def copy_database(source_path, target, pages=256, sleep=0.005):
+    """Copy a live SQLite database into the target connection; returns the number of steps"""
+    source = sqlite3.connect(str(source_path), isolation_level=None)
+    steps = 0
+
+    def pause(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        time.sleep(sleep)
+
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+            # Pin one snapshot for the whole copy (see the module docstring)
+            source.execute('BEGIN')
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages, progress=pause)
+        else:
+            # Writers wait for one step, not for every pause; run `manage.py
+            # enable_wal` for throttled copies
+            if sleep:
+                logger.warning(f'{source_path} is not in WAL mode: copying it in one step')
+            sleep = 0
+            source.backup(target, pages=-1, progress=pause)
+    finally:
+        source.close()
+    return steps
+
+
+def describe_database(path):
+    """Integrity check result, size and latest applied migration per app of a database file"""
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        check = connection.execute('PRAGMA quick_check').fetchone()[0]
+        page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+        page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+        migrations = dict(connection.execute(
+            'SELECT app, max(name) FROM django_migrations GROUP BY app ORDER BY app'
+        ).fetchall())
+    finally:
+        connection.close()
+    return {'check': check, 'page_size': page_size, 'pages': page_count, 'migrations': migrations}
+
+
+# Media --------------------------------------------------------------------
+
+def media_files(root):
+    """Relative paths (with '/') of the files under root, without generated content"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative = Path(dirpath).relative_to(root).as_posix()
+        prefix = '' if relative == '.' else f'{relative}/'
+        dirnames[:] = sorted(d for d in dirnames if f'{prefix}{d}' not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            yield f'{prefix}{filename}'
+
+
+def store_object(path, store):
+    """Copy a file into the object store, hashing it on the way; returns its sha256"""
+    tmp_dir = store / 'tmp'
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp, open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+        target = store / object_name(digest.hexdigest())
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest.hexdigest()
+
+
+def snapshot_media(root, store, previous=None):
+    """
+    {path: {sha256, size, mtime_ns}} for every file under root, copying new
+    content into store; also returns {'files', 'copied', 'copied_bytes'}
+    """
+    previous = previous or {}
+    files = {}
+    stats = {'files': 0, 'copied': 0, 'copied_bytes': 0}
+    for name in media_files(root):
+        path = os.path.join(root, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue  # deleted while we walked
+        known = previous.get(name)
+        if is_blob(name):
+            digest = blob_digest(name)
+        elif known and (known['size'], known['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            digest = known['sha256']
+        else:
+            digest = None
+        if digest is None or not (store / object_name(digest)).exists():
+            try:
+                digest = store_object(path, store)
+            except FileNotFoundError:
+                continue
+            stats['copied'] += 1
+            stats['copied_bytes'] += st.st_size
+        files[name] = {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        stats['files'] += 1
+    return files, stats
+
+
+# Archives -----------------------------------------------------------------
+
+def write_archive(path, manifest, database_path, store=None):
+    """Write manifest, database and (with a store) the media objects to a .tar.gz atomically"""
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    try:
+        with tarfile.open(tmp_path, 'w:gz', compresslevel=6) as tar:
+            data = json.dumps(manifest, indent=1, sort_keys=True).encode()
+            info = tarfile.TarInfo(MANIFEST)
+            info.size, info.mtime = len(data), time.time()
+            tar.addfile(info, io.BytesIO(data))
+            tar.add(database_path, arcname=DATABASE)
+            if store is not None:
+                for digest in sorted({f['sha256'] for f in manifest['media'].values()}):
+                    tar.add(store / object_name(digest), arcname=object_name(digest))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    manifest_copy(path).write_text(json.dumps(manifest, sort_keys=True))
+
+
+def archives(directory):
+    """Backup archives in directory, oldest first"""
+    return sorted(Path(directory).glob(f'*{ARCHIVE_SUFFIX}'))
+
+
+def read_manifest(archive):
+    """Manifest of an archive, from its .json copy when present"""
+    if manifest_copy(archive).exists():
+        return json.loads(manifest_copy(archive).read_text())
+    with tarfile.open(archive, 'r:gz') as tar:
+        return json.load(tar.extractfile(MANIFEST))
+
+
+def prune(directory, keep):
+    """Delete all but the newest keep archives and unreferenced objects; returns (archives, objects) removed"""
+    directory = Path(directory)
+    existing = archives(directory)
+    removed = existing[:-keep] if keep > 0 else []
+    for archive in removed:
+        archive.unlink()
+        manifest_copy(archive).unlink(missing_ok=True)
+
+    referenced = set()
+    for archive in archives(directory):
+        referenced.update(f['sha256'] for f in read_manifest(archive)['media'].values())
+    objects = 0
+    store = directory / 'objects'
+    for path in store.glob('??/*') if store.exists() else ():
+        if path.name not in referenced:
+            path.unlink()
+            objects += 1
+    return len(removed), objects
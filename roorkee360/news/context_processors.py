@@ -1,6 +1,27 @@
+import time
+
+from django.conf import settings
+
 from .models import Category
+from . import invalidation
+
+# Active categories for the navigation, loaded once per process and dropped
+# when a category changes in any worker (news/invalidation.py)
+_active_categories = {'value': None, 'loaded_at': 0.0}
+
+
+def _drop_categories(ids=None):
+    _active_categories['value'] = None
+
+
+invalidation.bus.subscribe(invalidation.CATEGORY, _drop_categories)
+
 
 def categories(request):
+    ttl = getattr(settings, 'CATEGORIES_CACHE_TTL', 300)
+    if _active_categories['value'] is None or time.monotonic() - _active_categories['loaded_at'] > ttl:
+        _active_categories['value'] = list(Category.objects.filter(is_active=True))
+        _active_categories['loaded_at'] = time.monotonic()
     return {
-        'categories': Category.objects.filter(is_active=True)
-    }
\ No newline at end of file
+        'categories': _active_categories['value']
+    }
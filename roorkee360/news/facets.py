@@ -0,0 +1,184 @@
+"""
+Faceted filtering for search, category and location pages.
+
+Filters come from repeatable GET parameters (?category=..&tag=..&location=..
+&month=YYYY-MM); values of one facet are OR-ed, different facets AND-ed.
+Locations match case-insensitively, as on the location pages.
+
+Each facet is counted with every filter except its own, so the other values
+of an active facet still show what choosing them as well would add. Facets
+without a filter share one GROUP BY (category, location, month) pass and one
+pass over the tag link table; each active facet takes one more grouped query.
+"""
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import NewsArticle
+
+
+FACETS = [
+    ('category', 'Category'),
+    ('tag', 'Tag'),
+    ('location', 'Location'),
+    ('month', 'Month'),
+]
+MAX_VALUES_PER_FACET = 12
+
+
+def parse_filters(request, exclude=()):
+    """{facet: [values]} for the facet parameters present in the request"""
+    filters = {}
+    for name, _ in FACETS:
+        if name in exclude:
+            continue
+        values = [v for v in request.GET.getlist(name) if v]
+        if name == 'location':
+            values = [v.casefold() for v in values]
+        if values:
+            filters[name] = sorted(set(values))
+    return filters
+
+
+def _month_range(value):
+    try:
+        start = timezone.make_aware(datetime.strptime(value, '%Y-%m'))
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    except ValueError:
+        # Not a month, or one whose end is past year 9999
+        return None
+    return start, end
+
+
+def location_matches(values):
+    """Q for articles in any of the locations, ignoring case"""
+    condition = Q(pk__in=[])
+    for value in values:
+        condition |= Q(location__iexact=value)
+    return condition
+
+
+def apply_filters(queryset, filters):
+    if 'category' in filters:
+        queryset = queryset.filter(category__name__in=filters['category'])
+    if 'tag' in filters:
+        # Subquery instead of a join so articles with several matching tags appear once
+        tagged = NewsArticle.tags.through.objects.filter(tag__slug__in=filters['tag']).values('newsarticle_id')
+        queryset = queryset.filter(id__in=tagged)
+    if 'location' in filters:
+        queryset = queryset.filter(location_matches(filters['location']))
+    if 'month' in filters:
+        months = Q(pk__in=[])
+        for value in filters['month']:
+            bounds = _month_range(value)
+            if bounds:
+                months |= Q(published_at__gte=bounds[0], published_at__lt=bounds[1])
+        queryset = queryset.filter(months)
+    return queryset
+
+
+def _column_counts(queryset, names, counts, labels):
+    """Add the category, location and month facets in names from one GROUP BY"""
+    fields = []
+    if 'category' in names:
+        fields += ['category__name', 'category__display_name']
+    if 'location' in names:
+        fields.append('location')
+    month = {'month': TruncMonth('published_at')} if 'month' in names else {}
+    for row in queryset.order_by().values(*fields, **month).annotate(n=Count('id')):
+        if 'category' in names:
+            counts['category'][row['category__name']] += row['n']
+            labels['category'][row['category__name']] = row['category__display_name']
+        if row.get('location'):
+            key = row['location'].casefold()
+            counts['location'][key] += row['n']
+            labels['location'].setdefault(key, row['location'])
+        if row.get('month'):
+            key = row['month'].strftime('%Y-%m')
+            counts['month'][key] += row['n']
+            labels['month'][key] = row['month'].strftime('%b %Y')
+
+
+def _tag_counts(queryset, counts, labels):
+    rows = (NewsArticle.tags.through.objects
+            .filter(newsarticle_id__in=queryset.order_by().values('id'))
+            .values('tag__slug', 'tag__name')
+            .annotate(n=Count('newsarticle_id')))
+    for row in rows:
+        counts['tag'][row['tag__slug']] = row['n']
+        labels['tag'][row['tag__slug']] = row['tag__name']
+
+
+def facet_counts(queryset, filters=None):
+    """
+    {facet: Counter({value: count})} plus labels for queryset narrowed by
+    filters, each facet counted without its own filter
+    """
+    filters = filters or {}
+    counts = {name: Counter() for name, _ in FACETS}
+    labels = {name: {} for name, _ in FACETS}
+
+    shared = [name for name, _ in FACETS if name not in filters]
+    filtered = apply_filters(queryset, filters)
+    if set(shared) - {'tag'}:
+        _column_counts(filtered, shared, counts, labels)
+    if 'tag' in shared:
+        _tag_counts(filtered, counts, labels)
+
+    for name in filters:
+        others = apply_filters(queryset, {k: v for k, v in filters.items() if k != name})
+        if name == 'tag':
+            _tag_counts(others, counts, labels)
+        else:
+            _column_counts(others, [name], counts, labels)
+
+    return counts, labels
+
+
+def filter_querystring(filters, **extra):
+    """Query string for the given filters (plus extra params such as q)"""
+    params = [(k, v) for k, v in extra.items() if v]
+    params += [(name, value) for name, values in filters.items() for value in values]
+    return urlencode(params)
+
+
+def build_facets(queryset, filters, exclude=(), **extra):
+    """
+    Facet groups ready for news/_facets.html for queryset before the filters
+    are applied; each value links to its toggled filter set
+    """
+    counts, labels = facet_counts(queryset, filters)
+    return facet_groups(counts, labels, filters, exclude, **extra)
+
+
+def facet_groups(counts, labels, filters, exclude=(), **extra):
+    """Facet groups from facet_counts() output, e.g. kept by the search cache"""
+    groups = []
+    for name, label in FACETS:
+        if name in exclude or not counts[name]:
+            continue
+        if name == 'month':
+            ordered = sorted(counts[name].items(), reverse=True)
+        else:
+            ordered = counts[name].most_common()
+        values = []
+        for value, count in ordered[:MAX_VALUES_PER_FACET]:
+            active = value in filters.get(name, [])
+            toggled = {k: list(v) for k, v in filters.items()}
+            if active:
+                toggled[name] = [v for v in toggled[name] if v != value]
+            else:
+                toggled.setdefault(name, []).append(value)
+            values.append({
+                'value': value,
+                'label': labels[name].get(value, value),
+                'count': count,
+                'active': active,
+                'query': filter_querystring({k: v for k, v in toggled.items() if v}, **extra),
+            })
+        groups.append({'name': name, 'label': label, 'values': values})
+    return groups
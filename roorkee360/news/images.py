@@ -0,0 +1,109 @@
+"""
+On-demand image derivatives for responsive <img srcset> markup.
+
+Derivatives are generated the first time a width is requested and cached on
+disk under MEDIA_ROOT/derivatives/, keyed by the SHA-256 of the original file.
+Because the digest is part of the URL, a changed original gets new URLs and
+the derivatives can be served with immutable cache headers.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .storage import is_blob, blob_digest
+
+
+DERIVATIVE_WIDTHS = tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 480, 640, 960, 1200)))
+DERIVATIVE_DIR = 'derivatives'
+DERIVATIVE_QUALITY = 82
+
+# (name, mtime_ns, size) -> (digest, width, height); avoids re-hashing per render
+_source_info = {}
+_source_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def source_info(name):
+    """Return (digest, width, height) for a stored image, or None if missing"""
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (OSError, NotImplementedError, ValueError):
+        return None
+
+    key = (name, stat.st_mtime_ns, stat.st_size)
+    info = _source_info.get(key)
+    if info is None:
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+        except (OSError, Image.DecompressionBombError):
+            return None
+        # Blob names already carry the content hash (news/storage.py)
+        digest = blob_digest(name)[:32] if is_blob(name) else file_digest(path)
+        info = (digest, width, height)
+        with _source_lock:
+            # Drop stale entries for the same name
+            for stale in [k for k in _source_info if k[0] == name]:
+                del _source_info[stale]
+            _source_info[key] = info
+    return info
+
+
+def srcset_widths(original_width):
+    """
+    (derivative width, rendered width) pairs worth offering for an image.
+    Derivatives never upscale, so the largest one is capped at the original.
+    """
+    pairs = []
+    for width in DERIVATIVE_WIDTHS:
+        if width >= original_width:
+            pairs.append((width, original_width))
+            break
+        pairs.append((width, width))
+    return pairs
+
+
+def derivative_path(digest, width, name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in ('.jpg', '.jpeg', '.png', '.webp', '.gif'):
+        ext = '.jpg'
+    return os.path.join(settings.MEDIA_ROOT, DERIVATIVE_DIR, digest[:2], f'{digest}-{width}{ext}')
+
+
+def get_derivative(name, digest, width):
+    """Path of the cached derivative, generating it if needed; None if invalid"""
+    if width not in DERIVATIVE_WIDTHS:
+        return None
+    info = source_info(name)
+    if info is None or info[0] != digest:
+        return None
+
+    path = derivative_path(digest, width, name)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with Image.open(default_storage.path(name)) as img:
+        img.thumbnail((width, img.height), Image.Resampling.LANCZOS)
+        if img.mode not in ('RGB', 'L') and path.endswith(('.jpg', '.jpeg')):
+            img = img.convert('RGB')
+        # Write to a temp file first so concurrent requests never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=os.path.splitext(path)[1])
+        with os.fdopen(fd, 'wb') as tmp:
+            img.save(tmp, format=Image.registered_extensions()[os.path.splitext(path)[1]],
+                     optimize=True, quality=DERIVATIVE_QUALITY)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,305 @@
+"""
+Cross-process invalidation bus for in-process caches.
+
+Every worker keeps some state in memory (the article L1 cache, the category
+list, the promotion index). When one worker commits a change, the others
+learn about it through a small memory-mapped file shared by all processes on
+the host (INVALIDATION_BUS_PATH):
+
+    header   magic, epoch, sequence number, number of slots
+    slots    ring of (sequence, published at, topic, object id) entries
+
+Model signals publish (topic, object id) events; they are collected per
+thread and written once after the transaction commits, so saving an article
+and its tags is one or two entries, and a topic with many changed objects
+collapses to a single "everything" entry. Writers append under an flock and
+bump the sequence number last.
+
+InvalidationMiddleware polls at the start of every request: an unchanged
+sequence number is one 8-byte read from the mapping. New entries are grouped
+by topic and handed to the subscribed callbacks with the set of object ids
+(None: drop everything for that topic). A worker that fell more than a ring
+behind, or sees a new epoch (file recreated), drops everything. So a worker
+never serves a response that started after a commit it has not applied;
+the measured lag (commit to apply, mostly idle time between requests) is in
+bus.stats() and /api/cache-stats/.
+
+Live updates (news/live.py) travel the same way: LIVE_BREAKING and
+LIVE_COMMENT entries carry the article / comment id and are never collapsed,
+so every worker can push them to its own Server-Sent Events clients.
+
+The time-to-live of each cache stays as a fallback where the bus is not
+available (no fcntl, unwritable path, INVALIDATION_BUS_PATH = None).
+Workers on other hosts need a shared transport instead.
+"""
+import logging
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+try:
+    import fcntl
+except ImportError:  # Windows: caches fall back to their time-to-live
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ARTICLE = 1
+CATEGORY = 2
+TAG = 3
+COMMENT = 4
+PROMOTION = 5
+AUTHOR = 6
+LIVE_BREAKING = 7
+LIVE_COMMENT = 8
+TOPICS = {'article': ARTICLE, 'category': CATEGORY, 'tag': TAG, 'comment': COMMENT,
+          'promotion': PROMOTION, 'author': AUTHOR,
+          'live_breaking': LIVE_BREAKING, 'live_comment': LIVE_COMMENT}
+# Messages rather than invalidations: "everything" would lose them
+EXACT_TOPICS = {LIVE_BREAKING, LIVE_COMMENT}
+
+ALL = 0  # object id meaning "every object of the topic"
+
+MAGIC = b'R360BUS1'
+HEADER = struct.Struct('<8sQQI4x')  # magic, epoch, sequence, slots
+SEQUENCE_OFFSET = 16
+SEQUENCE = struct.Struct('<Q')
+ENTRY = struct.Struct('<QdH6xq')  # sequence, published at, topic, object id
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        self._pending = threading.local()
+        self._lock = threading.Lock()
+        self._map = None
+        self._fd = None
+        self._pid = None
+        self.configure()
+        self._stats = {'polls': 0, 'events': 0, 'published': 0, 'resets': 0,
+                       'lag_last_ms': 0.0, 'lag_max_ms': 0.0, 'lag_total_ms': 0.0}
+
+    def configure(self):
+        """Read the INVALIDATION_BUS_* settings; the file is mapped again on next use"""
+        with self._lock:
+            self._close()
+            self.path = getattr(settings, 'INVALIDATION_BUS_PATH', None)
+            self.slots = getattr(settings, 'INVALIDATION_BUS_SLOTS', 4096)
+            self.max_ids = getattr(settings, 'INVALIDATION_BUS_MAX_IDS', 64)
+            self._disabled = fcntl is None or not self.path
+            self._epoch = None
+            self._seen = 0
+
+    # Subscribing ----------------------------------------------------------
+
+    def subscribe(self, topic, handler):
+        """Call handler(ids) when objects of topic change in another process; ids None means all"""
+        self._handlers[topic].append(handler)
+
+    # Shared file ----------------------------------------------------------
+
+    def _size(self):
+        return HEADER.size + self.slots * ENTRY.size
+
+    def _open(self):
+        """Map the bus file, creating or resetting it if needed; False when unavailable"""
+        if self._disabled:
+            return False
+        if self._map is not None and self._pid == os.getpid():
+            return True
+        # A forked worker must not share the parent's descriptor: flock
+        # locks belong to the open file, so they would not exclude each other
+        self._close()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o660)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                magic, _, _, slots = self._read_header(fd)
+                if os.fstat(fd).st_size != self._size() or magic != MAGIC or slots != self.slots:
+                    # New file or another layout: start a new epoch
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self._size())
+                    os.pwrite(fd, HEADER.pack(MAGIC, secrets.randbits(63), 0, self.slots), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, self._size())
+            self._fd, self._pid = fd, os.getpid()
+            return True
+        except OSError as e:
+            logger.error(f'Invalidation bus disabled, caches rely on their TTL: {e}')
+            self._disabled = True
+            return False
+
+    def _read_header(self, fd):
+        data = os.pread(fd, HEADER.size, 0)
+        return HEADER.unpack(data) if len(data) == HEADER.size else (None, 0, 0, 0)
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._map = self._fd = None
+
+    def available(self):
+        """Whether events reach the other processes"""
+        return self._open()
+
+    # Publishing -----------------------------------------------------------
+
+    def publish(self, topic, object_id=ALL):
+        """Queue an event; it is written once the current transaction commits"""
+        if getattr(self._pending, 'muted', False):
+            return
+        pending = getattr(self._pending, 'events', None)
+        if pending is None:
+            pending = self._pending.events = defaultdict(set)
+        pending[topic].add(object_id or ALL)
+        # Every publish registers the flush; the first to run writes them all.
+        # Events of a rolled back transaction go out with the next commit,
+        # which only costs an unneeded invalidation.
+        transaction.on_commit(self.flush)
+
+    @contextmanager
+    def muted(self):
+        """Drop the events this thread publishes, e.g. while writing to a scratch database"""
+        previous = getattr(self._pending, 'muted', False)
+        self._pending.muted = True
+        try:
+            yield
+        finally:
+            self._pending.muted = previous
+
+    def flush(self):
+        """Write the queued events of this thread; returns the number of entries"""
+        pending = getattr(self._pending, 'events', None)
+        if not pending:
+            return 0
+        self._pending.events = None
+        entries = []
+        for topic, ids in pending.items():
+            if ALL in ids or (len(ids) > self.max_ids and topic not in EXACT_TOPICS):
+                entries.append((topic, ALL))
+            else:
+                entries.extend((topic, object_id) for object_id in sorted(ids))
+        if not self._open():
+            return 0
+
+        now = time.time()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                sequence = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+                for topic, object_id in entries:
+                    sequence += 1
+                    offset = HEADER.size + (sequence % self.slots) * ENTRY.size
+                    ENTRY.pack_into(self._map, offset, sequence, now, topic, object_id)
+                # Readers only look at entries up to the published sequence
+                SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._stats['published'] += len(entries)
+        return len(entries)
+
+    # Consuming ------------------------------------------------------------
+
+    def poll(self):
+        """Apply events published since the last poll; returns how many were applied"""
+        if not self._open():
+            return 0
+        with self._lock:
+            self._stats['polls'] += 1
+            _, epoch, sequence, _ = HEADER.unpack_from(self._map, 0)
+            if epoch != self._epoch:
+                first_poll = self._epoch is None
+                self._epoch, self._seen = epoch, sequence
+                if not first_poll:
+                    self._reset()
+                return 0
+            if sequence == self._seen:
+                return 0
+            if sequence < self._seen or sequence - self._seen > self.slots:
+                self._seen = sequence
+                self._reset()
+                return 0
+
+            changes = defaultdict(set)
+            now = time.time()
+            for expected in range(self._seen + 1, sequence + 1):
+                offset = HEADER.size + (expected % self.slots) * ENTRY.size
+                entry_sequence, published, topic, object_id = ENTRY.unpack_from(self._map, offset)
+                if entry_sequence != expected:
+                    # Overwritten while we read: a writer lapped us
+                    self._seen = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+                    self._reset()
+                    return 0
+                changes[topic].add(object_id)
+                self._record_lag(now - published)
+            applied, self._seen = sequence - self._seen, sequence
+
+        for topic, ids in changes.items():
+            self._dispatch(topic, None if ALL in ids else ids)
+        return applied
+
+    def _record_lag(self, seconds):
+        lag = max(0.0, seconds * 1000)
+        self._stats['events'] += 1
+        self._stats['lag_last_ms'] = lag
+        self._stats['lag_max_ms'] = max(self._stats['lag_max_ms'], lag)
+        self._stats['lag_total_ms'] += lag
+
+    def _reset(self):
+        self._stats['resets'] += 1
+        for topic in list(self._handlers):
+            self._dispatch(topic, None)
+
+    def _dispatch(self, topic, ids):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(ids)
+            except Exception:
+                logger.exception(f'Invalidation handler {handler!r} failed')
+
+    # Introspection --------------------------------------------------------
+
+    def state(self):
+        """(epoch, sequence, recent entries as (sequence, published at, topic name, id)) of the file"""
+        if not self._open():
+            return None
+        names = {number: name for name, number in TOPICS.items()}
+        _, epoch, sequence, _ = HEADER.unpack_from(self._map, 0)
+        entries = []
+        for number in range(max(1, sequence - self.slots + 1), sequence + 1):
+            entry = ENTRY.unpack_from(self._map, HEADER.size + (number % self.slots) * ENTRY.size)
+            if entry[0] == number:
+                entries.append((entry[0], entry[1], names.get(entry[2], entry[2]), entry[3]))
+        return epoch, sequence, entries
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['enabled'] = not self._disabled
+        stats['sequence_seen'] = self._seen
+        stats['lag_avg_ms'] = stats['lag_total_ms'] / stats['events'] if stats['events'] else 0.0
+        del stats['lag_total_ms']
+        return stats
+
+
+bus = InvalidationBus()
+
+
+@receiver(setting_changed)
+def _settings_changed(setting, **kwargs):
+    # Tests point the bus at a scratch file instead of the running site's
+    if setting.startswith('INVALIDATION_BUS_'):
+        bus.configure()
@@ -0,0 +1,247 @@
+"""
+Live updates over Server-Sent Events.
+
+    GET /live/                   breaking news changes (event: breaking)
+    GET /live/?article=<id>      plus newly approved comments on that article
+                                 (event: comment); add breaking=0 to skip breaking news
+
+Model signals announce changes on the invalidation bus (news/invalidation.py)
+when the transaction commits, so they reach the clients of every worker on
+the host, not just the one that handled the write. Each worker hands them to
+its in-process broker: a thread polls the bus every LIVE_BUS_POLL_SECONDS
+while clients are connected, and the event is built from the committed row.
+Without the bus they only reach the clients of the writing process.
+
+Each connected client owns a bounded asyncio queue;
+publishing formats the message once and hands it to every subscriber's
+event loop in one call, dropping a slow client's oldest message rather than
+growing without bound. Idle clients are a parked coroutine plus a comment
+line every LIVE_HEARTBEAT_SECONDS: there is no database polling.
+
+The stream needs the ASGI entry point (roorkee360/asgi.py, e.g.
+`uvicorn roorkee360.asgi:application`). Under WSGI it answers 204, which
+tells EventSource clients not to reconnect, so pages simply stay static.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import Comment, NewsArticle
+from . import invalidation
+
+logger = logging.getLogger(__name__)
+
+BREAKING = 'breaking'
+
+
+def comments_channel(article_id):
+    return f'article:{article_id}:comments'
+
+
+class Subscriber:
+    __slots__ = ('loop', 'queue', 'channels', 'dropped')
+
+    def __init__(self, loop, channels, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.channels = channels
+        self.dropped = 0
+
+    def deliver(self, message):
+        """Queue a message; runs on the subscriber's event loop"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+def _deliver_all(subscribers, message):
+    for subscriber in subscribers:
+        subscriber.deliver(message)
+
+
+class Broker:
+    def __init__(self):
+        self.queue_size = getattr(settings, 'LIVE_QUEUE_SIZE', 32)
+        self._channels = defaultdict(set)
+        self._subscribers = set()
+        self.poll_seconds = getattr(settings, 'LIVE_BUS_POLL_SECONDS', 0.5)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._poller = None
+
+    def subscribe(self, channels):
+        subscriber = Subscriber(asyncio.get_running_loop(), tuple(channels), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            for channel in subscriber.channels:
+                self._channels[channel].add(subscriber)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, name='live-bus-poller', daemon=True)
+                self._poller.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            for channel in subscriber.channels:
+                members = self._channels.get(channel)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del self._channels[channel]
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def _poll_loop(self):
+        # Other workers' writes arrive between this worker's requests too
+        while True:
+            time.sleep(self.poll_seconds)
+            if not self._subscribers:
+                continue
+            try:
+                if invalidation.bus.poll():
+                    connections.close_all()  # this thread's, used by the handlers
+            except Exception:
+                logger.exception('Polling the invalidation bus for live updates failed')
+
+    def publish(self, channel, event, data):
+        """Send an event to every subscriber of channel; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        if not subscribers:
+            return 0
+
+        payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        message = f'id: {next(self._ids)}\nevent: {event}\ndata: {payload}\n\n'.encode()
+
+        by_loop = defaultdict(list)
+        for subscriber in subscribers:
+            by_loop[subscriber.loop].append(subscriber)
+        for loop, group in by_loop.items():
+            try:
+                # One wake-up per event loop, however many clients it serves
+                loop.call_soon_threadsafe(_deliver_all, group, message)
+            except RuntimeError:
+                # The loop has shut down; its clients are gone
+                for subscriber in group:
+                    self.unsubscribe(subscriber)
+        return len(subscribers)
+
+
+broker = Broker()
+
+
+def breaking_changed(article):
+    """Announce that an article became (or stopped being) breaking news, once committed"""
+    if invalidation.bus.available():
+        invalidation.bus.publish(invalidation.LIVE_BREAKING, article.id)
+    else:
+        transaction.on_commit(lambda: publish_breaking(article))
+
+
+def comment_approved(comment):
+    """Announce a newly approved comment to readers of its article, once committed"""
+    if invalidation.bus.available():
+        invalidation.bus.publish(invalidation.LIVE_COMMENT, comment.id)
+    else:
+        transaction.on_commit(lambda: publish_comment(comment))
+
+
+def _breaking_from_bus(ids):
+    # None: the worker missed events; their clients keep what they have
+    if ids is None or not broker.has_subscribers(BREAKING):
+        return
+    for article in NewsArticle.objects.filter(pk__in=ids):
+        publish_breaking(article)
+
+
+def _comments_from_bus(ids):
+    if ids is None or not broker.subscriber_count():
+        return
+    for comment in Comment.objects.filter(pk__in=ids, is_approved=True):
+        publish_comment(comment)
+
+
+invalidation.bus.subscribe(invalidation.LIVE_BREAKING, _breaking_from_bus)
+invalidation.bus.subscribe(invalidation.LIVE_COMMENT, _comments_from_bus)
+
+
+def publish_breaking(article):
+    """Tell clients an article became (or stopped being) breaking news"""
+    broker.publish(BREAKING, 'breaking', {
+        'id': article.id,
+        'title': article.title,
+        'url': article.get_absolute_url(),
+        'is_breaking': article.is_breaking and article.status == 'published',
+    })
+
+
+def publish_comment(comment):
+    """Tell clients watching an article about a newly approved comment"""
+    broker.publish(comments_channel(comment.article_id), 'comment', {
+        'id': comment.id,
+        'article_id': comment.article_id,
+        'name': comment.name,
+        'content': comment.content,
+        'created_at': comment.created_at,
+    })
+
+
+async def live_stream(request):
+    """Server-Sent Events stream of breaking news and/or an article's comments"""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    channels = []
+    if request.GET.get('breaking', '1') != '0':
+        channels.append(BREAKING)
+    if request.GET.get('article'):
+        try:
+            channels.append(comments_channel(int(request.GET['article'])))
+        except ValueError:
+            return HttpResponse('Invalid article id', status=400)
+    if not channels:
+        return HttpResponse('Nothing to subscribe to', status=400)
+
+    max_clients = getattr(settings, 'LIVE_MAX_SUBSCRIBERS', 10000)
+    if broker.subscriber_count() >= max_clients:
+        response = HttpResponse('Too many live connections', status=503)
+        response['Retry-After'] = '60'
+        return response
+
+    heartbeat = getattr(settings, 'LIVE_HEARTBEAT_SECONDS', 25)
+    retry_ms = getattr(settings, 'LIVE_RETRY_MS', 5000)
+
+    async def events():
+        # Subscribe on the loop that consumes the stream
+        subscriber = broker.subscribe(channels)
+        try:
+            yield f'retry: {retry_ms}\n\n'.encode()
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing the idle connection
+                    yield b': ping\n\n'
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable nginx response buffering
+    return response
@@ -0,0 +1,116 @@
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from news import analytics
+from news.models import TrafficStat, SearchQueryStat, AnalyticsSegment
+
+
+class Command(BaseCommand):
+    help = "Roll analytics segment files up into hourly TrafficStat / SearchQueryStat rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-keys', type=int, default=50_000,
+                            help='Distinct keys held in memory before merging into the database')
+        parser.add_argument('--stale-after', type=int, default=3 * 3600,
+                            help='Also roll up unsealed segments untouched for this many seconds '
+                                 '(left behind by crashed workers)')
+        parser.add_argument('--keep', action='store_true', help='Keep segment files after rolling up')
+
+    def handle(self, *args, **options):
+        directory = Path(getattr(settings, 'ANALYTICS_DIR', Path(settings.BASE_DIR) / 'analytics'))
+        if not directory.exists():
+            self.stdout.write('No analytics directory yet, nothing to do.')
+            return
+
+        self.max_keys = options['max_keys']
+        cutoff = time.time() - options['stale_after']
+        segments = sorted(directory.glob('events-*.jsonl'))
+        segments += sorted(p for p in directory.glob('events-*.open') if p.stat().st_mtime < cutoff)
+        done = set(AnalyticsSegment.objects.filter(
+            name__in=[p.stem for p in segments]
+        ).values_list('name', flat=True))
+
+        total_events = 0
+        started = time.monotonic()
+        for path in segments:
+            if path.stem not in done:
+                with transaction.atomic():
+                    events = self.process_segment(path)
+                    AnalyticsSegment.objects.create(name=path.stem, events=events)
+                total_events += events
+                self.stdout.write(f'  {path.name}: {events} events')
+            if not options['keep']:
+                path.unlink(missing_ok=True)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rolled up {total_events} events from {len(segments)} segments in {elapsed:.2f}s'
+        ))
+
+    def process_segment(self, path):
+        """Stream one segment, merging counts into the database every max_keys keys"""
+        traffic = Counter()
+        searches = Counter()
+        events = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    hour = int(event['ts']) // 3600 * 3600
+                    kind = event['t']
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn write at the end of a crashed segment
+                events += 1
+
+                if kind in (analytics.SEARCH, analytics.ZERO_RESULT_SEARCH):
+                    query = ' '.join(str(event.get('q', '')).lower().split())[:200]
+                    searches[(hour, query, kind == analytics.ZERO_RESULT_SEARCH)] += 1
+                traffic[(hour, kind, event.get('a') or 0, event.get('c') or 0, (event.get('l') or '')[:100])] += 1
+
+                if len(traffic) + len(searches) >= self.max_keys:
+                    self.merge(traffic, searches)
+                    traffic.clear()
+                    searches.clear()
+        self.merge(traffic, searches)
+        return events
+
+    def merge(self, traffic, searches):
+        """Add counters to the rollup tables with INSERT ... ON CONFLICT DO UPDATE"""
+        def hour_value(hour):
+            return connection.ops.adapt_datetimefield_value(
+                datetime.fromtimestamp(hour, tz=dt_timezone.utc)
+            )
+
+        with connection.cursor() as cursor:
+            if traffic:
+                table = connection.ops.quote_name(TrafficStat._meta.db_table)
+                cursor.executemany(
+                    f'INSERT INTO {table} (hour, event, article_id, category_id, location, count) '
+                    f'VALUES (%s, %s, %s, %s, %s, %s) '
+                    f'ON CONFLICT (hour, event, article_id, category_id, location) '
+                    f'DO UPDATE SET count = {table}.count + excluded.count',
+                    [(hour_value(h), e, a, c, l, n) for (h, e, a, c, l), n in traffic.items()],
+                )
+            if searches:
+                per_query = Counter()
+                zero = Counter()
+                for (hour, query, is_zero), n in searches.items():
+                    per_query[(hour, query)] += n
+                    if is_zero:
+                        zero[(hour, query)] += n
+                table = connection.ops.quote_name(SearchQueryStat._meta.db_table)
+                cursor.executemany(
+                    f'INSERT INTO {table} (hour, query, count, zero_result_count) '
+                    f'VALUES (%s, %s, %s, %s) '
+                    f'ON CONFLICT (hour, query) DO UPDATE SET '
+                    f'count = {table}.count + excluded.count, '
+                    f'zero_result_count = {table}.zero_result_count + excluded.zero_result_count',
+                    [(hour_value(h), q, n, zero[(h, q)]) for (h, q), n in per_query.items()],
+                )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.archive import archive_candidates, archive_articles
+
+
+class Command(BaseCommand):
+    help = "Move archived and old articles (with comments and images) into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-months', type=int, default=None,
+                            help='Also archive articles published more than N months ago')
+        parser.add_argument('--skip-archived-status', action='store_true',
+                            help="Don't move articles just because their status is 'archived'")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the candidates')
+
+    def handle(self, *args, **options):
+        if options['skip_archived_status'] and not options['older_than_months']:
+            raise CommandError('Nothing to archive: pass --older-than-months.')
+
+        candidates = archive_candidates(
+            older_than_months=options['older_than_months'],
+            include_archived_status=not options['skip_archived_status'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} articles would be archived')
+            return
+
+        moved = archive_articles(candidates, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Archived {moved} articles'))
@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from news import backups
+from news.management.commands import loadtest
+from news.storage import hash_file
+
+
+def probe(ready, stop, results, plan, host):
+    """Replay plan against the in-process application until stop is set; sends back (finished at, latency)"""
+    loadtest.init_worker(None, host, False)
+    for spec in plan[:20]:
+        loadtest.run_one(spec)  # warm up connections and caches
+    ready.set()
+    samples = []
+    while not stop.is_set():
+        for spec in plan:
+            if stop.is_set():
+                break
+            latency = loadtest.run_one(spec)[2]
+            samples.append((time.monotonic(), latency))
+    results.put(samples)
+
+
+class Command(BaseCommand):
+    help = ("Back up the SQLite database and MEDIA_ROOT while the site keeps running: online backup API "
+            "in throttled steps, media copied once per unique content, compressed archive with a manifest")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Backup directory (default: BACKUP_DIR)')
+        parser.add_argument('--pages', type=int, default=256, help='Database pages copied per step')
+        parser.add_argument('--sleep', type=float, default=0.005,
+                            help='Seconds to pause between steps so requests are not slowed down')
+        parser.add_argument('--include-media', action='store_true',
+                            help='Put the media files in the archive too, so it restores on its own')
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Archives to keep; older ones and unreferenced media are removed '
+                                 '(default: BACKUP_KEEP, 0 keeps all)')
+        parser.add_argument('--nice', type=int, default=10,
+                            help='Lower this process\'s CPU priority by this much while compressing')
+        parser.add_argument('--measure', type=float, default=0, metavar='SECONDS',
+                            help='Measure request latency for SECONDS without a backup, then during it')
+
+    def handle(self, *args, **options):
+        database = connections.databases['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('backup only supports a SQLite database.')
+
+        directory = Path(options['output']) if options['output'] else backups.backup_dir()
+        (directory / 'tmp').mkdir(parents=True, exist_ok=True)
+        existing = backups.archives(directory)
+        previous = backups.read_manifest(existing[-1])['media'] if existing else {}
+        name = f"roorkee360-{timezone.now():%Y%m%d-%H%M%S}"
+
+        prober = self.start_probe(options['measure']) if options['measure'] else None
+        if options['nice'] and hasattr(os, 'nice'):
+            # Hashing and compressing must not take CPU time from the workers
+            os.nice(options['nice'])
+        started = time.monotonic()
+
+        # Media before and after the database copy: the snapshot then has
+        # every file it references, even if uploaded or released meanwhile
+        media, first = backups.snapshot_media(settings.MEDIA_ROOT, directory, previous)
+
+        db_started = time.monotonic()
+        db_path = directory / 'tmp' / f'{name}.sqlite3'
+        target = sqlite3.connect(str(db_path))
+        try:
+            steps = backups.copy_database(database['NAME'], target, pages=options['pages'], sleep=options['sleep'])
+            # A standalone file: no -wal/-shm needed next to it
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+        db_seconds = time.monotonic() - db_started
+        described = backups.describe_database(db_path)
+        if described['check'] != 'ok':
+            db_path.unlink()
+            raise CommandError(f"The copy failed the integrity check: {described['check']}")
+
+        after, second = backups.snapshot_media(settings.MEDIA_ROOT, directory, media)
+        media.update(after)
+
+        manifest = {
+            'format': backups.FORMAT,
+            'name': name,
+            'created_at': timezone.now().isoformat(),
+            'database': {
+                'sha256': hash_file(db_path),
+                'size': db_path.stat().st_size,
+                'page_size': described['page_size'],
+                'pages': described['pages'],
+                'migrations': described['migrations'],
+            },
+            'media': media,
+            'media_included': options['include_media'],
+        }
+        archive = directory / f'{name}{backups.ARCHIVE_SUFFIX}'
+        try:
+            backups.write_archive(archive, manifest, db_path, directory if options['include_media'] else None)
+        finally:
+            db_path.unlink(missing_ok=True)
+        elapsed = time.monotonic() - started
+
+        if prober:
+            self.report_latency(prober, started)
+
+        media_bytes = sum(f['size'] for f in media.values())
+        self.stdout.write(
+            f"Database: {described['pages']} pages in {steps} steps, {db_seconds:.2f}s; "
+            f"media: {len(media)} files ({media_bytes / 2**20:.1f} MB), "
+            f"{first['copied'] + second['copied']} new ({(first['copied_bytes'] + second['copied_bytes']) / 2**20:.1f} MB)"
+        )
+
+        keep = options['keep'] if options['keep'] is not None else getattr(settings, 'BACKUP_KEEP', 14)
+        removed, objects = backups.prune(directory, keep)
+        if removed or objects:
+            self.stdout.write(f'Removed {removed} old archives and {objects} unreferenced media objects')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Backed up to {archive} ({archive.stat().st_size / 2**20:.1f} MB) in {elapsed:.1f}s'
+        ))
+
+    # Latency measurement ----------------------------------------------------
+
+    def start_probe(self, seconds):
+        """Start replaying requests in another process; returns once a baseline of seconds is measured"""
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost').lstrip('.')
+        plan = loadtest.Command().build_plan(200, dict(loadtest.DEFAULT_MIX, comment=0), random.Random(0))
+        context = multiprocessing.get_context('fork')
+        ready, stop, results = context.Event(), context.Event(), context.Queue()
+        # The forked process must not share our database connections
+        connections.close_all()
+        process = context.Process(target=probe, args=(ready, stop, results, plan, host), daemon=True)
+        process.start()
+        ready.wait()
+        self.stdout.write(f'Measuring request latency for {seconds:.0f}s without a backup...')
+        since = time.monotonic()
+        time.sleep(seconds)
+        return stop, results, process, since
+
+    def report_latency(self, prober, backup_started):
+        stop, results, process, since = prober
+        stop.set()
+        samples = results.get()
+        process.join()
+        baseline = sorted(latency for at, latency in samples if since <= at < backup_started)
+        during = sorted(latency for at, latency in samples if at >= backup_started)
+        for label, values in (('without backup', baseline), ('during backup', during)):
+            self.stdout.write(
+                f'  {label:<15} {len(values):>6} requests  '
+                f'p50 {loadtest.percentile(values, 50) * 1000:7.1f} ms  '
+                f'p95 {loadtest.percentile(values, 95) * 1000:7.1f} ms  '
+                f'p99 {loadtest.percentile(values, 99) * 1000:7.1f} ms'
+            )
+        if baseline and during:
+            overhead = loadtest.percentile(during, 95) - loadtest.percentile(baseline, 95)
+            self.stdout.write(f'Backup overhead on p95 latency: {overhead * 1000:+.1f} ms')
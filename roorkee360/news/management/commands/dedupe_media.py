@@ -0,0 +1,148 @@
+import os
+import shutil
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from news.models import MediaBlob
+from news.object_cache import article_cache
+from news.storage import BLOB_DIR, blob_name, hash_file, is_blob
+
+# Generated or temporary content that is not an upload
+SKIP_DIRS = {BLOB_DIR, 'derivatives'}
+
+
+def link_or_copy(source, target):
+    """Make target the same file as source, atomically replacing target"""
+    tmp = f'{target}.dedupe-tmp'
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copy2(source, tmp)
+    os.replace(tmp, target)
+
+
+def file_fields():
+    """(model, field name) for every FileField/ImageField in the project"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+class Command(BaseCommand):
+    help = ("Deduplicate MEDIA_ROOT: hard-link identical uploads, optionally move them to content-addressed "
+            "blobs that database references point at, and recount blob references")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rewrite-references', action='store_true',
+                            help='Store each content once as a blob, point file fields at it and remove the old paths')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change')
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        dry_run = options['dry_run']
+
+        groups = defaultdict(list)
+        for dirpath, dirnames, filenames in os.walk(root):
+            if os.path.relpath(dirpath, root) == '.':
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for filename in filenames:
+                if filename.endswith('.dedupe-tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                groups[(hash_file(path), os.path.splitext(name)[1].lower())].append(name)
+
+        files = sum(len(names) for names in groups.values())
+        duplicates = {key: names for key, names in groups.items() if len(names) > 1}
+        saved = 0
+        for names in duplicates.values():
+            inodes = {os.stat(os.path.join(root, name)).st_ino for name in names}
+            saved += (len(inodes) - 1) * os.path.getsize(os.path.join(root, names[0]))
+        self.stdout.write(f'{files} files, {len(groups)} unique, {len(duplicates)} with duplicates; '
+                          f'{saved / 1024 / 1024:.1f} MiB reclaimable')
+        if dry_run:
+            return
+
+        if options['rewrite_references']:
+            # Every unique content gets one blob; all copies become links to it
+            renames = {}
+            for (digest, ext), names in groups.items():
+                blob = blob_name(digest, ext)
+                blob_path = os.path.join(root, blob)
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    link_or_copy(os.path.join(root, names[0]), blob_path)
+                for name in names:
+                    self.link(os.path.join(root, name), blob_path)
+                    renames[name] = blob
+
+            rewritten = self.rewrite_references(renames)
+            for name in rewritten:
+                os.unlink(os.path.join(root, name))
+            article_cache.invalidate_all()
+            self.stdout.write(f'Pointed references of {len(rewritten)} files at blobs and removed the old paths')
+        else:
+            # References keep their paths: no blobs, which nothing would
+            # reference; copies just become links to the first one
+            for names in duplicates.values():
+                for name in names[1:]:
+                    self.link(os.path.join(root, name), os.path.join(root, names[0]))
+
+        blobs, orphans = self.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Deduplicated media: {saved / 1024 / 1024:.1f} MiB reclaimed, {blobs} referenced blobs, '
+            f'{orphans} unreferenced blobs removed'
+        ))
+
+    def link(self, path, source):
+        if not os.path.samefile(path, source):
+            link_or_copy(source, path)
+
+    def rewrite_references(self, renames):
+        """Update file fields from old names to blob names; returns the old names no longer used"""
+        rewritten = set()
+        with transaction.atomic():
+            for model, field in file_fields():
+                used = set(model._base_manager.exclude(**{field: ''}).values_list(field, flat=True).distinct())
+                for old in used & renames.keys():
+                    # update() on purpose: no save() side effects, no reference signals
+                    model._base_manager.filter(**{field: old}).update(**{field: renames[old]})
+                    rewritten.add(old)
+        return rewritten
+
+    def recount(self):
+        """Set MediaBlob reference counts from the database; delete blobs nothing references"""
+        references = Counter()
+        for model, field in file_fields():
+            for name in model._base_manager.filter(**{f'{field}__startswith': f'{BLOB_DIR}/'}).values_list(field, flat=True):
+                references[name] += 1
+
+        root = settings.MEDIA_ROOT
+        blob_root = os.path.join(root, BLOB_DIR)
+        orphans = 0
+        with transaction.atomic():
+            for dirpath, dirnames, filenames in os.walk(blob_root):
+                dirnames[:] = [d for d in dirnames if d != 'tmp']
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, root).replace(os.sep, '/')
+                    if not is_blob(name):
+                        continue
+                    if references[name]:
+                        MediaBlob.objects.update_or_create(name=name, defaults={
+                            'digest': os.path.splitext(filename)[0],
+                            'size': os.path.getsize(path),
+                            'refcount': references[name],
+                        })
+                    else:
+                        # Legacy paths linked to it keep their own copy of the data
+                        os.unlink(path)
+                        MediaBlob.objects.filter(name=name).delete()
+                        orphans += 1
+            MediaBlob.objects.exclude(name__in=references.keys()).delete()
+        return len(references), orphans
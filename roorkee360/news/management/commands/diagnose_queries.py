@@ -0,0 +1,365 @@
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from news.invalidation import bus
+from news.models import Category, Comment, NewsArticle, Tag
+from news.tag_stats import rebuild_tag_stats
+
+LOCATIONS = ['Civil Lines', 'IIT Roorkee', 'Ramnagar', 'Sherpur', 'Bhagwanpur', 'Jadoo Pur']
+WORDS = ['roorkee', 'canal', 'market', 'college', 'festival', 'traffic', 'rain', 'cricket', 'council', 'school']
+
+# Literals are replaced so the same statement with other ids counts as one shape
+LITERAL = re.compile(r'("(?:[^"]|"")*")|\'(?:[^\']|\'\')*\'|\b\d+(?:\.\d+)?\b')
+
+
+def statement_shape(sql):
+    return LITERAL.sub(lambda m: m.group(1) or '?', sql)
+
+
+def clause(sql, keyword, stops):
+    """Text of the first top-level `keyword` clause up to the next stop keyword"""
+    start = sql.find(f' {keyword} ')
+    if start < 0:
+        return ''
+    start += len(keyword) + 2
+    ends = [i for i in (sql.find(f' {stop} ', start) for stop in stops) if i >= 0]
+    return sql[start:min(ends) if ends else len(sql)]
+
+
+def explain(cursor, sql):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, tables):
+    """(kind, table) for full table scans and temporary B-tree sorts in a query plan"""
+    problems = []
+    for detail in plan:
+        scan = re.match(r'SCAN (\w+)(?: AS \w+)?$', detail)
+        if scan and scan.group(1) in tables:
+            problems.append(('full scan', scan.group(1)))
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append((detail[len('USE '):].lower(), None))
+    return problems
+
+
+def time_statement(cursor, sql, repeat):
+    """Median milliseconds to run a SELECT and fetch every row"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def suggest_index(sql, model):
+    """
+    (fields, condition) of an index for `model` in a statement: equality
+    filters first, then the ORDER BY columns (or the first range filter when
+    there is no ordering). Boolean filters are compiled to bare column terms
+    ("t"."is_approved", NOT "t"."is_spam") that SQLite cannot match against an
+    index column, so they become the condition of a partial index instead.
+    """
+    table = model._meta.db_table
+    where = clause(sql, 'WHERE', ('GROUP BY', 'ORDER BY', 'LIMIT', 'HAVING'))
+    order = clause(sql, 'ORDER BY', ('LIMIT', 'OFFSET'))
+    column = rf'"{table}"\."(\w+)"'
+    equal = re.findall(column + r'\s*(?:= |IN \(|IS NULL)', where)
+    flags = re.findall(r'(?:\(|AND )(NOT )?' + column + r'(?=\)| AND| OR)', where)
+    ranges = re.findall(column + r'\s*[<>]', where)
+    ordering = re.findall(column + r'( DESC)?', order)
+
+    columns = list(dict.fromkeys(equal))
+    descending = {direction for _, direction in ordering}
+    if ordering:
+        for name, direction in ordering:
+            if name not in columns:
+                # Mixed directions need a matching index; uniform ones are scanned either way
+                columns.append(f'-{name}' if direction and len(descending) > 1 else name)
+    elif ranges:
+        columns.append(ranges[0])
+
+    by_column = {f.column: f.name for f in model._meta.concrete_fields}
+    fields = [('-' if c.startswith('-') else '') + by_column[c.lstrip('-')]
+              for c in columns if c.lstrip('-') in by_column]
+    condition = {by_column[c]: not negated for negated, c in flags if c in by_column}
+    return tuple(fields[:4]), tuple(sorted(condition.items()))
+
+
+def make_index(model, fields, condition):
+    # Name it as Django would, counting the condition's fields so a partial
+    # index does not collide with a plain one on the same columns
+    named = models.Index(fields=list(fields) + [name for name, _ in condition])
+    named.set_name_with_model(model)
+    return models.Index(fields=list(fields), condition=models.Q(*condition) if condition else None,
+                        name=named.name)
+
+
+def index_source(index):
+    condition = f', condition=models.Q({", ".join(f"{k}={v}" for k, v in index.condition.children)})' \
+        if index.condition else ''
+    return f"models.Index(fields={index.fields!r}{condition}, name='{index.name}')"
+
+
+def existing_index(cursor, model, fields):
+    """Name of an index on the table that already starts with these columns"""
+    wanted = [model._meta.get_field(f.lstrip('-')).column for f in fields]
+    constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    for name, info in constraints.items():
+        if info['index'] and info['columns'][:len(wanted)] == wanted:
+            return name
+    return None
+
+
+class Command(BaseCommand):
+    help = ("Seed a scratch database, capture the queries of the news views and admin changelists, "
+            "EXPLAIN them and suggest composite indexes with before/after timings")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=3000, help='Articles to seed')
+        parser.add_argument('--comments', type=int, default=20, help='Comments per article')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per timed statement')
+        parser.add_argument('--min-ms', type=float, default=0.1,
+                            help='Ignore flagged statements faster than this (small lookup tables)')
+        parser.add_argument('--drop-index', action='append', default=[], metavar='NAME',
+                            help='Drop this index from the scratch database first, e.g. to measure '
+                                 'news_comment_approved_idx (approved comments of an article)')
+        parser.add_argument('--url', action='append', default=[], help='Extra path to capture')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated data')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('diagnose_queries reads SQLite query plans; run it with a SQLite database.')
+
+        # A throwaway database and cache: nothing touches the real data, and
+        # cached pages cannot hide queries. Saves there must not reach the
+        # running workers through the invalidation bus either.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with bus.muted(), override_settings(
+                DATABASE_READ_REPLICAS=[], ANALYTICS_ENABLED=False, DEBUG=True, ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                    'LOCATION': 'diagnose-queries'}},
+            ):
+                self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        articles = self.seed(options['articles'], options['comments'], rng)
+        self.stdout.write(f"Seeded {options['articles']} articles and {options['articles'] * options['comments']} "
+                          f'comments in {time.perf_counter() - started:.1f}s')
+
+        with connection.cursor() as cursor:
+            for name in options['drop_index']:
+                cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+                self.stdout.write(f'Dropped index {name}')
+
+        statements = self.capture(self.pages(articles, options['url']))
+        self.stdout.write(f'Captured {sum(s["count"] for s in statements.values())} queries, '
+                          f'{len(statements)} distinct statements\n')
+
+        models_by_table = {m._meta.db_table: m for m in apps.get_models()}
+        flagged = []
+        with connection.cursor() as cursor:
+            for statement in statements.values():
+                sql = statement['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                statement['plan'] = explain(cursor, sql)
+                statement['problems'] = plan_problems(statement['plan'], models_by_table)
+                if statement['problems']:
+                    statement['ms'] = time_statement(cursor, sql, options['repeat'])
+                    flagged.append(statement)
+
+        small = [s for s in flagged if s['ms'] < options['min_ms']]
+        flagged = sorted((s for s in flagged if s['ms'] >= options['min_ms']), key=lambda s: -s['ms'] * s['count'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Flagged statements ({len(flagged)})'))
+        for statement in flagged:
+            problems = ', '.join(f'{kind} {table}' if table else kind for kind, table in statement['problems'])
+            sources = ', '.join(sorted(statement['sources']))
+            self.stdout.write(f"⚠️  {statement['ms']:7.2f} ms ×{statement['count']:<4} {problems}  [{sources}]")
+            self.stdout.write(f"    {statement['sql'][:200]}")
+
+        if small:
+            self.stdout.write(f"   ({len(small)} more under {options['min_ms']} ms not shown)")
+
+        self.advise(flagged, models_by_table, options['repeat'])
+
+        if self.failures:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nPages that failed ({len(self.failures)})'))
+            for path, error in self.failures:
+                self.stdout.write(self.style.ERROR(f'❌ {path}: {error}'))
+
+    def seed(self, count, comments_per_article, rng):
+        """Bulk-insert a realistic amount of content; returns the published articles"""
+        author = User.objects.create_user('diagnose-author')
+        categories = [Category.objects.create(name=name, display_name=label, order=i)
+                      for i, (name, label) in enumerate(Category.CATEGORY_CHOICES)]
+        tags = Tag.objects.bulk_create([Tag(name=word.title(), slug=word) for word in WORDS])
+
+        now = timezone.now()
+        articles = []
+        for i in range(count):
+            published = rng.random() < 0.9
+            title = ' '.join(rng.sample(WORDS, 4)).title()
+            article = NewsArticle(
+                title=title, slug=f'diagnose-{i}', content=f'{title}. ' * 40,
+                category=rng.choice(categories), author=author,
+                status='published' if published else 'draft',
+                published_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 730)) if published else None,
+                location=rng.choice(LOCATIONS), views_count=rng.randint(0, 5000),
+                is_featured=rng.random() < 0.02, is_breaking=rng.random() < 0.002,
+            )
+            article.render_content()
+            articles.append(article)
+        articles = NewsArticle.objects.bulk_create(articles, batch_size=500)
+
+        through = NewsArticle.tags.through
+        through.objects.bulk_create([through(newsarticle=a, tag=t) for a in articles
+                                     for t in rng.sample(tags, 3)], batch_size=2000)
+        Comment.objects.bulk_create([
+            Comment(article=a, name='Reader', email='reader@example.com', content='Seeded comment text.',
+                    is_approved=rng.random() < 0.8)
+            for a in articles for _ in range(comments_per_article)
+        ], batch_size=2000)
+        rebuild_tag_stats()
+        return [a for a in articles if a.status == 'published']
+
+    def pages(self, articles, extra):
+        """(source, path, logged in) for every public news view and admin changelist"""
+        category = Category.objects.first()
+        tag = Tag.objects.first()
+        pages = [
+            ('news.home', reverse('news:home'), False),
+            ('news.category', reverse('news:category', args=[category.name]), False),
+            ('news.category', reverse('news:category', args=[category.name]) + f'?location={LOCATIONS[0]}', False),
+            ('news.location', reverse('news:location', args=[LOCATIONS[0]]), False),
+            ('news.tag', tag.get_absolute_url(), False),
+            ('news.search', reverse('news:search') + f'?q={WORDS[0]}', False),
+            ('news.api_articles', reverse('news:api_articles'), False),
+            ('news.api_promotions', reverse('news:api_promotions'), False),
+        ]
+        pages += [('news.article_detail', a.get_absolute_url(), False) for a in articles[:3]]
+        for model in admin.site._registry:
+            opts = model._meta
+            if opts.app_label == 'news':
+                pages.append((f'admin.{opts.model_name}', reverse(f'admin:news_{opts.model_name}_changelist'), True))
+        pages += [('extra', path, True) for path in extra]
+        return pages
+
+    def capture(self, pages):
+        """Request each page; returns statements keyed by shape with count, sources and example SQL"""
+        superuser = User.objects.create_superuser('diagnose-admin', 'diagnose@example.com', None)
+        anonymous, staff = Client(), Client()
+        staff.force_login(superuser)
+
+        statements = {}
+        self.failures = []
+        for source, path, logged_in in pages:
+            with CaptureQueriesContext(connection) as captured:
+                try:
+                    response = (staff if logged_in else anonymous).get(path)
+                except Exception as e:
+                    # A broken page is a finding too; the other pages are still analysed
+                    self.failures.append((path, f'{type(e).__name__}: {e}'))
+                    self.stdout.write(self.style.ERROR(f'{path}: {type(e).__name__}: {e}'))
+                    response = None
+            if response is not None and response.status_code >= 400:
+                self.failures.append((path, f'HTTP {response.status_code}'))
+                self.stdout.write(self.style.WARNING(f'{path}: HTTP {response.status_code}'))
+            for query in captured.captured_queries:
+                statement = statements.setdefault(statement_shape(query['sql']), {
+                    'sql': query['sql'], 'count': 0, 'sources': set(), 'problems': [],
+                })
+                statement['count'] += 1
+                statement['sources'].add(source)
+        return statements
+
+    def advise(self, flagged, models_by_table, repeat):
+        """Try a composite index per flagged statement; keep and report the ones that help"""
+        candidates = defaultdict(list)
+        for statement in flagged:
+            for table in re.findall(r'FROM "(\w+)"', statement['sql'])[:1]:
+                model = models_by_table.get(table)
+                if model is None or model._meta.app_label != 'news':
+                    continue
+                fields, condition = suggest_index(statement['sql'], model)
+                if fields:
+                    candidates[(model, fields, condition)].append(statement)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nIndex suggestions'))
+        operations = []
+        with connection.cursor() as cursor:
+            for (model, fields, condition), statements in candidates.items():
+                index = make_index(model, fields, condition)
+                label = f'{model.__name__}: {index_source(index)}'
+                current = None if condition else existing_index(cursor, model, fields)
+                if current:
+                    self.stdout.write(f'   {label}\n      index {current} exists but is not chosen for this query')
+                    continue
+
+                with connection.schema_editor() as editor:
+                    editor.add_index(model, index)
+                results = []
+                for statement in statements:
+                    after = plan_problems(explain(cursor, statement['sql']), models_by_table)
+                    results.append((statement, time_statement(cursor, statement['sql'], repeat), after))
+                # Keep it if the planner uses it to avoid a scan or sort without
+                # the statement getting slower (allowing for timing noise)
+                helped = any(len(after) < len(s['problems']) and ms < s['ms'] * 1.1 for s, ms, after in results)
+                if not helped:
+                    with connection.schema_editor() as editor:
+                        editor.remove_index(model, index)
+                    self.stdout.write(f'   {label}\n      not used by the planner, skipped')
+                    continue
+
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}'))
+                for statement, ms, after in results:
+                    remaining = ', '.join(kind for kind, _ in after) or 'none'
+                    self.stdout.write(f"      {statement['ms']:.2f} ms → {ms:.2f} ms "
+                                      f"({statement['ms'] / max(ms, 0.001):.1f}x) "
+                                      f"[{', '.join(sorted(statement['sources']))}], remaining issues: {remaining}")
+                operations.append(
+                    f"        migrations.AddIndex(\n"
+                    f"            model_name='{model._meta.model_name}',\n"
+                    f"            index={index_source(index)},\n"
+                    f"        ),"
+                )
+
+        if not operations:
+            self.stdout.write(self.style.SUCCESS('✅ No missing composite indexes found'))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nSuggested migration (or add the indexes to Meta.indexes '
+                                                     'and run makemigrations)'))
+        self.stdout.write(
+            "from django.db import migrations, models\n\n\n"
+            "class Migration(migrations.Migration):\n\n"
+            f"    dependencies = [\n        ('news', '{self.latest_migration()}'),\n    ]\n\n"
+            "    operations = [\n" + '\n'.join(operations) + "\n    ]"
+        )
+
+    def latest_migration(self):
+        from django.db.migrations.loader import MigrationLoader
+
+        leaves = MigrationLoader(None, ignore_no_migrations=True).graph.leaf_nodes('news')
+        return leaves[0][1] if leaves else '0001_initial'
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ("Switch SQLite databases to WAL journal mode, so readers run alongside a writer. "
+            "The mode is stored in the database file: run this once per deployment, not per connection")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases',
+                            help='Database alias (default: every SQLite database)')
+        parser.add_argument('--disable', action='store_true',
+                            help='Go back to the rollback journal (DELETE), e.g. before copying the file elsewhere')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or [alias for alias, database in connections.databases.items()
+                                         if database['ENGINE'] == 'django.db.backends.sqlite3']
+        mode = 'DELETE' if options['disable'] else 'WAL'
+        for alias in aliases:
+            database = connections.databases.get(alias)
+            if database is None:
+                raise CommandError(f'Unknown database alias: {alias}')
+            if database['ENGINE'] != 'django.db.backends.sqlite3':
+                self.stdout.write(f'Skipping {alias}: not a SQLite database')
+                continue
+
+            # The mode cannot change while Django holds the file open
+            connections[alias].close()
+            connection = sqlite3.connect(str(database['NAME']), timeout=20)
+            try:
+                result = connection.execute(f'PRAGMA journal_mode={mode}').fetchone()[0]
+            finally:
+                connection.close()
+            if result.upper() != mode:
+                raise CommandError(f'{alias} is still in {result} mode; is another process writing to it?')
+            self.stdout.write(self.style.SUCCESS(f"✅ {alias} ({database['NAME']}) uses journal_mode={result}"))
@@ -0,0 +1,152 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news import near_duplicates
+from news.models import ArticleSignature, LSHBucket, NewsArticle
+
+# A bucket shared by this many articles is boilerplate, not a story
+MAX_BUCKET_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = ("Sign every article with MinHash, rebuild the LSH buckets and flag near duplicates; "
+            "compares only articles that share a bucket, never all pairs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every signature, not only new or edited articles')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Minimum estimated similarity (default: NEAR_DUPLICATE_THRESHOLD)')
+        parser.add_argument('--unpublish', action='store_true',
+                            help='Move published duplicates of a published article back to draft')
+        parser.add_argument('--show', type=int, default=10, help='Largest duplicate groups to list')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        limit = near_duplicates.threshold() if options['threshold'] is None else options['threshold']
+        started = time.monotonic()
+        signatures, signed = self.sign(options['rebuild'], options['chunk_size'])
+        self.stdout.write(f'{len(signatures)} articles with signatures ({signed} computed) '
+                          f'in {time.monotonic() - started:.1f}s')
+
+        buckets = defaultdict(list)
+        for pk, signature in signatures.items():
+            for key in near_duplicates.band_keys(signature):
+                buckets[key].append(pk)
+
+        # Verify each candidate pair once; remember each article's best older match
+        best = {}
+        seen = set()
+        compared = 0
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > MAX_BUCKET_SIZE:
+                continue
+            members.sort()
+            for i, older in enumerate(members):
+                for newer in members[i + 1:]:
+                    if (older, newer) in seen:
+                        continue
+                    seen.add((older, newer))
+                    compared += 1
+                    score = near_duplicates.similarity(signatures[older], signatures[newer])
+                    current = best.get(newer)
+                    # Same rule as on save: most similar, ties to the oldest
+                    if score >= limit and (current is None or (score, -older) > (current[1], -current[0])):
+                        best[newer] = (older, score)
+
+        flagged = self.save_flags(best)
+        self.stdout.write(f'Compared {compared} candidate pairs out of {len(signatures) * (len(signatures) - 1) // 2} '
+                          f'possible; {flagged} articles flagged')
+        self.report(best, options['show'])
+
+        if options['unpublish'] and best:
+            unpublished = 0
+            originals = set(NewsArticle.objects.filter(pk__in={o for o, _ in best.values()}, status='published')
+                            .values_list('pk', flat=True))
+            for article in NewsArticle.objects.filter(pk__in=best.keys(), status='published'):
+                if best[article.pk][0] in originals:
+                    # save() so tag stats, caches and live readers follow
+                    article.status = 'draft'
+                    article.save(update_fields=['status'])
+                    unpublished += 1
+            self.stdout.write(f'Moved {unpublished} duplicates back to draft')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Near-duplicate scan finished in {time.monotonic() - started:.1f}s: '
+            f'{len(best)} duplicates of {len({o for o, _ in best.values()})} originals'
+        ))
+
+    def sign(self, rebuild, chunk_size):
+        """Signatures of every article keyed by id, and how many were (re)computed"""
+        stored = {pk: (text_hash, data) for pk, text_hash, data
+                  in ArticleSignature.objects.values_list('article_id', 'text_hash', 'minhash')}
+        signatures = {}
+        pending = []
+        computed = 0
+        articles = NewsArticle.objects.only('id', 'title', 'content_text').order_by('id')
+        for article in articles.iterator(chunk_size=chunk_size):
+            text = near_duplicates.article_text(article)
+            digest = near_duplicates.text_hash(text)
+            if not rebuild and article.pk in stored and stored[article.pk][0] == digest:
+                if stored[article.pk][1]:
+                    signatures[article.pk] = near_duplicates.unpack(stored[article.pk][1])
+                continue
+            signature = near_duplicates.minhash(near_duplicates.shingles(text))
+            if signature is not None:
+                signatures[article.pk] = signature
+            pending.append((article.pk, digest, signature))
+            computed += 1
+            if len(pending) >= chunk_size:
+                self.store(pending)
+                pending = []
+        self.store(pending)
+        return signatures, computed
+
+    def store(self, pending):
+        """Save signatures and replace the buckets of a batch of articles"""
+        if not pending:
+            return
+        ids = [pk for pk, _, _ in pending]
+        with transaction.atomic():
+            LSHBucket.objects.filter(article_id__in=ids).delete()
+            LSHBucket.objects.bulk_create([
+                LSHBucket(article_id=pk, band=band, key=key)
+                for pk, _, signature in pending if signature is not None
+                for band, key in near_duplicates.band_keys(signature)
+            ], batch_size=2000)
+            ArticleSignature.objects.bulk_create([
+                ArticleSignature(article_id=pk, text_hash=digest,
+                                 minhash=near_duplicates.pack(signature) if signature is not None else b'')
+                for pk, digest, signature in pending
+            ], update_conflicts=True, unique_fields=['article'], update_fields=['text_hash', 'minhash'])
+
+    def save_flags(self, best):
+        """Write duplicate_of/similarity for every signature; returns the number flagged"""
+        rows = list(ArticleSignature.objects.only('duplicate_of', 'similarity'))
+        changed = []
+        for row in rows:
+            duplicate_of, score = best.get(row.article_id, (None, None))
+            if (row.duplicate_of_id, row.similarity) != (duplicate_of, score):
+                row.duplicate_of_id, row.similarity = duplicate_of, score
+                changed.append(row)
+        ArticleSignature.objects.bulk_update(changed, ['duplicate_of', 'similarity'], batch_size=500)
+        return len(best)
+
+    def report(self, best, show):
+        groups = defaultdict(list)
+        for newer, (older, score) in best.items():
+            groups[older].append((newer, score))
+        largest = sorted(groups.items(), key=lambda item: -len(item[1]))[:show]
+        if not largest:
+            return
+        titles = dict(NewsArticle.objects.filter(
+            pk__in={pk for older, members in largest for pk in [older, *(m for m, _ in members)]}
+        ).values_list('pk', 'title'))
+        self.stdout.write('\nLargest groups')
+        for older, members in largest:
+            self.stdout.write(f'  #{older} {titles.get(older, "")[:70]}')
+            for newer, score in sorted(members):
+                self.stdout.write(f'      ≈ {score:.0%}  #{newer} {titles.get(newer, "")[:60]}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.invalidation import bus, TOPICS, ALL
+
+
+class Command(BaseCommand):
+    help = ("Show the cross-worker invalidation bus (sequence and recent events), "
+            "or make every worker drop its cached objects of a topic")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recent', type=int, default=20, help='Recent events to list')
+        parser.add_argument('--publish', choices=sorted(TOPICS), action='append', default=[],
+                            help='Invalidate this topic in every worker, e.g. after editing rows with SQL')
+        parser.add_argument('--id', type=int, default=ALL, help='Only this object id of the published topic')
+
+    def handle(self, *args, **options):
+        state = bus.state()
+        if state is None:
+            raise CommandError('The invalidation bus is not available (see INVALIDATION_BUS_PATH).')
+
+        if options['publish']:
+            # Outside a transaction each event is written right away
+            for topic in options['publish']:
+                bus.publish(TOPICS[topic], options['id'])
+            self.stdout.write(self.style.SUCCESS(f"✅ Published {len(options['publish'])} invalidation events"))
+            return
+
+        epoch, sequence, entries = state
+        self.stdout.write(f'{bus.path}: epoch {epoch:x}, sequence {sequence}, {bus.slots} slots')
+        now = time.time()
+        for number, published, topic, object_id in entries[-options['recent']:]:
+            target = 'all' if object_id == ALL else f'#{object_id}'
+            self.stdout.write(f'  {number:>8}  {now - published:>9.1f}s ago  {topic:<10} {target}')
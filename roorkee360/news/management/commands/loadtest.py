@@ -0,0 +1,245 @@
+import http.client
+import io
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from news.models import NewsArticle, Category, SearchQueryStat
+
+
+# Share of each request kind in the generated mix
+DEFAULT_MIX = {'home': 20, 'category': 15, 'detail': 45, 'search': 15, 'comment': 5}
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+# Per-process state, set by init_worker()
+_state = {}
+_local = threading.local()
+
+
+def init_worker(target, host, record_analytics):
+    if not record_analytics:
+        settings.ANALYTICS_ENABLED = False
+    _state['target'] = target
+    _state['host'] = host
+    if target is None:
+        from roorkee360.wsgi import application
+        _state['app'] = application
+
+
+def call_wsgi(method, path, query='', body=b'', headers=None):
+    """Call the WSGI application in-process; returns (status, headers, body)"""
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': _state['host'],
+        'SERVER_NAME': _state['host'],
+        'REMOTE_ADDR': f'10.0.{random.randint(0, 255)}.{random.randint(1, 254)}',
+        'wsgi.input': io.BytesIO(body),
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    for name, value in (headers or {}).items():
+        key = name.upper().replace('-', '_')
+        environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+    setup_testing_defaults(environ)
+
+    captured = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        captured['status'] = int(status.split()[0])
+        captured['headers'] = response_headers
+
+    result = _state['app'](environ, start_response)
+    try:
+        content = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return captured['status'], captured['headers'], content
+
+
+def call_http(method, path, query='', body=b'', headers=None):
+    """Same as call_wsgi, against a running server"""
+    parts = urlsplit(_state['target'])
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    url = path + (f'?{query}' if query else '')
+    try:
+        conn.request(method, url, body=body or None, headers=headers or {})
+        response = conn.getresponse()
+        content = response.read()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        _local.conn = None
+        raise
+    return response.status, response.getheaders(), content
+
+
+def perform(method, path, query='', body=b'', headers=None):
+    if _state['target'] is None:
+        return call_wsgi(method, path, query, body, headers)
+    return call_http(method, path, query, body, headers)
+
+
+def csrf_headers(path):
+    """Fetch a page to obtain a CSRF cookie, as a browser would before posting"""
+    status, headers, _ = perform('GET', path)
+    cookie = SimpleCookie()
+    for name, value in headers:
+        if name.lower() == 'set-cookie':
+            cookie.load(value)
+    token = cookie['csrftoken'].value if 'csrftoken' in cookie else ''
+    return {'Cookie': f'csrftoken={token}', 'X-CSRFToken': token}
+
+
+def run_one(spec):
+    """Execute one planned request; returns (kind, status or None, latency seconds)"""
+    kind, method, path, query = spec
+    body, headers = b'', None
+    if method == 'POST':
+        headers = csrf_headers(path)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        body = urlencode({
+            'name': 'Load Tester',
+            'email': 'loadtest@example.com',
+            'content': f'Load test comment number {random.randint(1, 10**6)}.',
+        }).encode()
+
+    started = time.perf_counter()
+    try:
+        status = perform(method, path, query, body, headers)[0]
+    except Exception:
+        status = None
+    return kind, status, time.perf_counter() - started
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = ("Replay a realistic mix of requests (home, category, detail, search, comment POST) "
+            "against the WSGI application and report throughput, latency and errors")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Total requests to send')
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker threads or processes')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--target', help='Base URL of a running server (default: call the app in-process)')
+        parser.add_argument('--host', default=None, help='Host header for in-process requests')
+        parser.add_argument('--comment-share', type=int, default=0,
+                            help=f"Weight of comment POSTs in the mix (they write real comments; "
+                                 f"suggested {DEFAULT_MIX['comment']})")
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable mix')
+        parser.add_argument('--record-analytics', action='store_true',
+                            help='Keep writing analytics events during the run')
+
+    def build_plan(self, total, mix, rng):
+        slugs = list(NewsArticle.objects.filter(status='published').values_list('slug', flat=True)[:500])
+        categories = list(Category.objects.filter(is_active=True).values_list('name', flat=True))
+        queries = list(SearchQueryStat.objects.order_by('-count').values_list('query', flat=True)[:50])
+        if not queries:
+            titles = NewsArticle.objects.filter(status='published').values_list('title', flat=True)[:50]
+            queries = [word for title in titles for word in title.split() if len(word) > 3][:50] or ['roorkee']
+        if not slugs:
+            raise CommandError('No published articles to test against.')
+
+        kinds = [k for k in mix if mix[k] > 0 and (k != 'category' or categories)]
+        weights = [mix[k] for k in kinds]
+        plan = []
+        for kind in rng.choices(kinds, weights=weights, k=total):
+            if kind == 'home':
+                plan.append((kind, 'GET', '/', ''))
+            elif kind == 'category':
+                plan.append((kind, 'GET', f'/category/{rng.choice(categories)}/', ''))
+            elif kind == 'detail':
+                plan.append((kind, 'GET', f'/article/{rng.choice(slugs)}/', ''))
+            elif kind == 'search':
+                plan.append((kind, 'GET', '/search/', urlencode({'q': rng.choice(queries)})))
+            elif kind == 'comment':
+                plan.append((kind, 'POST', f'/article/{rng.choice(slugs)}/', ''))
+        return plan
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        rng = random.Random(options['seed'])
+        mix = dict(DEFAULT_MIX, comment=options['comment_share'])
+        plan = self.build_plan(options['requests'], mix, rng)
+        host = options['host'] or next((h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost').lstrip('.')
+        init_args = (options['target'], host, options['record_analytics'])
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        if options['processes']:
+            executor = ProcessPoolExecutor(options['concurrency'], initializer=init_worker, initargs=init_args)
+        else:
+            init_worker(*init_args)
+            executor = ThreadPoolExecutor(options['concurrency'])
+
+        where = options['target'] or 'in-process WSGI application'
+        pool = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f"Sending {len(plan)} requests to {where} with {options['concurrency']} {pool}...")
+
+        started = time.perf_counter()
+        with executor:
+            chunksize = max(1, len(plan) // (options['concurrency'] * 8))
+            results = list(executor.map(run_one, plan, chunksize=chunksize))
+        elapsed = time.perf_counter() - started
+
+        self.report(results, elapsed)
+
+    def report(self, results, elapsed):
+        latencies = sorted(r[2] * 1000 for r in results)
+        by_kind = defaultdict(list)
+        statuses = Counter()
+        errors = Counter()
+        for kind, status, latency in results:
+            by_kind[kind].append(latency * 1000)
+            statuses[status or 'exception'] += 1
+            if status is None or status >= 400:
+                errors[kind] += 1
+
+        total = len(results)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {total} requests in {elapsed:.2f}s  →  {total / elapsed:.1f} req/s'
+        ))
+        self.stdout.write(f'Errors: {sum(errors.values())} ({sum(errors.values()) / total:.2%})   '
+                          f"Statuses: {', '.join(f'{s}={n}' for s, n in sorted(statuses.items(), key=str))}")
+
+        self.stdout.write('\nLatency (ms)    count     p50     p90     p99     max   errors')
+        for kind in sorted(by_kind):
+            values = sorted(by_kind[kind])
+            self.stdout.write(
+                f'{kind:<12} {len(values):>8} {percentile(values, 50):>7.1f} {percentile(values, 90):>7.1f} '
+                f'{percentile(values, 99):>7.1f} {values[-1]:>7.1f} {errors[kind]:>8}'
+            )
+        self.stdout.write(
+            f"{'all':<12} {total:>8} {percentile(latencies, 50):>7.1f} {percentile(latencies, 90):>7.1f} "
+            f"{percentile(latencies, 99):>7.1f} {latencies[-1]:>7.1f} {sum(errors.values()):>8}"
+        )
+
+        self.stdout.write('\nHistogram')
+        lower = 0
+        for upper in HISTOGRAM_BUCKETS_MS:
+            count = sum(1 for v in latencies if lower <= v < upper)
+            if count:
+                label = f'{lower:g}-{upper:g} ms' if upper != float('inf') else f'>= {lower:g} ms'
+                bar = '█' * max(1, int(40 * count / total))
+                self.stdout.write(f'{label:>14} {count:>7}  {bar}')
+            lower = upper
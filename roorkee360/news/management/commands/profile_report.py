@@ -0,0 +1,57 @@
+import io
+import pstats
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.profiling import profiling_dir, make_token
+
+
+class Command(BaseCommand):
+    help = "Merge sampled request profiles into a hot-function report per view"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only this view, e.g. news.article_detail')
+        parser.add_argument('--top', type=int, default=20, help='Functions to list per view')
+        parser.add_argument('--sort', default='tottime', choices=['tottime', 'cumulative', 'ncalls'],
+                            help='Order functions by own time, cumulative time or call count')
+        parser.add_argument('--hours', type=float, default=None, help='Only dumps from the last N hours')
+        parser.add_argument('--token', action='store_true',
+                            help='Print a signed profiling header value instead of a report')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(make_token())
+            return
+
+        directory = profiling_dir()
+        if not directory.exists():
+            self.stdout.write('No profiles recorded yet.')
+            return
+
+        cutoff = time.time() - options['hours'] * 3600 if options['hours'] else 0
+        view_dirs = sorted(p for p in directory.iterdir() if p.is_dir())
+        if options['view']:
+            view_dirs = [p for p in view_dirs if p.name == options['view']]
+
+        for view_dir in view_dirs:
+            dumps = [p for p in sorted(view_dir.glob('*.prof')) if p.stat().st_mtime >= cutoff]
+            if not dumps:
+                continue
+
+            # Elapsed time is encoded in the file name: <date>-<time>-<pid>-<ms>ms.prof
+            durations = sorted(int(p.stem.rsplit('-', 1)[-1].rstrip('ms')) for p in dumps)
+            median = durations[len(durations) // 2]
+
+            out = io.StringIO()
+            stats = pstats.Stats(str(dumps[0]), stream=out)
+            for dump in dumps[1:]:
+                stats.add(str(dump))
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['top'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{view_dir.name}: {len(dumps)} samples, median {median} ms, max {durations[-1]} ms'
+            ))
+            # Skip pstats' own header lines up to the column titles
+            report = out.getvalue()
+            self.stdout.write(report[report.find('   ncalls'):].rstrip())
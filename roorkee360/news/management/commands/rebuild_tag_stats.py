@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news.tag_stats import rebuild_tag_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute tag cloud counts and recency scores from scratch (normally kept current by signals)"
+
+    def handle(self, *args, **options):
+        tagged = rebuild_tag_stats()
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt tag stats ({tagged} tags with published articles)'))
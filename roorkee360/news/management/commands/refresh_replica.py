@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from news.backups import copy_database
+from news.routers import get_read_replicas
+
+
+class Command(BaseCommand):
+    help = "Refresh SQLite read replicas from the primary database using the online backup API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', action='append', dest='aliases',
+                            help='Replica alias to refresh (default: all DATABASE_READ_REPLICAS)')
+        parser.add_argument('--pages', type=int, default=256,
+                            help='Pages copied per backup step')
+        parser.add_argument('--sleep', type=float, default=0.005,
+                            help='Seconds to pause between steps so writers are not starved')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or get_read_replicas()
+        if not aliases:
+            raise CommandError('No read replicas configured (settings.DATABASE_READ_REPLICAS).')
+
+        primary = connections.databases['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('refresh_replica only supports a SQLite primary.')
+
+        for alias in aliases:
+            replica = connections.databases.get(alias)
+            if replica is None:
+                raise CommandError(f'Unknown database alias: {alias}')
+            if replica['ENGINE'] != 'django.db.backends.sqlite3':
+                self.stdout.write(f'Skipping {alias}: not a SQLite database')
+                continue
+
+            # Drop any persistent connection Django holds on the replica
+            connections[alias].close()
+
+            started = time.monotonic()
+            target = sqlite3.connect(str(replica['NAME']))
+            try:
+                copy_database(primary['NAME'], target, pages=options['pages'], sleep=options['sleep'])
+                # Readers on the replica never write, so WAL is safe here too
+                target.execute('PRAGMA journal_mode=WAL')
+            finally:
+                target.close()
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Refreshed replica "{alias}" from primary in {elapsed:.2f}s'
+            ))
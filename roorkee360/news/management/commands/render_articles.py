@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from news.models import NewsArticle
+from news.rendering import render_fields
+
+
+class Command(BaseCommand):
+    help = "Re-render stored article HTML, summary and reading time (e.g. after changing NEWS_CONTENT_FORMAT)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        articles = NewsArticle.objects.only('id', 'content', 'excerpt', 'subtitle')
+        rendered = 0
+        for article in articles.iterator(chunk_size=options['chunk_size']):
+            # update() skips save() and its signals; only derived fields change
+            NewsArticle.objects.filter(pk=article.pk).update(
+                **render_fields(article.content, article.excerpt, article.subtitle)
+            )
+            rendered += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ Rendered {rendered} articles'))
@@ -0,0 +1,135 @@
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from news import backups
+from news.invalidation import bus, TOPICS
+from news.object_cache import article_cache
+from news.storage import hash_file, is_blob
+
+
+class Command(BaseCommand):
+    help = ("Restore a backup written by `manage.py backup`: the database (through the backup API, "
+            "so running workers see the restored data) and the media files that differ")
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help="Archive path or name in BACKUP_DIR, or 'latest'")
+        parser.add_argument('--database', help='Restore into this SQLite file instead of the live database')
+        parser.add_argument('--media-root', help='Restore media here instead of MEDIA_ROOT')
+        parser.add_argument('--skip-database', action='store_true')
+        parser.add_argument('--skip-media', action='store_true')
+        parser.add_argument('--pages', type=int, default=1024, help='Database pages copied per step')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between steps')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask before overwriting the live database')
+
+    def find_archive(self, value):
+        directory = backups.backup_dir()
+        if value == 'latest':
+            existing = backups.archives(directory)
+            if not existing:
+                raise CommandError(f'No backups in {directory}')
+            return existing[-1]
+        for candidate in (Path(value), directory / value, directory / f'{value}{backups.ARCHIVE_SUFFIX}'):
+            if candidate.is_file():
+                return candidate
+        raise CommandError(f'Backup not found: {value}')
+
+    def handle(self, *args, **options):
+        archive = self.find_archive(options['archive'])
+        with tarfile.open(archive, 'r:gz') as tar:
+            manifest = backups.read_manifest(archive)
+            if manifest.get('format') != backups.FORMAT:
+                raise CommandError(f"Unsupported backup format: {manifest.get('format')}")
+            self.stdout.write(f"Restoring {manifest['name']} from {manifest['created_at']}")
+
+            live = not options['database']
+            if not options['skip_database']:
+                target = options['database'] or connections.databases['default']['NAME']
+                if live and options['interactive']:
+                    answer = input(f'This replaces every row of {target}. Type "yes" to continue: ')
+                    if answer != 'yes':
+                        raise CommandError('Restore cancelled.')
+                self.restore_database(tar, manifest, target, options)
+
+            if not options['skip_media']:
+                self.restore_media(tar, manifest, archive.parent, options['media_root'] or settings.MEDIA_ROOT)
+
+        if live and not options['skip_database']:
+            # Every cached object may differ now, in this process and the workers
+            article_cache.invalidate_all()
+            for topic in TOPICS.values():
+                bus.publish(topic)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Restored {archive.name}'))
+
+    def restore_database(self, tar, manifest, target, options):
+        target = Path(target)
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix='.restore')
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(tar.extractfile(backups.DATABASE), f)
+            if hash_file(tmp) != manifest['database']['sha256']:
+                raise CommandError('The database in the archive does not match its manifest checksum.')
+            check = backups.describe_database(tmp)['check']
+            if check != 'ok':
+                raise CommandError(f'The database in the archive failed the integrity check: {check}')
+
+            if target.exists():
+                # Copy page by page into the existing file, so open connections
+                # (and its WAL) stay valid and see the restored data
+                connections.close_all()
+                destination = sqlite3.connect(str(target), timeout=20)
+                try:
+                    steps = backups.copy_database(tmp, destination, pages=options['pages'], sleep=options['sleep'])
+                finally:
+                    destination.close()
+                self.stdout.write(f'Database restored into {target} in {steps} steps')
+            else:
+                os.replace(tmp, target)
+                self.stdout.write(f'Database written to {target}')
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def restore_media(self, tar, manifest, directory, root):
+        included = manifest.get('media_included')
+        restored = unchanged = 0
+        missing = []
+        for name, info in manifest['media'].items():
+            path = Path(root) / name
+            if path.exists() and path.stat().st_size == info['size'] and (
+                    is_blob(name) or hash_file(path) == info['sha256']):
+                unchanged += 1
+                continue
+
+            member = backups.object_name(info['sha256'])
+            stored = directory / member
+            if included:
+                source = tar.extractfile(member)
+            elif stored.exists():
+                source = open(stored, 'rb')
+            else:
+                missing.append(name)
+                continue
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f'{path.name}.restore-tmp')
+            with source, open(tmp, 'wb') as f:
+                shutil.copyfileobj(source, f)
+            os.replace(tmp, path)
+            restored += 1
+
+        self.stdout.write(f'Media: {restored} files restored, {unchanged} unchanged')
+        if missing:
+            for name in missing[:20]:
+                self.stderr.write(f'  missing from the backup store: {name}')
+            raise CommandError(f'{len(missing)} media files could not be restored; '
+                               f'their content is not in {directory / "objects"}')
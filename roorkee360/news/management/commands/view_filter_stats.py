@@ -0,0 +1,42 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.view_tracking import build_filter
+
+
+class Command(BaseCommand):
+    help = "Measure memory use and false-positive rate of the view de-duplication filter"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=None,
+                            help='Keys to insert (default: VIEW_DEDUPE_CAPACITY)')
+        parser.add_argument('--probes', type=int, default=100_000,
+                            help='Unseen keys to probe for false positives')
+
+    def handle(self, *args, **options):
+        view_filter = build_filter()
+        items = options['items'] or view_filter.capacity
+        probes = options['probes']
+
+        started = time.perf_counter()
+        for i in range(items):
+            view_filter.check_and_add(b'seen:%d:' % i + os.urandom(8))
+        insert_us = (time.perf_counter() - started) / max(items, 1) * 1e6
+
+        false_positives = 0
+        for i in range(probes):
+            if b'probe:%d:' % i + os.urandom(8) in view_filter:
+                false_positives += 1
+
+        stats = view_filter.stats()
+        self.stdout.write(f"Window:                 {view_filter.window}s in {stats['slices']} slices")
+        self.stdout.write(f"Capacity per slice:     {view_filter.capacity:,} keys")
+        self.stdout.write(f"Bits / hashes:          {stats['bits_per_slice']:,} / {stats['hash_functions']}")
+        self.stdout.write(f"Memory:                 {stats['memory_bytes'] / 1024:.1f} KiB")
+        self.stdout.write(f"Inserted:               {items:,} keys ({insert_us:.1f} µs per check)")
+        self.stdout.write(f"Target FP rate:         {view_filter.error_rate:.4%}")
+        self.stdout.write(f"Estimated FP rate:      {stats['estimated_false_positive_rate']:.4%}")
+        self.stdout.write(f"Measured FP rate:       {false_positives / max(probes, 1):.4%} "
+                          f"({false_positives}/{probes:,})")
@@ -0,0 +1,73 @@
+from django.conf import settings
+
+from .invalidation import bus
+from .routers import get_read_replicas, use_replica, reset_replica
+
+
+def replica_stream(content):
+    """Produce each chunk of a streaming body with reads routed to a replica"""
+    iterator = iter(content)
+    while True:
+        # Set and reset around each chunk: the server may iterate in another context
+        token = use_replica()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            reset_replica(token)
+        yield chunk
+
+
+class ReadReplicaMiddleware:
+    """
+    Serve GET/HEAD requests to the public views (news.views, news.api) from
+    a read replica. After a successful write (e.g. a comment POST) the client is
+    pinned to the primary for a short while so it reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'READ_REPLICA_PIN_COOKIE', 'db_primary')
+        self.pin_seconds = getattr(settings, 'READ_REPLICA_PIN_SECONDS', 15)
+        self.replica_modules = getattr(settings, 'READ_REPLICA_VIEW_MODULES', ('news.views', 'news.api'))
+
+    def __call__(self, request):
+        request._replica_token = None
+        response = self.get_response(request)
+
+        if request._replica_token is not None:
+            reset_replica(request._replica_token)
+            if response.streaming and not response.is_async:
+                # The body is generated after this returns (e.g. the NDJSON export)
+                response.streaming_content = replica_stream(response.streaming_content)
+
+        # Pin the client to the primary after it wrote something
+        if (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                and response.status_code < 400 and get_read_replicas()):
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=self.pin_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and view_func.__module__ in self.replica_modules
+                and self.cookie_name not in request.COOKIES):
+            request._replica_token = use_replica()
+        return None
+
+
+class InvalidationMiddleware:
+    """
+    Apply cache invalidations published by other worker processes before
+    handling each request (news/invalidation.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        bus.poll()
+        return self.get_response(request)
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+def render_existing_articles(apps, schema_editor):
+    from news.rendering import render_fields
+
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    # render_fields() may return fields added by later migrations
+    fields = {'content_html', 'content_text', 'summary', 'word_count', 'reading_time'}
+    for article in NewsArticle.objects.only('id', 'content', 'excerpt', 'subtitle').iterator(chunk_size=200):
+        rendered = render_fields(article.content, article.excerpt, article.subtitle)
+        NewsArticle.objects.filter(pk=article.pk).update(**{f: rendered[f] for f in fields})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False, help_text='Plain text for search'),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='summary',
+            field=models.TextField(blank=True, editable=False, help_text='Excerpt, subtitle or start of content'),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_existing_articles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_article_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('query', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('zero_result_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour', '-count'],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'query'), name='unique_search_query_stat')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrafficStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('event', models.CharField(max_length=20)),
+                ('article_id', models.BigIntegerField(default=0)),
+                ('category_id', models.BigIntegerField(default=0)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['article_id', 'hour'], name='news_traffi_article_af7e0b_idx'), models.Index(fields=['category_id', 'hour'], name='news_traffi_categor_ca0e59_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'event', 'article_id', 'category_id', 'location'), name='unique_traffic_stat')],
+            },
+        ),
+    ]
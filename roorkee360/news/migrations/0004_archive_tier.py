@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_analytics_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedArticle',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=250, unique=True)),
+                ('subtitle', models.CharField(blank=True, max_length=300)),
+                ('content', models.TextField()),
+                ('excerpt', models.TextField(blank=True, max_length=500)),
+                ('featured_image', models.ImageField(blank=True, null=True, upload_to='news_images/%Y/%m/')),
+                ('featured_image_alt', models.CharField(blank=True, max_length=200)),
+                ('featured_image_caption', models.CharField(blank=True, max_length=300)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('review', 'Under Review'), ('published', 'Published'), ('archived', 'Archived')], help_text='Status when archived', max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('normal', 'Normal'), ('high', 'High'), ('urgent', 'Urgent')], default='normal', max_length=10)),
+                ('meta_description', models.CharField(blank=True, max_length=160)),
+                ('meta_keywords', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('views_count', models.PositiveIntegerField(default=0)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('is_breaking', models.BooleanField(default=False)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('content_html', models.TextField(blank=True)),
+                ('content_text', models.TextField(blank=True)),
+                ('summary', models.TextField(blank=True)),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('reading_time', models.PositiveSmallIntegerField(default=1)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_articles', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_articles', to='news.category')),
+                ('tags', models.ManyToManyField(blank=True, related_name='archived_articles', to='news.tag')),
+            ],
+            options={
+                'ordering': ['-published_at', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedArticleImage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('image', models.ImageField(upload_to='article_images/%Y/%m/')),
+                ('caption', models.CharField(blank=True, max_length=300)),
+                ('alt_text', models.CharField(blank=True, max_length=200)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='news.archivedarticle')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('content', models.TextField(max_length=1000)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='news.archivedarticle')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedarticle',
+            index=models.Index(fields=['status', 'published_at'], name='news_archiv_status_ebedee_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_tag_stats(apps, schema_editor):
+    from news.tag_stats import recency_contribution
+
+    Tag = apps.get_model('news', 'Tag')
+    TagStat = apps.get_model('news', 'TagStat')
+    Through = apps.get_model('news', 'NewsArticle').tags.through
+    counts = {pk: [0, 0.0] for pk in Tag.objects.values_list('id', flat=True)}
+    rows = Through.objects.filter(newsarticle__status='published').values_list('tag_id', 'newsarticle__published_at')
+    for tag_id, published_at in rows.iterator(chunk_size=2000):
+        counts[tag_id][0] += 1
+        counts[tag_id][1] += recency_contribution(published_at)
+    TagStat.objects.bulk_create([
+        TagStat(tag_id=pk, published_count=count, recency_score=score)
+        for pk, (count, score) in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_archive_tier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stat', serialize=False, to='news.tag')),
+                ('published_count', models.IntegerField(default=0)),
+                ('recency_score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-published_count'], name='news_tagsta_publish_125738_idx'), models.Index(fields=['-recency_score'], name='news_tagsta_recency_7e181a_idx')],
+            },
+        ),
+        migrations.RunPython(fill_tag_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_tag_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storepromotion',
+            name='categories',
+            field=models.ManyToManyField(blank=True, related_name='promotions', to='news.category'),
+        ),
+        migrations.AddField(
+            model_name='storepromotion',
+            name='impressions',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='storepromotion',
+            name='location',
+            field=models.CharField(blank=True, help_text='Only show on pages for this area', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='storepromotion',
+            name='weight',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Relative share when several promotions are live'),
+        ),
+        migrations.AddIndex(
+            model_name='storepromotion',
+            index=models.Index(fields=['is_active', 'valid_until'], name='news_storep_is_acti_02546c_idx'),
+        ),
+    ]
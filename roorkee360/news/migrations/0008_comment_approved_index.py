@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['article', 'created_at'], name='news_comment_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_comment_approved_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSignature',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='news.newsarticle')),
+                ('minhash', models.BinaryField()),
+                ('text_hash', models.CharField(help_text='SHA-1 of the hashed text, to skip unchanged saves', max_length=40)),
+                ('similarity', models.FloatField(blank=True, help_text='Estimated Jaccard similarity to duplicate_of', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='news.newsarticle')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('key', models.BigIntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='news.newsarticle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'key'], name='news_lshbuc_band_8a7f32_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'band'), name='unique_lsh_bucket_band')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+def summarize_existing_articles(apps, schema_editor):
+    from news.rendering import CARD_SUMMARY_WORDS, truncate_words
+
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    for article in NewsArticle.objects.only('id', 'excerpt', 'subtitle', 'content_text').iterator(chunk_size=200):
+        source = article.excerpt or article.subtitle or article.content_text
+        NewsArticle.objects.filter(pk=article.pk).update(card_summary=truncate_words(source, CARD_SUMMARY_WORDS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_near_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='card_summary',
+            field=models.TextField(blank=True, editable=False, help_text='Shorter summary for small cards'),
+        ),
+        migrations.RunPython(summarize_existing_articles, migrations.RunPython.noop),
+    ]
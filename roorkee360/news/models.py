@@ -1,10 +1,13 @@
 # models.py
+from django.core.files.base import ContentFile
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from PIL import Image
-import os
+import io
+
+from .rendering import render_fields, RENDERED_FIELDS, SOURCE_FIELDS
 
 class Category(models.Model):
     """News categories like Historical, Trending, Local Events, etc."""
@@ -49,6 +52,40 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def get_absolute_url(self):
+        return reverse('news:tag', kwargs={'slug': self.slug})
+
+class TagStat(models.Model):
+    """Denormalised published-article counts per tag, kept current by news/tag_stats.py"""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='stat')
+    published_count = models.IntegerField(default=0)
+    # Sum of 2 ** (days since tag_stats.RECENCY_EPOCH / half life) over published articles
+    recency_score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-published_count']),
+            models.Index(fields=['-recency_score']),
+        ]
+
+    def __str__(self):
+        return f"{self.tag.name}: {self.published_count}"
+
+class NewsArticleQuerySet(models.QuerySet):
+    # Everything a listing card shows (title, image, category badge, summary,
+    # date, views) and nothing else: no content, content_html or content_text
+    CARD_FIELDS = [
+        'id', 'title', 'slug', 'summary', 'card_summary', 'featured_image', 'featured_image_alt',
+        'published_at', 'created_at', 'views_count', 'is_breaking', 'is_featured',
+        'category__id', 'category__name', 'category__display_name',
+    ]
+
+    def cards(self):
+        """Narrow rows for article cards; other fields load one query per article if touched"""
+        return self.select_related('category').only(*self.CARD_FIELDS)
+
+
 class NewsArticle(models.Model):
     """Main news article model"""
     STATUS_CHOICES = [
@@ -103,6 +140,19 @@ class NewsArticle(models.Model):
     # Location specific (for Roorkee)
     location = models.CharField(max_length=100, blank=True, help_text="Specific area in Roorkee")
     
+    # Archived copies live in ArchivedArticle, which sets this to True
+    is_archived = False
+    
+    # Rendered at save time (see news/rendering.py)
+    content_html = models.TextField(blank=True, editable=False)
+    content_text = models.TextField(blank=True, editable=False, help_text="Plain text for search")
+    summary = models.TextField(blank=True, editable=False, help_text="Excerpt, subtitle or start of content")
+    card_summary = models.TextField(blank=True, editable=False, help_text="Shorter summary for small cards")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False, help_text="Minutes")
+    
+    objects = NewsArticleQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-published_at', '-created_at']
         indexes = [
@@ -120,21 +170,41 @@ class NewsArticle(models.Model):
     def save(self, *args, **kwargs):
         if self.status == 'published' and not self.published_at:
             self.published_at = timezone.now()
-        super().save(*args, **kwargs)
         
-        # Resize image if too large
-        if self.featured_image:
+        # Re-render derived content unless only unrelated fields are saved
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(SOURCE_FIELDS):
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(RENDERED_FIELDS)
+        
+        # Resize new uploads before they are stored: stored blobs are shared
+        # and never modified in place (see news/storage.py)
+        if self.featured_image and not self.featured_image._committed:
             self.resize_image()
+        super().save(*args, **kwargs)
+    
+    def render_content(self):
+        """Fill content_html, summary, word count etc. from the source fields"""
+        for field, value in render_fields(self.content, self.excerpt, self.subtitle).items():
+            setattr(self, field, value)
     
     def resize_image(self):
-        """Resize featured image to optimize loading"""
-        if self.featured_image:
-            img_path = self.featured_image.path
-            if os.path.exists(img_path):
-                with Image.open(img_path) as img:
-                    if img.width > 1200 or img.height > 800:
-                        img.thumbnail((1200, 800), Image.Resampling.LANCZOS)
-                        img.save(img_path, optimize=True, quality=85)
+        """Shrink an uploaded featured image to fit 1200x800 before it is stored"""
+        upload = self.featured_image.file
+        upload.seek(0)
+        with Image.open(upload) as img:
+            if img.width <= 1200 and img.height <= 800:
+                upload.seek(0)
+                return
+            image_format = img.format or 'JPEG'
+            img.thumbnail((1200, 800), Image.Resampling.LANCZOS)
+            if image_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format, optimize=True, quality=85)
+        # Still uncommitted: the field stores the resized bytes when the article is saved
+        self.featured_image.file = ContentFile(buffer.getvalue(), name=self.featured_image.name)
 
 class ArticleImage(models.Model):
     """Additional images for articles"""
@@ -162,6 +232,14 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Approved comments of one article, newest first (article detail
+            # page). Partial rather than (article, is_approved, created_at):
+            # SQLite only uses an index column for `col = value`, and
+            # is_approved=True is compiled to a bare `"is_approved"` term.
+            models.Index(fields=['article', 'created_at'], condition=models.Q(is_approved=True),
+                         name='news_comment_approved_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.name} on {self.article.title}"
@@ -175,9 +253,9 @@ class NewsletterSubscriber(models.Model):
     def __str__(self):
         return self.email
 
-# Future model for store promotions
+# Store promotions, served from an in-memory interval index (see news/promotions.py)
 class StorePromotion(models.Model):
-    """For future store promotions feature"""
+    """Local store promotion shown between valid_from and valid_until"""
     store_name = models.CharField(max_length=200)
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -189,8 +267,200 @@ class StorePromotion(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Targeting: no categories / blank location means everywhere
+    categories = models.ManyToManyField(Category, blank=True, related_name='promotions')
+    location = models.CharField(max_length=100, blank=True, help_text="Only show on pages for this area")
+    weight = models.PositiveSmallIntegerField(default=1, help_text="Relative share when several promotions are live")
+    impressions = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'valid_until']),
+        ]
+    
+    def __str__(self):
+        return f"{self.store_name} - {self.title}"
+
+# Archive tier: old and archived articles are moved here in bulk (see news/archive.py)
+# so the hot NewsArticle table and its indexes stay small. Rows keep their
+# original primary keys and slugs (an earlier archived article with the same
+# slug is suffixed with its id), so old URLs and analytics ids still resolve.
+class ArchivedArticle(models.Model):
+    """Archived copy of a NewsArticle"""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    slug = models.SlugField(unique=True, max_length=250)
+    subtitle = models.CharField(max_length=300, blank=True)
+    content = models.TextField()
+    excerpt = models.TextField(max_length=500, blank=True)
+    
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='archived_articles')
+    tags = models.ManyToManyField(Tag, blank=True, related_name='archived_articles')
+    
+    featured_image = models.ImageField(upload_to='news_images/%Y/%m/', blank=True, null=True)
+    featured_image_alt = models.CharField(max_length=200, blank=True)
+    featured_image_caption = models.CharField(max_length=300, blank=True)
+    
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_articles')
+    status = models.CharField(max_length=20, choices=NewsArticle.STATUS_CHOICES, help_text="Status when archived")
+    priority = models.CharField(max_length=10, choices=NewsArticle.PRIORITY_CHOICES, default='normal')
+    
+    meta_description = models.CharField(max_length=160, blank=True)
+    meta_keywords = models.CharField(max_length=255, blank=True)
+    
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    published_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    views_count = models.PositiveIntegerField(default=0)
+    is_featured = models.BooleanField(default=False)
+    is_breaking = models.BooleanField(default=False)
+    location = models.CharField(max_length=100, blank=True)
+    
+    content_html = models.TextField(blank=True)
+    content_text = models.TextField(blank=True)
+    summary = models.TextField(blank=True)
+    word_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveSmallIntegerField(default=1)
+    
+    is_archived = True
+    
+    class Meta:
+        ordering = ['-published_at', '-created_at']
+        indexes = [
+            models.Index(fields=['status', 'published_at']),
+        ]
+    
+    def __str__(self):
+        return self.title
+    
+    def get_absolute_url(self):
+        return reverse('news:article_detail', kwargs={'slug': self.slug})
+
+class ArchivedArticleImage(models.Model):
+    """Additional images of an archived article"""
+    id = models.BigIntegerField(primary_key=True)
+    article = models.ForeignKey(ArchivedArticle, on_delete=models.CASCADE, related_name='images')
+    image = models.ImageField(upload_to='article_images/%Y/%m/')
+    caption = models.CharField(max_length=300, blank=True)
+    alt_text = models.CharField(max_length=200, blank=True)
+    order = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['order']
+    
+    def __str__(self):
+        return f"Image for {self.article.title}"
+
+class ArchivedComment(models.Model):
+    """Comments of an archived article (read-only)"""
+    id = models.BigIntegerField(primary_key=True)
+    article = models.ForeignKey(ArchivedArticle, on_delete=models.CASCADE, related_name='comments')
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    content = models.TextField(max_length=1000)
+    is_approved = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.store_name} - {self.title}"
\ No newline at end of file
+        return f"Comment by {self.name} on {self.article.title}"
+
+# Analytics rollups (filled by `manage.py aggregate_analytics`, see news/analytics.py)
+class TrafficStat(models.Model):
+    """Hourly event counts per article, category and location"""
+    hour = models.DateTimeField()
+    event = models.CharField(max_length=20)
+    # Plain ids rather than foreign keys so stats survive article deletion/archiving
+    article_id = models.BigIntegerField(default=0)
+    category_id = models.BigIntegerField(default=0)
+    location = models.CharField(max_length=100, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'event', 'article_id', 'category_id', 'location'],
+                name='unique_traffic_stat',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['article_id', 'hour']),
+            models.Index(fields=['category_id', 'hour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} @ {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+class SearchQueryStat(models.Model):
+    """Hourly search query counts, including how often a query found nothing"""
+    hour = models.DateTimeField()
+    query = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    zero_result_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-hour', '-count']
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'query'], name='unique_search_query_stat'),
+        ]
+    
+    def __str__(self):
+        return f'"{self.query}" @ {self.hour:%Y-%m-%d %H:00}: {self.count}'
+
+class AnalyticsSegment(models.Model):
+    """Segment files already rolled up, so a re-run never double counts"""
+    name = models.CharField(max_length=100, unique=True)
+    events = models.PositiveIntegerField(default=0)
+    processed_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+
+class MediaBlob(models.Model):
+    """One stored copy of an uploaded file, shared by every field that references it (news/storage.py)"""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name under blobs/")
+    digest = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the content")
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+# Near-duplicate detection (news/near_duplicates.py)
+class ArticleSignature(models.Model):
+    """MinHash signature of an article's text, and the older article it nearly duplicates"""
+    article = models.OneToOneField(NewsArticle, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()
+    text_hash = models.CharField(max_length=40, help_text="SHA-1 of the hashed text, to skip unchanged saves")
+    duplicate_of = models.ForeignKey(NewsArticle, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='near_duplicates')
+    similarity = models.FloatField(null=True, blank=True, help_text="Estimated Jaccard similarity to duplicate_of")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Signature of article {self.article_id}"
+
+class LSHBucket(models.Model):
+    """One band of an article's signature; articles sharing a bucket are duplicate candidates"""
+    band = models.PositiveSmallIntegerField()
+    key = models.BigIntegerField()
+    article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE, related_name='lsh_buckets')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'key']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'band'], name='unique_lsh_bucket_band'),
+        ]
+    
+    def __str__(self):
+        return f"Band {self.band} of article {self.article_id}"
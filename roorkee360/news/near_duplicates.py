@@ -0,0 +1,148 @@
+"""
+Near-duplicate article detection with MinHash and locality-sensitive hashing.
+
+An article's title and text are split into overlapping word shingles
+(SHINGLE_WORDS words each). Its signature holds, for each of NUM_PERM hash
+functions, the smallest hash over those shingles; the share of positions
+where two signatures agree estimates the Jaccard similarity of the shingle
+sets, whatever the article lengths.
+
+The signature is cut into BANDS bands of ROWS values. Each band is hashed
+into an LSHBucket row, so articles sharing any bucket are candidates: with
+16 bands of 4 rows a pair at 0.8 similarity shares a bucket with
+probability > 0.999, while dissimilar pairs almost never do. Saving an
+article therefore compares it with a handful of candidates found through the
+(band, key) index instead of every stored article.
+
+An article is flagged as a duplicate of the most similar older article (lower
+id) at or above NEAR_DUPLICATE_THRESHOLD. Flags are refreshed when an
+article's text changes (news/signals.py) and for everything by
+`manage.py find_near_duplicates`. Changing NUM_PERM, BANDS or SHINGLE_WORDS
+needs `find_near_duplicates --rebuild`.
+"""
+import hashlib
+import random
+import re
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArticleSignature, LSHBucket
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 4
+MIN_WORDS = 20  # shorter texts share too many shingles by chance
+
+# Universal hashing h(x) = (a * x + b) mod p, with fixed parameters so
+# signatures stay comparable across processes and deploys
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_rng = random.Random(360)
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# Devanagari vowel signs are not \w, so the block is listed explicitly
+WORD = re.compile(r'[\w\u0900-\u097f]+')
+
+
+def threshold():
+    return getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.8)
+
+
+def article_text(article):
+    return f'{article.title}\n{article.content_text}'
+
+
+def shingles(text):
+    """64-bit hashes of the overlapping word n-grams of text"""
+    words = WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return set()
+    grams = (' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+    return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), 'little') for g in grams}
+
+
+def minhash(hashes):
+    """Signature of a shingle set: NUM_PERM 32-bit minimums, or None for short texts"""
+    if not hashes:
+        return None
+    return array('I', [min((a * x + b) % _PRIME for x in hashes) & _MASK for a, b in PERMUTATIONS])
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(signature):
+    """(band, key) of every band of a signature; key is a signed 64-bit hash"""
+    raw = signature.tobytes()
+    width = ROWS * signature.itemsize
+    return [(band, int.from_bytes(hashlib.blake2b(raw[band * width:(band + 1) * width], digest_size=8).digest(),
+                                  'little', signed=True))
+            for band in range(BANDS)]
+
+
+def pack(signature):
+    return signature.tobytes()
+
+
+def unpack(data):
+    signature = array('I')
+    signature.frombytes(bytes(data))
+    return signature
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def best_match(article_id, signature, candidates):
+    """(id, similarity) of the most similar older candidate at or above the threshold, else (None, None)"""
+    limit = threshold()
+    matches = [(score, -other_id) for other_id, other in candidates
+               if other_id < article_id and (score := similarity(signature, other)) >= limit]
+    if not matches:
+        return None, None
+    score, other_id = max(matches)  # ties go to the oldest article
+    return -other_id, score
+
+
+@transaction.atomic
+def index_article(article):
+    """Store an article's signature and buckets and flag its nearest older duplicate"""
+    text = article_text(article)
+    digest = text_hash(text)
+    existing = ArticleSignature.objects.filter(article_id=article.pk).first()
+    if existing and existing.text_hash == digest:
+        return existing
+
+    signature = minhash(shingles(text))
+    LSHBucket.objects.filter(article_id=article.pk).delete()
+    duplicate_of, score = None, None
+    if signature is not None:
+        keys = band_keys(signature)
+        LSHBucket.objects.bulk_create([LSHBucket(article_id=article.pk, band=band, key=key) for band, key in keys])
+        duplicate_of, score = best_match(article.pk, signature, candidates(article.pk, keys))
+
+    row, _ = ArticleSignature.objects.update_or_create(article_id=article.pk, defaults={
+        'minhash': pack(signature) if signature is not None else b'',
+        'text_hash': digest,
+        'duplicate_of_id': duplicate_of,
+        'similarity': score,
+    })
+    return row
+
+
+def candidates(article_id, keys):
+    """(id, signature) of other articles sharing at least one bucket"""
+    match = Q()
+    for band, key in keys:
+        match |= Q(band=band, key=key)
+    ids = (LSHBucket.objects.filter(match).exclude(article_id=article_id)
+           .values_list('article_id', flat=True).distinct())
+    rows = ArticleSignature.objects.filter(article_id__in=ids).values_list('article_id', 'minhash')
+    return [(pk, unpack(data)) for pk, data in rows if data]
@@ -0,0 +1,233 @@
+"""
+Read-through cache of published articles keyed by slug.
+
+A compact snapshot (article columns minus the raw body and the view count,
+category, author name and tag list) is kept in two tiers: a small
+per-process LRU in front of the shared Django cache. Keys are versioned; saving an article, changing
+its tags or editing a category/tag/author bumps the version so stale
+snapshots are never read from the shared tier. Inside a transaction the
+bump is repeated on commit: a request that read the old row before the
+commit may have cached it under the new version. Other workers drop their
+per-process copies when the change reaches them over the invalidation bus
+(news/invalidation.py); ARTICLE_CACHE_L1_TTL bounds staleness without it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import NewsArticle, Category, Tag
+from . import invalidation
+
+
+SCHEMA_VERSION = 2
+MISSING = object()
+
+# Large columns never needed by the detail page, and the view counter,
+# which changes on every view without a save (article_detail_view reads it)
+SNAPSHOT_EXCLUDE = {'content', 'content_text', 'views_count'}
+ARTICLE_FIELDS = [f.attname for f in NewsArticle._meta.concrete_fields if f.attname not in SNAPSHOT_EXCLUDE]
+CATEGORY_FIELDS = [f.attname for f in Category._meta.concrete_fields]
+AUTHOR_FIELDS = ['id', 'username', 'first_name', 'last_name']
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry time to live"""
+
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drop every entry whose value matches predicate(value)"""
+        with self._lock:
+            for key in [k for k, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def make_snapshot(article):
+    """Compact, picklable representation of a fully loaded article"""
+    return (
+        tuple(getattr(article, name) if name != 'featured_image' else article.featured_image.name
+              for name in ARTICLE_FIELDS),
+        tuple(getattr(article.category, name) for name in CATEGORY_FIELDS),
+        tuple(getattr(article.author, name) for name in AUTHOR_FIELDS),
+        tuple((tag.id, tag.name, tag.slug) for tag in article.tags.all()),
+    )
+
+
+def hydrate(snapshot):
+    """Rebuild model instances from a snapshot without touching the database"""
+    article_values, category_values, author_values, tags = snapshot
+    # from_db() marks the missing fields (content, content_text, ...) as deferred
+    article = NewsArticle.from_db('default', ARTICLE_FIELDS, article_values)
+    article.category = Category.from_db('default', CATEGORY_FIELDS, category_values)
+    article.author = User.from_db('default', AUTHOR_FIELDS, author_values)
+
+    tag_objects = [Tag.from_db('default', ['id', 'name', 'slug'], values) for values in tags]
+    tag_queryset = article.tags.all()
+    tag_queryset._result_cache = tag_objects
+    tag_queryset._prefetch_done = True
+    article._prefetched_objects_cache = {'tags': tag_queryset}
+    return article
+
+
+class ArticleCache:
+    def __init__(self):
+        self.local = LRUCache(
+            maxsize=getattr(settings, 'ARTICLE_CACHE_L1_SIZE', 512),
+            ttl=getattr(settings, 'ARTICLE_CACHE_L1_TTL', 30),
+        )
+        self.timeout = getattr(settings, 'ARTICLE_CACHE_TIMEOUT', 3600)
+        self.alias = getattr(settings, 'ARTICLE_CACHE_ALIAS', 'default')
+        self.hits = {'local': 0, 'shared': 0, 'database': 0}
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    # Keys -----------------------------------------------------------------
+
+    def _generation_key(self):
+        return f'article:{SCHEMA_VERSION}:generation'
+
+    def _version_key(self, slug):
+        return f'article:{SCHEMA_VERSION}:version:{slug}'
+
+    def _slug_key(self, article_id):
+        return f'article:{SCHEMA_VERSION}:slug:{article_id}'
+
+    def _snapshot_key(self, slug, generation, version):
+        return f'article:{SCHEMA_VERSION}:{generation}:{version}:{slug}'
+
+    # Lookups --------------------------------------------------------------
+
+    def get_published(self, slug):
+        """Published article for slug (with category, author and tags), or None"""
+        snapshot = self.local.get(slug, MISSING)
+        if snapshot is not MISSING:
+            self.hits['local'] += 1
+            return hydrate(snapshot)
+
+        generation_key, version_key = self._generation_key(), self._version_key(slug)
+        versions = self.shared.get_many([generation_key, version_key])
+        snapshot_key = self._snapshot_key(slug, versions.get(generation_key, 0), versions.get(version_key, 0))
+
+        snapshot = self.shared.get(snapshot_key)
+        if snapshot is not None:
+            self.hits['shared'] += 1
+        else:
+            self.hits['database'] += 1
+            # From the primary: a lagging replica row would stay cached until the next save
+            article = (NewsArticle.objects
+                       .using('default')
+                       .select_related('category', 'author')
+                       .prefetch_related('tags')
+                       .defer(*SNAPSHOT_EXCLUDE)
+                       .filter(slug=slug, status='published')
+                       .first())
+            if article is None:
+                return None
+            snapshot = make_snapshot(article)
+            self.shared.set_many({
+                snapshot_key: snapshot,
+                self._slug_key(article.id): slug,
+            }, self.timeout)
+
+        self.local.set(slug, snapshot)
+        return hydrate(snapshot)
+
+    # Invalidation ---------------------------------------------------------
+
+    def _bump(self, key):
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.set(key, 1, None)
+
+    def _now_and_on_commit(self, callback):
+        callback()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(callback)
+
+    def invalidate_article(self, article):
+        """Drop cached snapshots for an article under its current and previous slug"""
+        self._now_and_on_commit(lambda: self._invalidate_slugs(article))
+
+    def _invalidate_slugs(self, article):
+        slugs = {article.slug}
+        previous_slug = self.shared.get(self._slug_key(article.id))
+        if previous_slug:
+            slugs.add(previous_slug)
+        for slug in slugs:
+            self._bump(self._version_key(slug))
+            self.local.delete(slug)
+
+    def invalidate_all(self):
+        """Category, tag or author edits affect many articles: start a new generation"""
+        self._now_and_on_commit(self._new_generation)
+
+    def _new_generation(self):
+        self._bump(self._generation_key())
+        self.local.clear()
+
+    # Changes made by other workers ------------------------------------------
+
+    def drop_local(self, article_ids=None):
+        """Forget per-process copies of articles another worker changed (None: all)"""
+        if article_ids is None:
+            self.local.clear()
+        else:
+            self.local.delete_where(lambda snapshot: snapshot[0][ID_INDEX] in article_ids)
+        # A local-memory "shared" tier is per process too, so it missed the bump
+        if isinstance(self.shared, LocMemCache):
+            if article_ids is None:
+                self._bump(self._generation_key())
+            else:
+                for slug in self.shared.get_many([self._slug_key(pk) for pk in article_ids]).values():
+                    self._bump(self._version_key(slug))
+
+
+ID_INDEX = ARTICLE_FIELDS.index('id')
+
+article_cache = ArticleCache()
+invalidation.bus.subscribe(invalidation.ARTICLE, article_cache.drop_local)
+for topic in (invalidation.CATEGORY, invalidation.TAG, invalidation.AUTHOR):
+    invalidation.bus.subscribe(topic, lambda ids: article_cache.drop_local())
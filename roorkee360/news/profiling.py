@@ -0,0 +1,109 @@
+"""
+Sampling request profiler.
+
+SamplingProfilerMiddleware runs a fraction of requests (PROFILING_SAMPLE_RATE)
+under cProfile, plus any request carrying a valid signed PROFILING_HEADER,
+and writes one pstats file per request to PROFILING_DIR/<view name>/.
+The directory is pruned oldest-first to stay under PROFILING_MAX_BYTES.
+
+Merge the dumps with `python manage.py profile_report`; create a header
+value with `python manage.py profile_report --token`.
+"""
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = 'news.profiling'
+TOKEN_MAX_AGE = 3600
+
+# cProfile cannot profile two threads at once, so only one request at a time
+_profile_lock = threading.Lock()
+
+
+def profiling_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_token():
+    """Signed value for the profiling header, valid for TOKEN_MAX_AGE seconds"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def valid_token(value):
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=TOKEN_MAX_AGE) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    name = (match.view_name if match else None) or 'unresolved'
+    return name.replace(':', '.').replace('/', '_')
+
+
+def prune(directory, max_bytes):
+    """Delete the oldest dumps until the directory fits in max_bytes"""
+    files = []
+    for path in directory.rglob('*.prof'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.header = 'HTTP_' + getattr(settings, 'PROFILING_HEADER', 'X-Profile').upper().replace('-', '_')
+        self.max_bytes = getattr(settings, 'PROFILING_MAX_BYTES', 50 * 1024 * 1024)
+
+    def __call__(self, request):
+        requested = self.header in request.META and valid_token(request.META[self.header])
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (requested or sampled) or not _profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            _profile_lock.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            self.dump(profiler, view_label(request), elapsed_ms)
+        except OSError as e:
+            logger.error(f'Could not write profile: {e}')
+
+        if requested:
+            response['X-Profiled'] = f'{elapsed_ms:.1f}ms'
+        return response
+
+    def dump(self, profiler, label, elapsed_ms):
+        directory = profiling_dir()
+        view_dir = directory / label
+        view_dir.mkdir(parents=True, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{int(elapsed_ms)}ms.prof'
+        tmp_path = view_dir / f'.{name}.tmp'
+        profiler.dump_stats(tmp_path)
+        os.replace(tmp_path, view_dir / name)
+        prune(directory, self.max_bytes)
@@ -0,0 +1,215 @@
+"""
+Serving store promotions.
+
+PromotionIndex loads every active promotion that has not ended into an
+interval structure: the sorted valid_from/valid_until boundaries split the
+timeline into segments, and each segment stores the promotions live during
+it, grouped by category (location matches are memoised per segment, for
+the locations its promotions target). "What
+is live at t for this category and location?" is a bisect over the
+boundaries plus dict lookups, O(log n).
+
+The answer for "now" only changes at the next boundary, so the current
+segment is remembered until then. The index is rebuilt when a promotion is
+saved or deleted, in this process (news/signals.py) and in the others over
+the invalidation bus (news/invalidation.py), and at least every
+PROMOTIONS_INDEX_TTL seconds.
+
+Impressions are counted in memory and written by a background thread with
+one UPDATE per promotion every PROMOTIONS_IMPRESSION_FLUSH_SECONDS (sooner
+after PROMOTIONS_IMPRESSION_FLUSH_COUNT impressions), plus at exit; requests
+never wait for the write.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StorePromotion
+from . import invalidation
+
+logger = logging.getLogger(__name__)
+
+ALL = None  # key for promotions without category / location targeting
+
+
+class Segment:
+    """Promotions live from `start` until `end` (None: open ended)"""
+
+    def __init__(self, start, end, promotions):
+        self.start = start
+        self.end = end
+        self.promotions = promotions
+        self._by_category = defaultdict(list)
+        for promo in promotions:
+            for category_id in promo.category_ids or [ALL]:
+                self._by_category[category_id].append(promo)
+        self._locations = {promo.location.lower() for promo in promotions if promo.location}
+        self._memo = {}
+
+    def live(self, category_id=None, location=None):
+        """
+        Promotions that may be shown on a page for category/location.
+
+        Untargeted promotions show everywhere; targeted ones only on pages
+        for one of their categories / their location.
+        """
+        # Any other category or location gets the untargeted promotions, so
+        # they share one entry and the memo stays bounded
+        location = (location or '').lower()
+        key = (category_id if category_id in self._by_category else ALL,
+               location if location in self._locations else '')
+        if key not in self._memo:
+            candidates = self._by_category[ALL]
+            if key[0] is not ALL:
+                candidates = sorted(candidates + self._by_category[key[0]], key=lambda p: p.pk)
+            self._memo[key] = [p for p in candidates if not p.location or p.location.lower() == key[1]]
+        return self._memo[key]
+
+
+class PromotionIndex:
+    def __init__(self):
+        self.ttl = getattr(settings, 'PROMOTIONS_INDEX_TTL', 60)
+        self._lock = threading.Lock()
+        self._boundaries = []
+        self._segments = []
+        self._loaded_at = None
+        self._current = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _load(self):
+        now = timezone.now()
+        promotions = list(StorePromotion.objects
+                          .filter(is_active=True, valid_until__gt=now)
+                          .prefetch_related('categories')
+                          .order_by('valid_from', 'id'))
+        for promo in promotions:
+            promo.category_ids = [c.id for c in promo.categories.all()]
+
+        boundaries = sorted({p.valid_from for p in promotions} | {p.valid_until for p in promotions})
+        segments = []
+        for i, start in enumerate(boundaries):
+            end = boundaries[i + 1] if i + 1 < len(boundaries) else None
+            live = [p for p in promotions if p.valid_from <= start < p.valid_until]
+            segments.append(Segment(start, end, live))
+
+        self._boundaries = boundaries
+        self._segments = segments
+        self._current = None
+        self._loaded_at = time.monotonic()
+
+    def segment_at(self, when):
+        """The segment containing `when`, or an empty one before the first boundary"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load()
+            current = self._current
+            if current and (current.start is None or current.start <= when) and (current.end is None or when < current.end):
+                return current
+            i = bisect_right(self._boundaries, when) - 1
+            if i < 0:
+                segment = Segment(None, self._boundaries[0] if self._boundaries else None, [])
+            else:
+                segment = self._segments[i]
+            self._current = segment
+            return segment
+
+    def live(self, category_id=None, location=None, when=None):
+        return self.segment_at(when or timezone.now()).live(category_id, location)
+
+    def next_change(self, when=None):
+        """When the set of live promotions next changes, or None"""
+        return self.segment_at(when or timezone.now()).end
+
+
+def weighted_sample(promotions, k=1, rng=random):
+    """Up to k distinct promotions, each draw proportional to its weight"""
+    pool = list(promotions)
+    picked = []
+    while pool and len(picked) < k:
+        cumulative = list(accumulate(max(p.weight, 1) for p in pool))
+        i = bisect_right(cumulative, rng.random() * cumulative[-1])
+        picked.append(pool.pop(min(i, len(pool) - 1)))
+    return picked
+
+
+class ImpressionBuffer:
+    def __init__(self):
+        self.flush_seconds = getattr(settings, 'PROMOTIONS_IMPRESSION_FLUSH_SECONDS', 30)
+        self.flush_count = getattr(settings, 'PROMOTIONS_IMPRESSION_FLUSH_COUNT', 500)
+        self._counts = Counter()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._due = threading.Event()
+        self._flusher = None
+
+    def add(self, promotions):
+        with self._lock:
+            for promo in promotions:
+                self._counts[promo.pk] += 1
+            self._pending += len(promotions)
+            if self._pending >= self.flush_count:
+                self._due.set()
+        self._ensure_flusher()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._pending = 0
+        try:
+            for pk, n in counts.items():
+                StorePromotion.objects.filter(pk=pk).update(impressions=F('impressions') + n)
+        except DatabaseError as e:
+            # Impressions are statistics; losing one flush is acceptable
+            logger.error(f'Could not write promotion impressions: {e}')
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name='impressions-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._due.wait(self.flush_seconds)
+            self._due.clear()
+            self.flush()
+            # This thread's connection would otherwise stay open between flushes
+            connections.close_all()
+
+    def _after_fork(self):
+        # Counts of the parent are flushed by the parent
+        self._lock = threading.Lock()
+        self._due = threading.Event()
+        self._counts = Counter()
+        self._pending = 0
+        self._flusher = None
+
+
+promotion_index = PromotionIndex()
+invalidation.bus.subscribe(invalidation.PROMOTION, lambda ids: promotion_index.invalidate())
+impressions = ImpressionBuffer()
+atexit.register(impressions.flush)
+os.register_at_fork(after_in_child=impressions._after_fork)
+
+
+def choose(category_id=None, location=None, k=1, count_impression=True):
+    """Pick k live promotions for a page and record the impressions"""
+    picked = weighted_sample(promotion_index.live(category_id, location), k)
+    if picked and count_impression:
+        impressions.add(picked)
+    return picked
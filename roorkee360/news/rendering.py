@@ -0,0 +1,134 @@
+"""
+Save-time rendering of article content.
+
+NewsArticle.save() calls render_fields() so templates can output the stored
+HTML, summaries and reading time instead of running |linebreaks and
+|truncatewords over the full body on every request.
+"""
+import math
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+
+try:
+    import markdown
+except ImportError:  # Markdown support is optional
+    markdown = None
+
+
+SUMMARY_WORDS = 20
+CARD_SUMMARY_WORDS = 15  # small cards: home sidebar, search results, related articles
+WORDS_PER_MINUTE = 200
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'em', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'li', 'ol', 'p', 'pre', 'strong', 'sub', 'sup', 'table', 'tbody',
+    'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRS = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+VOID_TAGS = {'br', 'hr'}
+SAFE_URL = re.compile(r'^(https?:|mailto:|/|#)', re.IGNORECASE)
+
+
+class _Sanitizer(HTMLParser):
+    """Allow-list HTML sanitiser: unknown tags are dropped, their text kept"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.skip_depth += 1
+            return
+        if tag not in ALLOWED_TAGS or self.skip_depth:
+            return
+        allowed = ALLOWED_ATTRS.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name == 'href' and not SAFE_URL.match(value.strip()):
+                continue
+            parts.append(f'{name}="{escape(value)}"')
+        if tag == 'a':
+            parts.append('rel="nofollow noopener"')
+        self.out.append(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self.skip_depth = max(0, self.skip_depth - 1)
+            return
+        if tag not in self.open_tags or self.skip_depth:
+            return
+        # Close any tags left open inside this one
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.out.append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.out.append(f'</{self.open_tags.pop()}>')
+        return ''.join(self.out)
+
+
+def sanitize_html(html):
+    parser = _Sanitizer()
+    parser.feed(html)
+    return parser.close()
+
+
+def render_html(content):
+    """Sanitised HTML for an article body (plain text or Markdown)"""
+    if getattr(settings, 'NEWS_CONTENT_FORMAT', 'text') == 'markdown' and markdown is not None:
+        return sanitize_html(markdown.markdown(content, extensions=['extra', 'sane_lists']))
+    # Same output as the {{ content|linebreaks }} filter used before
+    return linebreaks(content, autoescape=True)
+
+
+def html_to_text(html):
+    return ' '.join(unescape(strip_tags(html)).split())
+
+
+def truncate_words(text, words):
+    return Truncator(text).words(words, truncate=' …')
+
+
+def render_fields(content, excerpt='', subtitle=''):
+    """All derived fields for an article, as a dict of model field values"""
+    content_html = render_html(content or '')
+    content_text = html_to_text(content_html)
+    word_count = len(content_text.split())
+    summary_source = excerpt or subtitle or content_text
+    return {
+        'content_html': content_html,
+        'content_text': content_text,
+        'summary': truncate_words(summary_source, SUMMARY_WORDS),
+        'card_summary': truncate_words(summary_source, CARD_SUMMARY_WORDS),
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE)),
+    }
+
+
+RENDERED_FIELDS = ('content_html', 'content_text', 'summary', 'card_summary', 'word_count', 'reading_time')
+SOURCE_FIELDS = ('content', 'excerpt', 'subtitle')
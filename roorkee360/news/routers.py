@@ -0,0 +1,54 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+# Set by ReadReplicaMiddleware for requests that may be served from a replica
+_use_replica = ContextVar('news_use_replica', default=False)
+
+
+def replica_apps():
+    """Apps whose models may be read from a replica"""
+    return getattr(settings, 'READ_REPLICA_APPS', ('news',))
+
+
+def get_read_replicas():
+    """Database aliases configured as read replicas"""
+    return list(getattr(settings, 'DATABASE_READ_REPLICAS', []))
+
+
+def use_replica(enabled=True):
+    """Route reads in the current context to a replica; returns a reset token"""
+    return _use_replica.set(enabled)
+
+
+def reset_replica(token):
+    _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Send reads from the public news views to a read replica, everything else
+    (writes, admin, sticky requests) to the primary 'default' database.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_read_replicas()
+        if (replicas and _use_replica.get()
+                and model._meta.app_label in replica_apps()):
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so objects may relate freely
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are refreshed from the primary, never migrated directly
+        if db in get_read_replicas():
+            return False
+        return None
@@ -0,0 +1,231 @@
+"""
+Per-process cache of search results.
+
+A few queries make up most searches, so search_view keeps their results in
+memory instead of re-running the LIKE scan, the facet counts and the
+Paginator count. Queries are normalised first (case-folded, split into
+words, stop words dropped): "IIT  Roorkee", "iit roorkee" and "the IIT in
+Roorkee" share one entry, and the database is searched for the same terms
+(each must appear in the title, text, excerpt or subtitle).
+
+An entry holds the ordered ids of the matching published articles and the
+facet counts; a page is hydrated by primary key with in_bulk(), ten rows.
+
+Entries live in a segmented LRU bounded by the total number of stored ids
+(SEARCH_CACHE_MAX_IDS). New queries start on probation and move to the
+protected segment on their second hit, so a burst of one-off queries only
+evicts other one-off queries, never the popular ones.
+
+When an article is saved or deleted (in any worker, over the invalidation
+bus) the entries that contain it, or whose terms all appear in its new text,
+are dropped; category and tag edits drop everything. SEARCH_CACHE_TTL bounds
+staleness where the bus is not available. Hit rates are in
+/api/cache-stats/.
+"""
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import NewsArticle
+from .facets import apply_filters, facet_counts
+from . import invalidation
+
+# Devanagari vowel signs are not \w, so the block is listed explicitly
+WORD = re.compile(r'[\w\u0900-\u097f]+')
+
+STOP_WORDS = frozenset('''
+    a an and are as at be by for from has in is it of on or that the this to was were will with
+    का की के को में से है हैं और पर ने यह वह भी तथा एक
+'''.split())
+
+SEARCH_FIELDS = ('title', 'content_text', 'excerpt', 'subtitle')
+
+SearchResult = namedtuple('SearchResult', 'terms ids counts labels')
+
+
+def normalize_query(query):
+    """Search terms of a query: case-folded words without stop words, in order, once each"""
+    words = WORD.findall(query.casefold())
+    terms = [w for w in words if w not in STOP_WORDS] or words
+    if not terms:
+        # Only punctuation: search for it as typed
+        terms = [' '.join(query.casefold().split())]
+    return tuple(dict.fromkeys(terms))
+
+
+def terms_filter(terms):
+    """Q object matching articles that contain every term in one of SEARCH_FIELDS"""
+    condition = Q()
+    for term in terms:
+        any_field = Q()
+        for field in SEARCH_FIELDS:
+            any_field |= Q(**{f'{field}__icontains': term})
+        condition &= any_field
+    return condition
+
+
+class SegmentedLRU:
+    """Thread-safe segmented LRU bounded by the summed size of its entries"""
+
+    def __init__(self, capacity, protected_share=0.8, ttl=300):
+        self.capacity = capacity
+        self.protected_capacity = int(capacity * protected_share)
+        self.ttl = ttl
+        # key -> (expires, size, value), least recently used first
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._probation_size = 0
+        self._protected_size = 0
+        self._lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'promotions': 0, 'evictions': 0, 'rejected': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            protected = key in self._protected
+            segment = self._protected if protected else self._probation
+            entry = segment.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.counts['misses'] += 1
+                return default
+            self.counts['hits'] += 1
+            if protected:
+                segment.move_to_end(key)
+            else:
+                self._promote(key, entry)
+            return entry[2]
+
+    def set(self, key, value, size):
+        """Store value on probation; False when it is larger than the probation segment"""
+        if size > self.capacity - self.protected_capacity:
+            self.counts['rejected'] += 1
+            return False
+        with self._lock:
+            self._remove(key)
+            self._probation[key] = (time.monotonic() + self.ttl, size, value)
+            self._probation_size += size
+            self._evict()
+        return True
+
+    def _promote(self, key, entry):
+        del self._probation[key]
+        self._probation_size -= entry[1]
+        self._protected[key] = entry
+        self._protected_size += entry[1]
+        self.counts['promotions'] += 1
+        # Protected overflow gets another chance on probation
+        while self._protected_size > self.protected_capacity:
+            old_key, old_entry = self._protected.popitem(last=False)
+            self._protected_size -= old_entry[1]
+            self._probation[old_key] = old_entry
+            self._probation_size += old_entry[1]
+        self._evict()
+
+    def _evict(self):
+        while self._probation_size + self._protected_size > self.capacity and self._probation:
+            _, (_, size, _) = self._probation.popitem(last=False)
+            self._probation_size -= size
+            self.counts['evictions'] += 1
+
+    def _remove(self, key):
+        for segment in (self._probation, self._protected):
+            entry = segment.pop(key, None)
+            if entry is not None:
+                if segment is self._probation:
+                    self._probation_size -= entry[1]
+                else:
+                    self._protected_size -= entry[1]
+
+    def delete_where(self, predicate):
+        """Drop entries for which predicate(value) is true; returns how many"""
+        with self._lock:
+            stale = [key for segment in (self._probation, self._protected)
+                     for key, (_, _, value) in segment.items() if predicate(value)]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._probation.clear()
+            self._protected.clear()
+            self._probation_size = self._protected_size = 0
+
+    def stats(self):
+        lookups = self.counts['hits'] + self.counts['misses']
+        return dict(
+            self.counts,
+            hit_rate=round(self.counts['hits'] / lookups, 4) if lookups else 0.0,
+            entries=len(self._probation) + len(self._protected),
+            protected_entries=len(self._protected),
+            size=self._probation_size + self._protected_size,
+            capacity=self.capacity,
+        )
+
+    def __len__(self):
+        return len(self._probation) + len(self._protected)
+
+
+class SearchCache:
+    def __init__(self):
+        self.entries = SegmentedLRU(
+            capacity=getattr(settings, 'SEARCH_CACHE_MAX_IDS', 100000),
+            protected_share=getattr(settings, 'SEARCH_CACHE_PROTECTED_SHARE', 0.8),
+            ttl=getattr(settings, 'SEARCH_CACHE_TTL', 300),
+        )
+        self.invalidated = 0
+
+    def results(self, terms, filters):
+        """SearchResult for normalised terms and facet filters, from the cache or the database"""
+        key = (terms, tuple((name, tuple(values)) for name, values in sorted(filters.items())))
+        result = self.entries.get(key)
+        if result is None:
+            found = NewsArticle.objects.filter(terms_filter(terms), status='published')
+            matches = apply_filters(found, filters)
+            ids = array('q', matches.order_by('-published_at', '-created_at').values_list('id', flat=True))
+            counts, labels = facet_counts(found, filters)
+            result = SearchResult(terms, ids, counts, labels)
+            self.entries.set(key, result, len(ids) + sum(len(c) for c in counts.values()) + 1)
+        return result
+
+    def hydrate(self, ids):
+        """Article cards for a page of ids, in order"""
+        articles = NewsArticle.objects.cards().in_bulk(list(ids))
+        return [articles[pk] for pk in ids if pk in articles]
+
+    # Invalidation ---------------------------------------------------------
+
+    def articles_changed(self, ids=None):
+        """Drop results that may include or now match the given articles (None: all)"""
+        if not len(self.entries):
+            return
+        if ids is None:
+            self.invalidated += len(self.entries)
+            self.entries.clear()
+            return
+        texts = [
+            '\n'.join(value or '' for value in row).casefold()
+            for row in NewsArticle.objects.filter(pk__in=ids, status='published').values_list(*SEARCH_FIELDS)
+        ]
+
+        def stale(result):
+            return (any(pk in result.ids for pk in ids)
+                    or any(all(term in text for term in result.terms) for text in texts))
+
+        self.invalidated += self.entries.delete_where(stale)
+
+    def stats(self):
+        return dict(self.entries.stats(), invalidated=self.invalidated)
+
+
+search_cache = SearchCache()
+invalidation.bus.subscribe(invalidation.ARTICLE, search_cache.articles_changed)
+# Filters match category names and tag slugs, facets show their labels
+for topic in (invalidation.CATEGORY, invalidation.TAG):
+    invalidation.bus.subscribe(topic, lambda ids: search_cache.articles_changed())
@@ -0,0 +1,245 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    NewsArticle, Category, Tag, Comment, StorePromotion, ArticleImage,
+    ArchivedArticle, ArchivedArticleImage,
+)
+from .object_cache import article_cache
+from . import tag_stats
+from .promotions import promotion_index
+from . import live
+from . import near_duplicates
+from .invalidation import bus, ARTICLE, CATEGORY, TAG, COMMENT, PROMOTION, AUTHOR, ALL
+from .rendering import SOURCE_FIELDS
+
+
+@receiver([post_save, post_delete], sender=NewsArticle)
+def invalidate_article_cache(sender, instance, **kwargs):
+    article_cache.invalidate_article(instance)
+
+
+@receiver(m2m_changed, sender=NewsArticle.tags.through)
+def invalidate_article_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if reverse:
+        # tag.articles.add(...) changes several articles at once
+        article_cache.invalidate_all()
+    else:
+        article_cache.invalidate_article(instance)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver(post_save, sender=User)
+def invalidate_all_articles(sender, **kwargs):
+    if sender is User and kwargs.get('update_fields') == frozenset({'last_login'}):
+        return  # logging in does not change how authors are displayed
+    article_cache.invalidate_all()
+
+
+# Article state ------------------------------------------------------------
+
+# Fields whose transitions other handlers react to
+TRACKED_FIELDS = ('status', 'published_at', 'is_breaking')
+
+
+@receiver(pre_save, sender=NewsArticle)
+def remember_previous_state(sender, instance, raw, using, update_fields, **kwargs):
+    """Stash the tracked fields as stored before this save (None for new articles)"""
+    instance._previous_state = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(TRACKED_FIELDS) & set(update_fields):
+        instance._previous_state = {name: getattr(instance, name) for name in TRACKED_FIELDS}
+        return
+    instance._previous_state = (sender._base_manager.using(using)
+                                .filter(pk=instance.pk)
+                                .values(*TRACKED_FIELDS)
+                                .first())
+
+
+# Tag stats ----------------------------------------------------------------
+
+@receiver(post_save, sender=NewsArticle)
+def update_tag_stats_on_save(sender, instance, created, raw, **kwargs):
+    # A new article has no tag links yet; they arrive through m2m_changed
+    if raw or created:
+        return
+    tag_stats.article_state_changed(instance, getattr(instance, '_previous_state', None))
+
+
+@receiver(pre_delete, sender=NewsArticle)
+def update_tag_stats_on_delete(sender, instance, **kwargs):
+    # Tag links are cascade-deleted without m2m_changed; this also covers archiving
+    tag_stats.article_tags_changed(instance, instance.tags.values_list('id', flat=True), -1)
+
+
+@receiver(m2m_changed, sender=NewsArticle.tags.through)
+def update_tag_stats_on_link(sender, instance, action, reverse, pk_set, **kwargs):
+    own, other = ('tag_id', 'newsarticle_id') if reverse else ('newsarticle_id', 'tag_id')
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every pk it was given; keep only links that exist
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._tag_stats_unlinking = list(links.values_list(other, flat=True))
+        return
+    if action == 'post_add':
+        ids, sign = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        ids, sign = instance.__dict__.pop('_tag_stats_unlinking', []), -1
+    else:
+        return
+    if reverse:
+        tag_stats.tag_articles_changed(instance.pk, ids, sign)
+    else:
+        tag_stats.article_tags_changed(instance, ids, sign)
+
+
+# Promotions ---------------------------------------------------------------
+
+@receiver([post_save, post_delete], sender=StorePromotion)
+@receiver(m2m_changed, sender=StorePromotion.categories.through)
+def invalidate_promotion_index(sender, **kwargs):
+    # After commit, so a concurrent request cannot reload the old rows
+    transaction.on_commit(promotion_index.invalidate)
+
+
+# Live updates (news/live.py) ----------------------------------------------
+
+@receiver(post_save, sender=NewsArticle)
+def publish_breaking_change(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None) or {'status': None, 'is_breaking': False}
+    was_live = previous['is_breaking'] and previous['status'] == 'published'
+    is_live = instance.is_breaking and instance.status == 'published'
+    if was_live != is_live:
+        live.breaking_changed(instance)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_approval(sender, instance, raw, using, **kwargs):
+    instance._was_approved = False
+    if not raw and instance.pk is not None:
+        instance._was_approved = (sender._base_manager.using(using)
+                                  .filter(pk=instance.pk, is_approved=True).exists())
+
+
+@receiver(post_save, sender=Comment)
+def publish_approved_comment(sender, instance, raw, **kwargs):
+    # Admin bulk approval uses update(); CommentAdmin publishes those itself
+    if not raw and instance.is_approved and not getattr(instance, '_was_approved', False):
+        live.comment_approved(instance)
+
+
+# Other workers' in-process caches (news/invalidation.py) ------------------
+
+@receiver([post_save, post_delete], sender=NewsArticle)
+def broadcast_article_change(sender, instance, **kwargs):
+    bus.publish(ARTICLE, instance.pk)
+
+
+@receiver(m2m_changed, sender=NewsArticle.tags.through)
+def broadcast_article_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # From the tag side every linked article changes
+        bus.publish(ARTICLE, ALL if reverse else instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def broadcast_category_change(sender, instance, **kwargs):
+    bus.publish(CATEGORY, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def broadcast_tag_change(sender, instance, **kwargs):
+    bus.publish(TAG, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def broadcast_comment_change(sender, instance, **kwargs):
+    bus.publish(COMMENT, instance.article_id)
+
+
+@receiver([post_save, post_delete], sender=StorePromotion)
+@receiver(m2m_changed, sender=StorePromotion.categories.through)
+def broadcast_promotion_change(sender, instance, **kwargs):
+    bus.publish(PROMOTION, instance.pk if isinstance(instance, StorePromotion) else ALL)
+
+
+@receiver(post_save, sender=User)
+def broadcast_author_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields != frozenset({'last_login'}):
+        bus.publish(AUTHOR, instance.pk)
+
+
+# Near-duplicate detection (news/near_duplicates.py) ----------------------
+
+@receiver(post_save, sender=NewsArticle)
+def index_near_duplicates(sender, instance, raw, update_fields, **kwargs):
+    if raw or (update_fields is not None and not {'title', *SOURCE_FIELDS} & set(update_fields)):
+        return
+    # robust: a failed check is logged and must not fail the editor's save
+    transaction.on_commit(lambda: near_duplicates.index_article(instance), robust=True)
+
+
+# Media references (news/storage.py) ---------------------------------------
+
+FILE_FIELDS = {
+    NewsArticle: ['featured_image'],
+    ArticleImage: ['image'],
+    StorePromotion: ['image'],
+    ArchivedArticle: ['featured_image'],
+    ArchivedArticleImage: ['image'],
+}
+
+
+def _storage_call(model, field, method, names):
+    handler = getattr(model._meta.get_field(field).storage, method, None)
+    if handler and names:
+        handler(names)
+
+
+def remember_files(sender, instance, raw, using, **kwargs):
+    """Note stored names before the save, and names assigned without an upload"""
+    fields = FILE_FIELDS[sender]
+    previous = None
+    if not raw and instance.pk is not None:
+        previous = sender._base_manager.using(using).filter(pk=instance.pk).values_list(*fields).first()
+    instance._previous_files = dict(zip(fields, previous or [''] * len(fields)))
+    # Uploads are retained by the storage when committed; an existing name
+    # copied from elsewhere needs its own reference
+    instance._assigned_files = {
+        field: getattr(instance, field).name for field in fields
+        if getattr(instance, field) and getattr(instance, field)._committed
+        and getattr(instance, field).name != instance._previous_files[field]
+    }
+
+
+def update_file_references(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    for field in FILE_FIELDS[sender]:
+        old, new = instance._previous_files.get(field), getattr(instance, field).name
+        if field in instance._assigned_files:
+            _storage_call(sender, field, 'retain', [new])
+        if old and old != new:
+            transaction.on_commit(lambda field=field, old=old: _storage_call(sender, field, 'release', [old]))
+
+
+def release_file_references(sender, instance, **kwargs):
+    for field in FILE_FIELDS[sender]:
+        name = getattr(instance, field).name
+        if name:
+            transaction.on_commit(lambda field=field, name=name: _storage_call(sender, field, 'release', [name]))
+
+
+for model in FILE_FIELDS:
+    pre_save.connect(remember_files, sender=model, dispatch_uid=f'remember_files_{model.__name__}')
+    post_save.connect(update_file_references, sender=model, dispatch_uid=f'update_files_{model.__name__}')
+    post_delete.connect(release_file_references, sender=model, dispatch_uid=f'release_files_{model.__name__}')
@@ -0,0 +1,142 @@
+"""
+Content-addressed file storage.
+
+Uploads are streamed to a temporary file in chunks while being hashed, then
+stored once under blobs/<aa>/<sha256><ext>. Uploading a photo that is
+already stored just adds a reference: the MediaBlob row counts how many
+file fields point at each blob, and the file is deleted when the last
+reference goes (news/signals.py releases references on delete/replace).
+The blob file and its reference are only added once the transaction that
+saves the upload commits; a rolled-back save leaves a temporary file, which
+a later upload removes.
+
+Because a blob's name is its content hash, it never changes, so it is served
+with immutable cache headers (views.media_blob). Names outside blobs/ —
+files stored before this backend, see `manage.py dedupe_media` — behave as
+with FileSystemStorage and are never deleted automatically.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+# Temporary files this old belong to uploads whose transaction rolled back
+STALE_TMP_SECONDS = 24 * 60 * 60
+
+
+def blob_name(digest, ext):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{ext.lower()}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+def blob_digest(name):
+    """The SHA-256 digest encoded in a blob name"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # _save() picks the final name from the content; never add suffixes
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1][:10]
+        tmp_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        self._remove_stale_tmp(tmp_dir)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        name = blob_name(digest.hexdigest(), ext)
+        transaction.on_commit(lambda: self._place(name, tmp_path, size))
+        return name
+
+    def _place(self, name, tmp_path, size):
+        # Take the reference before placing the file, so a concurrent
+        # release of the last reference cannot delete it underneath us
+        self.retain([name], size=size)
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def _remove_stale_tmp(self, tmp_dir):
+        cutoff = time.time() - STALE_TMP_SECONDS
+        with os.scandir(tmp_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    # Reference counting ---------------------------------------------------
+
+    def retain(self, names, size=None):
+        """Add one reference per name (e.g. when a row is copied with its files)"""
+        from .models import MediaBlob
+
+        for name in filter(is_blob, names):
+            with transaction.atomic():
+                updated = MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+                if not updated:
+                    try:
+                        with transaction.atomic():
+                            MediaBlob.objects.create(
+                                name=name, digest=blob_digest(name), refcount=1,
+                                size=size if size is not None else self.size(name),
+                            )
+                    except IntegrityError:
+                        # Another upload of the same content created it first
+                        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+    def release(self, names):
+        """Drop one reference per name; blobs left without references are deleted"""
+        from .models import MediaBlob
+
+        for name in filter(is_blob, names):
+            with transaction.atomic():
+                MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+                orphaned = MediaBlob.objects.filter(name=name, refcount=0).delete()[0]
+            if orphaned:
+                super().delete(name)
+
+    def delete(self, name):
+        # Blobs may be shared; they go away when release() drops the last reference
+        if not is_blob(name):
+            super().delete(name)
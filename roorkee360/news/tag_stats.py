@@ -0,0 +1,144 @@
+"""
+Denormalised tag weights for tag pages and the tag cloud.
+
+TagStat holds, per tag, the number of published articles and a recency
+score. Both are adjusted by deltas from signal handlers (tag links added or
+removed, an article published, unpublished, re-dated or deleted) so reading
+the cloud is one small query and no write ever recounts the whole table.
+
+The recency score uses a fixed epoch: an article published at t contributes
+2 ** ((t - epoch) / half_life). Newer articles weigh exponentially more, and
+because a contribution never changes after publication it can be subtracted
+exactly when the article goes away. Ordering by the score ranks tags by
+recent activity; `rebuild_tag_stats` recomputes everything from scratch.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NewsArticle, Tag, TagStat
+
+
+RECENCY_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def recency_contribution(published_at):
+    if published_at is None:
+        return 0.0
+    half_life = getattr(settings, 'TAG_RECENCY_HALF_LIFE_DAYS', 30)
+    days = (published_at - RECENCY_EPOCH).total_seconds() / 86400
+    return 2.0 ** (days / half_life)
+
+
+def is_counted(status):
+    return status == 'published'
+
+
+def apply_delta(tag_ids, count, score):
+    """Add count/score to the stats of tag_ids, creating missing rows"""
+    tag_ids = list(tag_ids)
+    if not tag_ids or (not count and not score):
+        return
+    TagStat.objects.bulk_create([TagStat(tag_id=pk) for pk in tag_ids], ignore_conflicts=True)
+    TagStat.objects.filter(tag_id__in=tag_ids).update(
+        published_count=F('published_count') + count,
+        recency_score=F('recency_score') + score,
+        updated_at=timezone.now(),
+    )
+
+
+def article_tags_changed(article, tag_ids, sign):
+    """Tags were linked to (sign=1) or unlinked from (sign=-1) one article"""
+    if is_counted(article.status):
+        apply_delta(tag_ids, sign, sign * recency_contribution(article.published_at))
+
+
+def tag_articles_changed(tag_id, article_ids, sign):
+    """Articles were linked to or unlinked from one tag (tag.articles.add/remove)"""
+    published = NewsArticle.objects.filter(id__in=article_ids, status='published').values_list('published_at', flat=True)
+    dates = list(published)
+    if dates:
+        apply_delta([tag_id], sign * len(dates), sign * sum(recency_contribution(d) for d in dates))
+
+
+def article_state_changed(article, previous):
+    """An article was saved; previous holds its status and published_at before the save, or is None"""
+    old_counted = bool(previous) and is_counted(previous['status'])
+    old_published_at = previous['published_at'] if previous else None
+    new_counted = is_counted(article.status)
+    old_score = recency_contribution(old_published_at) if old_counted else 0.0
+    new_score = recency_contribution(article.published_at) if new_counted else 0.0
+    count = int(new_counted) - int(old_counted)
+    if count or old_score != new_score:
+        apply_delta(article.tags.values_list('id', flat=True), count, new_score - old_score)
+
+
+@transaction.atomic
+def merge_tags(source, target):
+    """Move every article from source to target, delete source; returns articles moved"""
+    if source.pk == target.pk:
+        return 0
+    through = NewsArticle.tags.through
+    already_tagged = through.objects.filter(tag=target).values('newsarticle_id')
+    moving = list(through.objects.filter(tag=source).exclude(newsarticle_id__in=already_tagged)
+                  .values_list('newsarticle_id', flat=True))
+
+    # Only the moved articles change target's weight; source's row goes with the tag
+    through.objects.bulk_create([through(newsarticle_id=pk, tag=target) for pk in moving])
+    tag_articles_changed(target.pk, moving, 1)
+    source.delete()
+    return len(moving)
+
+
+def rename_tag(tag, name, slug=None):
+    """Rename a tag; stats are keyed by tag id so they carry over unchanged"""
+    tag.name = name
+    if slug:
+        tag.slug = slug
+    tag.save(update_fields=['name', 'slug'])
+    return tag
+
+
+@transaction.atomic
+def rebuild_tag_stats():
+    """Recompute every TagStat from the link table; returns the number of tags"""
+    counts = {}
+    rows = (NewsArticle.tags.through.objects
+            .filter(newsarticle__status='published')
+            .values_list('tag_id', 'newsarticle__published_at'))
+    for tag_id, published_at in rows.iterator(chunk_size=2000):
+        count, score = counts.get(tag_id, (0, 0.0))
+        counts[tag_id] = (count + 1, score + recency_contribution(published_at))
+
+    TagStat.objects.all().delete()
+    TagStat.objects.bulk_create([
+        TagStat(tag_id=pk, published_count=counts.get(pk, (0, 0.0))[0], recency_score=counts.get(pk, (0, 0.0))[1])
+        for pk in Tag.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+    return len(counts)
+
+
+def tag_cloud(limit=30, by_recency=None):
+    """Top tags as dicts with tag, count and a 1-5 size step, ordered by name"""
+    if by_recency is None:
+        by_recency = getattr(settings, 'TAG_CLOUD_BY_RECENCY', False)
+    order = '-recency_score' if by_recency else '-published_count'
+    stats = list(TagStat.objects.filter(published_count__gt=0)
+                 .select_related('tag').order_by(order, 'tag__name')[:limit])
+    if not stats:
+        return []
+
+    weights = [s.recency_score if by_recency else s.published_count for s in stats]
+    # Log scale so one very busy tag does not flatten the rest
+    low, high = math.log1p(min(weights)), math.log1p(max(weights))
+    span = (high - low) or 1
+    cloud = [{
+        'tag': s.tag,
+        'count': s.published_count,
+        'size': 1 + round(4 * (math.log1p(w) - low) / span),
+    } for s, w in zip(stats, weights)]
+    return sorted(cloud, key=lambda item: item['tag'].name.lower())
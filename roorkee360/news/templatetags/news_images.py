@@ -0,0 +1,53 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from news.images import source_info, srcset_widths
+
+register = template.Library()
+
+
+def derivative_url(name, digest, width):
+    return reverse('news:image_derivative', kwargs={'digest': digest, 'width': width, 'name': name})
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', style='', loading='lazy', width=640):
+    """
+    Render an <img> with srcset/sizes, intrinsic width/height and lazy loading.
+
+    Usage: {% responsive_image article.featured_image alt=article.title sizes="(max-width: 768px) 100vw, 33vw" %}
+    `width` picks the fallback src for browsers without srcset support.
+    """
+    if not image:
+        return ''
+
+    attrs = [('alt', alt)]
+    if css_class:
+        attrs.append(('class', css_class))
+    if style:
+        attrs.append(('style', style))
+
+    info = source_info(image.name)
+    if info is None:
+        # Original not on local disk; fall back to the plain URL
+        attrs += [('src', image.url), ('loading', loading)]
+        return format_html('<img{}>', format_html_join('', ' {}="{}"', attrs))
+
+    digest, original_width, original_height = info
+    widths = srcset_widths(original_width)
+    fallback = min(widths, key=lambda pair: abs(pair[1] - int(width)))[0]
+    srcset = ', '.join(
+        f'{derivative_url(image.name, digest, w)} {rendered}w' for w, rendered in widths
+    )
+
+    attrs += [
+        ('src', derivative_url(image.name, digest, fallback)),
+        ('srcset', srcset),
+        ('sizes', sizes),
+        ('width', original_width),
+        ('height', original_height),
+        ('loading', loading),
+        ('decoding', 'async'),
+    ]
+    return format_html('<img{}>', format_html_join('', ' {}="{}"', attrs))
@@ -0,0 +1,36 @@
+from django import template
+
+from news import tag_stats, promotions
+
+register = template.Library()
+
+
+@register.inclusion_tag('news/_tag_cloud.html')
+def tag_cloud(limit=30, by_recency=None):
+    """
+    Weighted cloud of the most used tags, read from the precomputed TagStat table.
+
+    Usage: {% tag_cloud 40 %} or {% tag_cloud 20 by_recency=True %}
+    """
+    cloud = tag_stats.tag_cloud(limit, by_recency)
+    for item in cloud:
+        # Bootstrap's fs-6 is the smallest heading size, fs-2 the largest we use
+        item['css_class'] = f"fs-{7 - item['size']}"
+    return {'cloud': cloud}
+
+
+@register.inclusion_tag('news/_promotion.html', takes_context=True)
+def show_promotion(context, count=1):
+    """
+    Weighted pick of live store promotions for the current page.
+
+    Targets the page's `category` / `location`, or the `article`'s, when the
+    view provides them. Usage: {% show_promotion %} or {% show_promotion 2 %}
+    """
+    article = context.get('article')
+    category = context.get('category')
+    category_id = getattr(category, 'pk', None) or getattr(article, 'category_id', None)
+    location = context.get('location') or getattr(article, 'location', '')
+    if not isinstance(location, str):
+        location = ''
+    return {'promotions': promotions.choose(category_id, location, count)}
@@ -1,3 +1,949 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import addModuleCleanup, mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from . import (
+    analytics, api, archive, backups, facets, images, invalidation, live, near_duplicates, profiling, promotions,
+    routers, tag_stats,
+)
+from .management.commands import diagnose_queries, loadtest
+from .templatetags.news_images import responsive_image
+from .middleware import ReadReplicaMiddleware
+from .object_cache import article_cache, make_snapshot
+from .rendering import CARD_SUMMARY_WORDS, render_fields
+from .search_cache import SearchCache, SegmentedLRU, normalize_query
+from .view_tracking import BloomFilter, RotatingBloomFilter
+from .storage import ContentAddressedStorage
+from .models import (
+    ArchivedArticle, ArticleSignature, Category, LSHBucket, MediaBlob, NewsArticle, SearchQueryStat,
+    StorePromotion, Tag, TagStat, TrafficStat,
+)
+
+
+def setUpModule():
+    # Keep analytics events and cache invalidations away from the running site
+    directory = tempfile.TemporaryDirectory()
+    overrides = override_settings(
+        ANALYTICS_DIR=Path(directory.name) / 'analytics',
+        INVALIDATION_BUS_PATH=str(Path(directory.name) / 'invalidation.bus'),
+    )
+    overrides.enable()
+    addModuleCleanup(directory.cleanup)
+    addModuleCleanup(overrides.disable)
+
+
+def make_category(name='local_events', **fields):
+    fields.setdefault('display_name', name.replace('_', ' ').title())
+    return Category.objects.get_or_create(name=name, defaults=fields)[0]
+
+
+def make_author(username='reporter'):
+    return User.objects.get_or_create(username=username)[0]
+
+
+def make_article(title='Roorkee news', **fields):
+    fields.setdefault('slug', title.lower().replace(' ', '-'))
+    fields.setdefault('content', f'{title}. Story text.')
+    fields.setdefault('status', 'published')
+    fields.setdefault('category', make_category())
+    fields.setdefault('author', make_author())
+    return NewsArticle.objects.create(title=title, **fields)
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+
+
+class ArchivedArticleAdminTests(AdminTestCase):
+    def test_changelist_and_change_view(self):
+        article = ArchivedArticle.objects.create(
+            id=1, title='Old story', slug='old-story', content='Text', category=make_category(),
+            author=make_author(), status='published', created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        self.assertEqual(self.client.get(reverse('admin:news_archivedarticle_changelist')).status_code, 200)
+        response = self.client.get(reverse('admin:news_archivedarticle_change', args=[article.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'near duplicate')
+
+
+STORY = ('Heavy rain flooded the main market road near the clock tower in Roorkee on Monday morning, '
+         'and shopkeepers said water entered several stores before the municipal pumps arrived to clear '
+         'the drains along the canal bank while traffic was diverted through the civil lines area')
+
+
+class NearDuplicateTests(TestCase):
+    def test_signature_similarity_tracks_shared_text(self):
+        same = near_duplicates.minhash(near_duplicates.shingles(STORY))
+        edited = near_duplicates.minhash(near_duplicates.shingles(STORY + ' until late evening'))
+        other = near_duplicates.minhash(near_duplicates.shingles(
+            ' '.join(f'word{i}' for i in range(60))))
+        self.assertEqual(near_duplicates.similarity(same, same), 1.0)
+        self.assertGreater(near_duplicates.similarity(same, edited), 0.8)
+        self.assertLess(near_duplicates.similarity(same, other), 0.1)
+        self.assertEqual(near_duplicates.unpack(near_duplicates.pack(same)), same)
+
+    def test_short_text_has_no_signature(self):
+        self.assertIsNone(near_duplicates.minhash(near_duplicates.shingles('Too short to compare')))
+
+    def test_band_keys_match_for_equal_bands(self):
+        signature = near_duplicates.minhash(near_duplicates.shingles(STORY))
+        keys = near_duplicates.band_keys(signature)
+        self.assertEqual(len(keys), near_duplicates.BANDS)
+        self.assertEqual(keys, near_duplicates.band_keys(near_duplicates.unpack(near_duplicates.pack(signature))))
+
+    def test_index_article_flags_the_older_copy(self):
+        original = make_article('Rain floods market', content=STORY)
+        copy = make_article('Rain floods market', slug='rain-floods-market-2', content=STORY + ' today')
+        unrelated = make_article('Cricket final', content=' '.join(f'word{i}' for i in range(60)))
+        for article in (original, copy, unrelated):
+            near_duplicates.index_article(article)
+
+        self.assertIsNone(ArticleSignature.objects.get(article=original).duplicate_of)
+        self.assertEqual(ArticleSignature.objects.get(article=copy).duplicate_of, original)
+        self.assertIsNone(ArticleSignature.objects.get(article=unrelated).duplicate_of)
+        self.assertTrue(LSHBucket.objects.filter(article=copy).exists())
+
+
+class NearDuplicateAdminTests(AdminTestCase):
+    def test_article_changelist_shows_flag(self):
+        original = make_article('Rain floods market', content=STORY)
+        copy = make_article('Rain floods market', slug='rain-floods-market-2', content=STORY + ' today')
+        near_duplicates.index_article(original)
+        near_duplicates.index_article(copy)
+        response = self.client.get(reverse('admin:news_newsarticle_changelist'), {'near_duplicate': 'yes'})
+        self.assertContains(response, f'/admin/news/newsarticle/{copy.pk}/change/')
+        self.assertEqual(list(response.context['cl'].result_list), [copy])
+        response = self.client.get(reverse('admin:news_newsarticle_change', args=[copy.pk]))
+        self.assertContains(response, 'near duplicate of')
+
+
+class DiagnoseQueriesTests(TestCase):
+    def test_failing_page_is_recorded_and_the_sweep_continues(self):
+        get = Client.get
+
+        def broken(client, path, *args, **kwargs):
+            if path == '/broken/':
+                raise ValueError('boom')
+            return get(client, path, *args, **kwargs)
+
+        command = diagnose_queries.Command(stdout=io.StringIO())
+        with mock.patch.object(Client, 'get', broken):
+            statements = command.capture([('broken', '/broken/', False), ('news.home', reverse('news:home'), False)])
+        self.assertEqual(command.failures, [('/broken/', 'ValueError: boom')])
+        self.assertTrue(any('news.home' in s['sources'] for s in statements.values()))
+
+    def test_muted_bus_publishes_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with invalidation.bus.muted():
+                invalidation.bus.publish(invalidation.ARTICLE, 1)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(getattr(invalidation.bus._pending, 'muted', False))
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.sports = make_category('sports')
+        self.civil = make_article('Canal walk', location='Civil Lines')
+        self.iit = make_article('Convocation', location='IIT Roorkee')
+        self.lower = make_article('Market day', location='civil lines', category=self.sports)
+
+    def test_parse_filters(self):
+        request = RequestFactory().get('/', {'tag': ['b', 'a', 'b', ''], 'location': 'Civil Lines', 'page': '2'})
+        self.assertEqual(facets.parse_filters(request), {'tag': ['a', 'b'], 'location': ['civil lines']})
+        self.assertEqual(facets.parse_filters(request, exclude=('tag',)), {'location': ['civil lines']})
+
+    def test_month_range(self):
+        start, end = facets._month_range('2024-12')
+        self.assertEqual((start.year, start.month, end.year, end.month), (2024, 12, 2025, 1))
+        self.assertIsNone(facets._month_range('9999-12'))
+        self.assertIsNone(facets._month_range('2024-13'))
+
+    def test_month_overflow_is_an_invalid_filter(self):
+        response = self.client.get(reverse('news:search'), {'q': 'canal', 'month': '9999-12'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('news:category', args=['local_events']), {'month': '9999-12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['articles']), [])
+
+    def test_locations_match_ignoring_case(self):
+        published = NewsArticle.objects.filter(status='published')
+        matched = facets.apply_filters(published, {'location': ['civil lines']})
+        self.assertEqual(set(matched), {self.civil, self.lower})
+        counts, labels = facets.facet_counts(published)
+        self.assertEqual(counts['location'], {'civil lines': 2, 'iit roorkee': 1})
+        response = self.client.get(reverse('news:location', args=['CIVIL LINES']))
+        self.assertEqual(set(response.context['articles']), {self.civil, self.lower})
+
+    def test_facet_is_counted_without_its_own_filter(self):
+        published = NewsArticle.objects.filter(status='published')
+        counts, _ = facets.facet_counts(published, {'location': ['iit roorkee']})
+        # Other locations keep their counts, so they can be OR-ed in
+        self.assertEqual(counts['location'], {'civil lines': 2, 'iit roorkee': 1})
+        self.assertEqual(counts['category'], {'local_events': 1})
+
+        counts, _ = facets.facet_counts(published, {'location': ['iit roorkee'], 'category': ['sports']})
+        self.assertEqual(counts['location'], {'civil lines': 1})
+        self.assertEqual(counts['category'], {'local_events': 1})
+
+    def test_location_with_a_slash(self):
+        article = make_article('Station road works', location='Civil Lines / Station Road')
+        url = reverse('news:location', args=[article.location])
+        self.assertContains(self.client.get(reverse('news:article_detail', args=[article.slug])), f'href="{url}"')
+        self.assertEqual(list(self.client.get(url).context['articles']), [article])
+
+
+class ArticleCacheTests(TestCase):
+    def setUp(self):
+        article_cache.shared.clear()
+        article_cache.local.clear()
+
+    def test_read_before_commit_is_invalidated_on_commit(self):
+        article = make_article('Old title')
+        self.assertEqual(article_cache.get_published(article.slug).title, 'Old title')
+        stale = make_snapshot(article_cache.get_published(article.slug))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.title = 'New title'
+            article.save()
+            # Another request still sees the old row and caches it under the new version
+            generation = article_cache.shared.get(article_cache._generation_key(), 0)
+            version = article_cache.shared.get(article_cache._version_key(article.slug), 0)
+            article_cache.shared.set(article_cache._snapshot_key(article.slug, generation, version), stale)
+            article_cache.local.set(article.slug, stale)
+
+        self.assertEqual(article_cache.get_published(article.slug).title, 'New title')
+
+    def test_view_count_is_not_cached(self):
+        article = make_article('Counted')
+        misses = article_cache.hits['database']
+        with mock.patch('news.view_tracking._view_filter', RotatingBloomFilter()):
+            for visitor, expected in (('10.0.0.1', '1 views'), ('10.0.0.2', '2 views'), ('10.0.0.2', '2 views')):
+                response = self.client.get(reverse('news:article_detail', args=[article.slug]), REMOTE_ADDR=visitor)
+                self.assertContains(response, expected)
+        self.assertEqual(article_cache.hits['database'], misses + 1)
+
+
+def make_promotion(title, **fields):
+    fields.setdefault('valid_from', timezone.now() - timedelta(days=1))
+    fields.setdefault('valid_until', timezone.now() + timedelta(days=1))
+    return StorePromotion.objects.create(store_name='Store', title=title, description='Offer', **fields)
+
+
+class PromotionTests(TestCase):
+    def test_segment_targets_and_bounded_memo(self):
+        everywhere = make_promotion('Everywhere')
+        civil = make_promotion('Civil Lines only', location='Civil Lines')
+        for promo in (everywhere, civil):
+            promo.category_ids = []
+        segment = promotions.Segment(None, None, [everywhere, civil])
+
+        self.assertEqual(segment.live(location='CIVIL LINES'), [everywhere, civil])
+        for i in range(100):
+            self.assertEqual(segment.live(category_id=1000 + i, location=f'street {i}'), [everywhere])
+        self.assertEqual(len(segment._memo), 2)
+
+    def test_index_live_now(self):
+        live = make_promotion('Live')
+        make_promotion('Later', valid_from=timezone.now() + timedelta(hours=1))
+        index = promotions.PromotionIndex()
+        self.assertEqual(index.live(), [live])
+        self.assertIsNotNone(index.next_change())
+
+    def test_impressions_are_written_off_the_request_path(self):
+        promo = make_promotion('Counted')
+        buffer = promotions.ImpressionBuffer()
+        buffer.flush_count = 2
+        with mock.patch.object(buffer, '_ensure_flusher'):
+            buffer.add([promo])
+            self.assertFalse(buffer._due.is_set())
+            buffer.add([promo])
+        self.assertTrue(buffer._due.is_set())
+        promo.refresh_from_db()
+        self.assertEqual(promo.impressions, 0)
+        buffer.flush()
+        promo.refresh_from_db()
+        self.assertEqual(promo.impressions, 2)
+
+
+class EventLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.log = analytics.EventLog(self.directory)
+        self.log._ensure_flusher = lambda: None
+
+    def test_record_does_not_wait_for_a_write(self):
+        self.log.record(analytics.VIEW, a=1)
+        writing, release = threading.Event(), threading.Event()
+        write = self.log._write
+
+        def slow_write(data):
+            writing.set()
+            release.wait(5)
+            write(data)
+
+        self.log._write = slow_write
+        flusher = threading.Thread(target=self.log.flush)
+        flusher.start()
+        self.assertTrue(writing.wait(5))
+        started = time.monotonic()
+        self.log.record(analytics.VIEW, a=2)
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+        flusher.join()
+
+        self.log.seal()
+        lines = [json.loads(line) for path in self.directory.glob('*.jsonl') for line in path.read_text().splitlines()]
+        self.assertEqual([line['a'] for line in lines], [1, 2])
+
+    def test_segments_roll_up_once(self):
+        for _ in range(3):
+            self.log.record(analytics.VIEW, a=5, c=1, l='Civil Lines')
+        self.log.record(analytics.SEARCH, q='canal', n=4)
+        self.log.record(analytics.ZERO_RESULT_SEARCH, q='canal', n=0)
+        self.log.seal()
+        with override_settings(ANALYTICS_DIR=self.directory):
+            call_command('aggregate_analytics', stdout=io.StringIO())
+            call_command('aggregate_analytics', stdout=io.StringIO())
+        view = TrafficStat.objects.get(event=analytics.VIEW)
+        self.assertEqual((view.article_id, view.location, view.count), (5, 'Civil Lines', 3))
+        search = SearchQueryStat.objects.get(query='canal')
+        self.assertEqual((search.count, search.zero_result_count), (2, 1))
+        self.assertEqual(list(self.directory.glob('events-*')), [])
+
+
+class ReadReplicaMiddlewareTests(TestCase):
+    def test_streaming_body_is_read_from_the_replica(self):
+        def view(request):
+            return StreamingHttpResponse(str(routers._use_replica.get()) for _ in range(2))
+        view.__module__ = 'news.api'
+
+        request = RequestFactory().get('/api/articles/export.ndjson')
+        middleware = ReadReplicaMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        response = middleware(request)
+        self.assertFalse(routers._use_replica.get())
+        self.assertEqual(b''.join(response.streaming_content), b'TrueTrue')
+        self.assertFalse(routers._use_replica.get())
+
+    @override_settings(DATABASE_READ_REPLICAS=['replica'])
+    def test_router_sends_only_flagged_reads_to_the_replica(self):
+        router = routers.ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(NewsArticle), 'default')
+        token = routers.use_replica()
+        try:
+            self.assertEqual(router.db_for_read(NewsArticle), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(NewsArticle), 'default')
+        finally:
+            routers.reset_replica(token)
+        self.assertFalse(router.allow_migrate('replica', 'news'))
+        self.assertIsNone(router.allow_migrate('default', 'news'))
+
+    @override_settings(DATABASE_READ_REPLICAS=['replica'])
+    def test_writes_pin_the_client_to_the_primary(self):
+        def view(request):
+            return HttpResponse(str(routers._use_replica.get()))
+        view.__module__ = 'news.views'
+        middleware = ReadReplicaMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+
+        response = middleware(RequestFactory().post('/article/story/'))
+        self.assertEqual(response.content, b'False')
+        self.assertEqual(response.cookies['db_primary']['max-age'], 15)
+
+        self.assertEqual(middleware(RequestFactory().get('/')).content, b'True')
+        request = RequestFactory().get('/')
+        request.COOKIES['db_primary'] = '1'
+        self.assertEqual(middleware(request).content, b'False')
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def blob_files(self):
+        return sorted(p.relative_to(self.root).as_posix() for p in (self.root / 'blobs').glob('??/*'))
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def test_blob_is_placed_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            name = self.storage.save('photo.JPG', ContentFile(b'photo bytes'))
+            self.assertTrue(name.startswith('blobs/') and name.endswith('.jpg'))
+            self.assertEqual(self.blob_files(), [])
+            self.assertFalse(MediaBlob.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.blob_files(), [name])
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+        # The same content again only adds a reference
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.storage.save('copy.jpg', ContentFile(b'photo bytes')), name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+        self.storage.release([name])
+        self.assertTrue(self.storage.exists(name))
+        self.storage.release([name])
+        self.assertFalse(self.storage.exists(name))
+
+    def test_rolled_back_upload_leaves_no_blob(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.storage.save('photo.jpg', ContentFile(b'never committed'))
+        self.assertEqual(self.blob_files(), [])
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class DedupeMediaTests(MediaTestCase):
+    def test_without_rewriting_references_no_blobs_are_made(self):
+        for name in ('a/one.jpg', 'b/two.jpg'):
+            (self.root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / name).write_bytes(b'same content')
+        with override_settings(MEDIA_ROOT=str(self.root)):
+            call_command('dedupe_media', stdout=io.StringIO())
+        self.assertFalse((self.root / 'blobs').exists())
+        self.assertTrue((self.root / 'a/one.jpg').samefile(self.root / 'b/two.jpg'))
+
+
+class ArchiveTests(TestCase):
+    def test_archived_status_articles_stay_readable(self):
+        article = make_article('Old festival', status='archived')
+        make_article('Old draft', status='draft')
+        self.assertEqual(archive.archive_articles(archive.archive_candidates(older_than_months=0)), 1)
+        self.assertFalse(NewsArticle.objects.filter(pk=article.pk).exists())
+        response = self.client.get(reverse('news:article_detail', args=[article.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Old festival')
+
+    def test_reused_slug_keeps_pointing_at_the_latest_article(self):
+        first = make_article('Budget', content='Last year.', status='archived')
+        archive.archive_batch([first.pk])
+        second = make_article('Budget', content='This year.')
+        # Before archiving, the URL shows the live article
+        self.assertContains(self.client.get(reverse('news:article_detail', args=['budget'])), 'This year.')
+        third = make_article('Market', status='archived')
+        with self.assertLogs('news.archive', 'WARNING'):
+            self.assertEqual(archive.archive_batch([second.pk, third.pk]), 2)
+
+        self.assertEqual(ArchivedArticle.objects.get(pk=second.pk).slug, 'budget')
+        self.assertEqual(ArchivedArticle.objects.get(pk=first.pk).slug, f'budget-{first.pk}')
+        self.assertEqual(ArchivedArticle.objects.get(pk=third.pk).slug, 'market')
+        self.assertContains(self.client.get(reverse('news:article_detail', args=['budget'])), 'This year.')
+        response = self.client.get(reverse('news:article_detail', args=[f'budget-{first.pk}']))
+        self.assertContains(response, 'Last year.')
+
+
+class InvalidationBusTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'bus')
+        with override_settings(INVALIDATION_BUS_PATH=self.path, INVALIDATION_BUS_MAX_IDS=4,
+                               INVALIDATION_BUS_SLOTS=16):
+            # Two workers sharing the file
+            self.writer, self.reader = invalidation.InvalidationBus(), invalidation.InvalidationBus()
+        self.received = []
+        for topic in (invalidation.ARTICLE, invalidation.LIVE_COMMENT):
+            self.reader.subscribe(topic, lambda ids, topic=topic: self.received.append((topic, ids)))
+        self.assertEqual(self.reader.poll(), 0)
+
+    def test_events_reach_the_other_worker(self):
+        self.writer.publish(invalidation.ARTICLE, 7)
+        self.writer.publish(invalidation.ARTICLE, 8)
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(self.reader.poll(), 2)
+        self.assertEqual(self.received, [(invalidation.ARTICLE, {7, 8})])
+        self.assertEqual(self.reader.poll(), 0)
+
+    def test_many_ids_collapse_except_for_live_topics(self):
+        for pk in range(1, 11):
+            self.writer.publish(invalidation.ARTICLE, pk)
+            self.writer.publish(invalidation.LIVE_COMMENT, pk)
+        self.writer.flush()
+        self.reader.poll()
+        self.assertEqual(dict(self.received), {invalidation.ARTICLE: None,
+                                               invalidation.LIVE_COMMENT: set(range(1, 11))})
+
+    def test_events_wait_for_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.writer.publish(invalidation.ARTICLE, 7)
+            with self.writer.muted():
+                self.writer.publish(invalidation.ARTICLE, 8)
+        self.assertEqual(self.reader.poll(), 0)
+        for callback in callbacks:
+            callback()
+        self.reader.poll()
+        self.assertEqual(self.received, [(invalidation.ARTICLE, {7})])
+
+    def test_lapped_reader_drops_everything(self):
+        for pk in range(1, 21):
+            self.writer.publish(invalidation.LIVE_COMMENT, pk)
+        self.writer.flush()
+        self.assertEqual(self.reader.poll(), 0)
+        self.assertEqual(sorted(self.received), [(invalidation.ARTICLE, None), (invalidation.LIVE_COMMENT, None)])
+        self.assertEqual(self.reader.stats()['resets'], 1)
+
+    def test_recreated_file_drops_everything(self):
+        with override_settings(INVALIDATION_BUS_PATH=self.path, INVALIDATION_BUS_SLOTS=32):
+            self.assertTrue(invalidation.InvalidationBus().available())
+        self.assertEqual(self.reader.poll(), 0)
+        self.assertEqual(self.reader.stats()['resets'], 1)
+
+
+class LiveTests(TestCase):
+    def test_breaking_change_from_another_worker_reaches_clients(self):
+        article = make_article('Canal breach', is_breaking=True)
+        with mock.patch.object(live.broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(live.broker, 'publish') as publish:
+            live._breaking_from_bus({article.pk})
+            live._breaking_from_bus(None)
+        publish.assert_called_once()
+        channel, event, data = publish.call_args.args
+        self.assertEqual((channel, event), (live.BREAKING, 'breaking'))
+        self.assertEqual((data['id'], data['is_breaking']), (article.pk, True))
+
+    def test_breaking_change_is_announced_on_the_bus(self):
+        with mock.patch.object(invalidation.bus, 'available', return_value=True), \
+                mock.patch.object(invalidation.bus, 'publish') as publish:
+            article = make_article('Canal breach', is_breaking=True)
+        publish.assert_any_call(invalidation.LIVE_BREAKING, article.pk)
+
+
+class RenderingTests(TestCase):
+    def test_summaries_are_stored_at_save_time(self):
+        fields = render_fields(' '.join(f'word{i}' for i in range(40)))
+        self.assertEqual(fields['summary'].split()[-2:], ['word19', '…'])
+        self.assertEqual(len(fields['card_summary'].split()), CARD_SUMMARY_WORDS + 1)
+        self.assertEqual(render_fields('Body', excerpt='Short excerpt')['card_summary'], 'Short excerpt')
+
+    def test_related_cards_show_the_stored_summary(self):
+        article = make_article('Main story')
+        make_article('Related story', excerpt='Stored card text ' * 10)
+        response = self.client.get(reverse('news:article_detail', args=[article.slug]))
+        self.assertContains(response, NewsArticle.objects.get(slug='related-story').card_summary)
+
+
+class ViewTrackingTests(TestCase):
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = [f'visitor:{i}'.encode() for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other:{i}'.encode() in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotation_forgets_after_the_window(self):
+        now = [0.0]
+        seen = RotatingBloomFilter(window=60, capacity=100, slices=3, clock=lambda: now[0])
+        self.assertFalse(seen.check_and_add(b'a'))
+        now[0] = 59
+        self.assertTrue(seen.check_and_add(b'a'))
+        now[0] = 121  # more than window + one slice after the first view
+        self.assertFalse(b'a' in seen)
+        self.assertFalse(seen.check_and_add(b'a'))
+
+    def test_repeat_views_count_once(self):
+        article = make_article('Counted once')
+        with mock.patch('news.view_tracking._view_filter', RotatingBloomFilter()):
+            for _ in range(3):
+                self.client.get(reverse('news:article_detail', args=[article.slug]), REMOTE_ADDR='10.0.0.1')
+            self.client.get(reverse('news:article_detail', args=[article.slug]), REMOTE_ADDR='10.0.0.2')
+        article.refresh_from_db()
+        self.assertEqual(article.views_count, 2)
+
+
+class ResponsiveImageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(MEDIA_ROOT=str(self.root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = 'news_images/2025/09/photo.png'
+        (self.root / self.name).parent.mkdir(parents=True)
+        PILImage.new('RGB', (700, 350), (200, 30, 30)).save(self.root / self.name)
+        self.image = FieldFile(None, NewsArticle._meta.get_field('featured_image'), self.name)
+
+    def test_srcset_never_upscales(self):
+        self.assertEqual(images.srcset_widths(700), [(320, 320), (480, 480), (640, 640), (960, 700)])
+        self.assertEqual(images.srcset_widths(200), [(320, 200)])
+
+    def test_tag_and_derivative(self):
+        html = responsive_image(self.image, alt='Photo', width=480)
+        digest = images.source_info(self.name)[0]
+        self.assertIn('width="700" height="350" loading="lazy"', html)
+        self.assertIn(f'/img/{digest}/960/{self.name} 700w', html)
+        self.assertIn(f'src="/img/{digest}/480/{self.name}"', html)
+
+        response = self.client.get(f'/img/{digest}/320/{self.name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        with PILImage.open(io.BytesIO(b''.join(response.streaming_content))) as derivative:
+            self.assertEqual(derivative.size, (320, 160))
+
+        self.assertEqual(self.client.get(f'/img/{digest}/333/{self.name}').status_code, 404)
+        self.assertEqual(self.client.get(f'/img/{"0" * 32}/320/{self.name}').status_code, 404)
+
+
+class ArticlesApiTests(TestCase):
+    def setUp(self):
+        self.articles = [make_article(f'Story {i}', location='Civil Lines' if i % 2 else 'Ramnagar') for i in range(5)]
+        make_article('Unpublished', status='draft')
+
+    def test_cursor_round_trip(self):
+        article = self.articles[0]
+        self.assertEqual(api.decode_cursor(api.encode_cursor(article)), (article.updated_at, article.id))
+        for bad in ('', 'not-base64!', api.encode_cursor(article)[:-3]):
+            with self.assertRaises(api.ApiError):
+                api.decode_cursor(bad)
+
+    def test_pages_follow_the_cursor(self):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, 'fields': 'id,title'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('news:api_articles'), params).json()
+            self.assertTrue(all(set(item) == {'id', 'title'} for item in data['results']))
+            seen += [item['id'] for item in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [a.id for a in self.articles])
+
+    def test_filters_and_errors(self):
+        data = self.client.get(reverse('news:api_articles'), {'location': 'ramnagar'}).json()
+        self.assertEqual(len(data['results']), 3)
+        for params in ({'fields': 'id,body'}, {'cursor': 'x'}, {'limit': 'ten'}, {'since': 'yesterday'}):
+            self.assertEqual(self.client.get(reverse('news:api_articles'), params).status_code, 400)
+
+    def test_export_streams_one_object_per_line(self):
+        response = self.client.get(reverse('news:api_articles_export'), {'fields': 'id,tags'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': a.id, 'tags': []} for a in self.articles])
+
+
+class LoadTestTests(TestCase):
+    def test_percentile(self):
+        values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        self.assertEqual(loadtest.percentile([], 50), 0.0)
+        self.assertEqual(loadtest.percentile(values, 50), 5)
+        self.assertEqual(loadtest.percentile(values, 99), 10)
+
+    def test_plan_follows_the_mix(self):
+        make_article('Market reopens')
+        mix = dict(loadtest.DEFAULT_MIX, comment=0)
+        plan = loadtest.Command().build_plan(200, mix, random.Random(0))
+        self.assertEqual(len(plan), 200)
+        self.assertEqual(plan, loadtest.Command().build_plan(200, mix, random.Random(0)))
+        kinds = {spec[0] for spec in plan}
+        self.assertEqual(kinds, {'home', 'category', 'detail', 'search'})
+        self.assertIn(('detail', 'GET', '/article/market-reopens/', ''), plan)
+
+    def test_plan_needs_articles(self):
+        with self.assertRaisesMessage(CommandError, 'No published articles'):
+            loadtest.Command().build_plan(10, loadtest.DEFAULT_MIX, random.Random(0))
+
+    def test_request_count_must_be_positive(self):
+        for options in ({'requests': 0}, {'concurrency': 0}):
+            with self.assertRaisesMessage(CommandError, 'must be at least 1'):
+                call_command('loadtest', stdout=io.StringIO(), **options)
+
+    @override_settings(ANALYTICS_ENABLED=True)
+    def test_in_process_requests(self):
+        article = make_article('Market reopens')
+        loadtest.init_worker(None, 'testserver', False)
+        self.assertFalse(settings.ANALYTICS_ENABLED)
+        kind, status, latency = loadtest.run_one(('detail', 'GET', f'/article/{article.slug}/', ''))
+        self.assertEqual((kind, status), ('detail', 200))
+        self.assertGreater(latency, 0)
+        self.assertEqual(loadtest.run_one(('comment', 'POST', f'/article/{article.slug}/', ''))[1], 302)
+        self.assertTrue(article.comments.filter(email='loadtest@example.com').exists())
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        overrides = override_settings(PROFILING_DIR=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_signed_header_profiles_the_request(self):
+        response = self.client.get('/', HTTP_X_PROFILE=profiling.make_token())
+        self.assertIn('X-Profiled', response)
+        self.assertEqual(len(list((self.root / 'news.home').glob('*.prof'))), 1)
+
+        self.assertNotIn('X-Profiled', self.client.get('/', HTTP_X_PROFILE='profile:forged'))
+        self.assertEqual(len(list(self.root.rglob('*.prof'))), 1)
+
+        out = io.StringIO()
+        call_command('profile_report', view='news.home', stdout=out)
+        self.assertIn('news.home: 1 samples', out.getvalue())
+        self.assertIn('ncalls', out.getvalue())
+
+    def test_prune_removes_the_oldest_dumps(self):
+        for i, size in enumerate((300, 300, 300)):
+            path = self.root / 'news.home' / f'{i}.prof'
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(b'x' * size)
+            os.utime(path, (1000 + i, 1000 + i))
+        profiling.prune(self.root, 700)
+        self.assertEqual(sorted(p.name for p in self.root.rglob('*.prof')), ['1.prof', '2.prof'])
+
+
+class TagStatsTests(TestCase):
+    def setUp(self):
+        self.flood, self.rain, self.cricket = (Tag.objects.create(name=name, slug=name.lower())
+                                               for name in ('Flood', 'Rain', 'Cricket'))
+
+    def stats(self):
+        return {s.tag.name: (s.published_count, round(s.recency_score, 6))
+                for s in TagStat.objects.select_related('tag').filter(published_count__gt=0)}
+
+    def test_signals_keep_stats_equal_to_a_rebuild(self):
+        first = make_article('Canal overflows')
+        second = make_article('Roads closed', published_at=timezone.now() - timedelta(days=30))
+        draft = make_article('Draft story', status='draft')
+        first.tags.add(self.flood, self.rain)
+        second.tags.add(self.flood)
+        self.cricket.articles.add(first, draft)
+        self.assertEqual(self.stats()['Flood'][0], 2)
+
+        draft.status = 'published'
+        draft.save()
+        second.status = 'draft'
+        second.save()
+        first.tags.remove(self.rain)
+        tag_stats.merge_tags(self.cricket, self.flood)
+        signalled = self.stats()
+        self.assertEqual({name: count for name, (count, _) in signalled.items()}, {'Flood': 2})
+
+        tag_stats.rebuild_tag_stats()
+        self.assertEqual(self.stats(), signalled)
+
+    def test_cloud_sizes_follow_counts(self):
+        for i in range(8):
+            make_article(f'Flood update {i}').tags.add(self.flood)
+        make_article('Light rain').tags.add(self.rain)
+        cloud = tag_stats.tag_cloud()
+        self.assertEqual([(item['tag'].name, item['count'], item['size']) for item in cloud],
+                         [('Flood', 8, 5), ('Rain', 1, 1)])
+
+    def test_tag_page_follows_the_cursor(self):
+        now = timezone.now()
+        articles = [make_article(f'Flood update {i}', published_at=now - timedelta(hours=i)) for i in range(15)]
+        self.flood.articles.add(*articles)
+        response = self.client.get(reverse('news:tag', args=['flood']))
+        self.assertEqual(list(response.context['articles']), articles[:12])
+        self.assertEqual(response.context['article_count'], 15)
+
+        response = self.client.get(reverse('news:tag', args=['flood']), {'after': response.context['next_cursor']})
+        self.assertEqual(list(response.context['articles']), articles[12:])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(self.client.get(reverse('news:tag', args=['flood']), {'after': 'x'}).status_code, 404)
+
+
+class SearchCacheTests(TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('IIT  Roorkee'), ('iit', 'roorkee'))
+        self.assertEqual(normalize_query('the IIT in Roorkee, iit'), ('iit', 'roorkee'))
+        self.assertEqual(normalize_query('the'), ('the',))
+        self.assertEqual(normalize_query(' ?! '), ('?!',))
+
+    def test_segmented_lru_protects_repeated_entries(self):
+        lru = SegmentedLRU(capacity=10, protected_share=0.5)
+        lru.set('popular', 'p', 3)
+        self.assertEqual(lru.get('popular'), 'p')  # second use: protected
+        for i in range(5):
+            lru.set(f'once{i}', i, 3)
+        self.assertEqual(lru.get('popular'), 'p')
+        self.assertIsNone(lru.get('once0'))
+        self.assertEqual(lru.get('once4'), 4)
+        self.assertFalse(lru.set('huge', 'h', 6))
+        stats = lru.stats()
+        self.assertLessEqual(stats['size'], 10)
+        self.assertEqual((stats['promotions'], stats['rejected']), (2, 1))
+
+    def test_segmented_lru_expires_entries(self):
+        lru = SegmentedLRU(capacity=10, ttl=60)
+        with mock.patch('news.search_cache.time.monotonic', return_value=1000):
+            lru.set('key', 'value', 1)
+        with mock.patch('news.search_cache.time.monotonic', return_value=1059):
+            self.assertEqual(lru.get('key'), 'value')
+        with mock.patch('news.search_cache.time.monotonic', return_value=1061):
+            self.assertIsNone(lru.get('key'))
+        self.assertEqual(len(lru), 0)
+
+    def test_results_are_dropped_when_an_article_changes(self):
+        cache = SearchCache()
+        flood = make_article('Canal flood warning')
+        cricket = make_article('Cricket final')
+        self.assertEqual(list(cache.results(('flood',), {}).ids), [flood.id])
+        self.assertEqual(list(cache.results(('cricket',), {}).ids), [cricket.id])
+        with self.assertNumQueries(0):
+            cache.results(('flood',), {})
+
+        market = make_article('Flooded market reopens')
+        cache.articles_changed([market.id])
+        # Only the entry whose terms the new article contains
+        self.assertEqual(cache.stats()['invalidated'], 1)
+        with self.assertNumQueries(0):
+            cache.results(('cricket',), {})
+        self.assertEqual(list(cache.results(('flood',), {}).ids), [market.id, flood.id])
+
+        cache.articles_changed([cricket.id])
+        self.assertEqual(cache.stats()['invalidated'], 2)
+        cache.articles_changed()
+        self.assertEqual(len(cache.entries), 0)
+
+
+class BackupTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tmp = Path(directory.name)
+        self.media = self.tmp / 'media'
+        for name, content in (('uploads/a.txt', b'first'), ('uploads/b.txt', b'first'),
+                              ('c.txt', b'second'), ('derivatives/x/320.jpg', b'generated')):
+            (self.media / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.media / name).write_bytes(content)
+
+        self.database = self.tmp / 'live.sqlite3'
+        connection = sqlite3.connect(self.database)
+        with connection:
+            connection.execute('CREATE TABLE django_migrations (app TEXT, name TEXT)')
+            connection.execute("INSERT INTO django_migrations VALUES ('news', '0010_card_summary')")
+        connection.close()
+        # The command backs up the default database; point it at the file above
+        patcher = mock.patch.dict(connections.databases['default'], NAME=str(self.database))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Archive names have one-second resolution
+        now = timezone.now()
+        self.clock = iter([now + timedelta(minutes=i) for i in range(10)])
+
+    def backup(self, **options):
+        with override_settings(MEDIA_ROOT=str(self.media)), \
+                mock.patch('news.management.commands.backup.timezone.now', lambda: next(self.clock)):
+            call_command('backup', output=str(self.tmp / 'backups'), nice=0, sleep=0, stdout=io.StringIO(),
+                         **options)
+        return backups.archives(self.tmp / 'backups')[-1]
+
+    def test_round_trip(self):
+        archive = self.backup()
+        manifest = backups.read_manifest(archive)
+        self.assertEqual(manifest['database']['migrations'], {'news': '0010_card_summary'})
+        self.assertEqual(sorted(manifest['media']), ['c.txt', 'uploads/a.txt', 'uploads/b.txt'])
+        # Equal content is stored once
+        self.assertEqual(len(list((self.tmp / 'backups' / 'objects').glob('??/*'))), 2)
+
+        restored_db, restored_media = self.tmp / 'restored.sqlite3', self.tmp / 'restored'
+        call_command('restore_backup', str(archive), database=str(restored_db), media_root=str(restored_media),
+                     stdout=io.StringIO())
+        connection = sqlite3.connect(restored_db)
+        self.assertEqual(connection.execute('SELECT app, name FROM django_migrations').fetchall(),
+                         [('news', '0010_card_summary')])
+        connection.close()
+        self.assertEqual((restored_media / 'uploads' / 'b.txt').read_bytes(), b'first')
+        self.assertEqual((restored_media / 'c.txt').read_bytes(), b'second')
+        self.assertFalse((restored_media / 'derivatives').exists())
+
+    def test_self_contained_archive(self):
+        archive = self.backup(include_media=True)
+        shutil.rmtree(self.tmp / 'backups' / 'objects')
+        call_command('restore_backup', str(archive), skip_database=True, media_root=str(self.tmp / 'restored'),
+                     stdout=io.StringIO())
+        self.assertEqual((self.tmp / 'restored' / 'c.txt').read_bytes(), b'second')
+
+    def copy_while_writing(self):
+        """Copy the database in slow steps while another connection inserts a row"""
+        source = sqlite3.connect(self.database)
+        with source:
+            source.execute('CREATE TABLE filler (data BLOB)')
+            source.executemany('INSERT INTO filler VALUES (?)', [(b'x' * 3000,)] * 40)
+        target = sqlite3.connect(':memory:')
+        copier = threading.Thread(target=backups.copy_database, args=(self.database, target),
+                                  kwargs={'pages': 1, 'sleep': 0.03})
+        copier.start()
+        time.sleep(0.1)
+        writer = sqlite3.connect(self.database, timeout=1)
+        try:
+            with writer:
+                writer.execute("INSERT INTO django_migrations VALUES ('news', '0011_during_copy')")
+        finally:
+            writer.close()
+            copier.join()
+            source.close()
+        return target
+
+    def test_copy_does_not_block_writers_without_wal(self):
+        with self.assertLogs('news.backups', 'WARNING'):
+            target = self.copy_while_writing()
+        self.assertEqual(target.execute('SELECT count(*) FROM filler').fetchone()[0], 40)
+
+    def test_copy_is_a_snapshot_with_wal(self):
+        connection = sqlite3.connect(self.database)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.close()
+        target = self.copy_while_writing()
+        # The copy is the database as of its start, without the concurrent write
+        self.assertEqual(target.execute('SELECT count(*) FROM django_migrations').fetchone()[0], 1)
+        self.assertEqual(target.execute('SELECT count(*) FROM filler').fetchone()[0], 40)
+
+    def test_prune_keeps_the_newest_archives_and_their_objects(self):
+        first = self.backup()
+        (self.media / 'c.txt').unlink()
+        second = self.backup(keep=1)
+        self.assertEqual(backups.archives(self.tmp / 'backups'), [second])
+        self.assertFalse(backups.manifest_copy(first).exists())
+        self.assertEqual(len(list((self.tmp / 'backups' / 'objects').glob('??/*'))), 1)
+
+
+class ArticleCardTests(TestCase):
+    def test_cards_skip_the_body(self):
+        make_article('Canal flood warning', content='x' * 10000)
+        card = NewsArticle.objects.cards().get()
+        self.assertTrue({'content', 'content_html', 'content_text'} <= card.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(card.category.display_name, 'Local Events')
+            card.get_absolute_url()
+
+    def test_listings_do_not_load_deferred_fields(self):
+        category = make_category()
+        for i in range(12):
+            make_article(f'Story {i}', is_featured=i < 3, is_breaking=i < 2)
+        for url in ('/', reverse('news:category', args=[category.name]), reverse('news:search') + '?q=story'):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            article_queries = [q['sql'] for q in queries if 'FROM "news_newsarticle"' in q['sql']]
+            self.assertLessEqual(len(article_queries), 6, url)
+            self.assertFalse(any('"news_newsarticle"."content_html"' in sql for sql in article_queries), url)
@@ -1,7 +1,7 @@
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from . import views
+from . import views, api, live
 
 app_name = 'news'
 
@@ -9,7 +9,16 @@ urlpatterns = [
     path('', views.home_view, name='home'),
     path('article/<slug:slug>/', views.article_detail_view, name='article_detail'),
     path('category/<str:category_name>/', views.category_view, name='category'),
+    path('location/<path:location>/', views.location_view, name='location'),
+    path('tag/<slug:slug>/', views.tag_view, name='tag'),
     path('search/', views.search_view, name='search'),
+    path('api/articles/', api.articles_api, name='api_articles'),
+    path('api/articles/export.ndjson', api.articles_export, name='api_articles_export'),
+    path('api/promotions/', api.promotions_api, name='api_promotions'),
+    path('api/cache-stats/', api.cache_stats_api, name='api_cache_stats'),
+    path('live/', live.live_stream, name='live'),
+    path('img/<str:digest>/<int:width>/<path:name>', views.image_derivative, name='image_derivative'),
+    path('media/blobs/<str:shard>/<str:filename>', views.media_blob, name='media_blob'),
 ]
 
 
@@ -0,0 +1,146 @@
+"""
+Session-free de-duplication of article views.
+
+A rotating Bloom filter remembers (visitor fingerprint, article id) pairs in
+process memory, so counting a view no longer creates or writes a database
+session. Each worker keeps its own filter; a reader bouncing between workers
+may occasionally be counted twice, which is fine for a view counter.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over bytes keys"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal bit count and number of hash functions for n items at rate p
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def estimated_false_positive_rate(self):
+        """Expected false-positive rate for the items inserted so far"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filters in time slices. A key stays "seen" for at least `window`
+    seconds and at most window + window / (slices - 1).
+    """
+
+    def __init__(self, window=1800, capacity=100_000, error_rate=0.001, slices=3, clock=time.monotonic):
+        if slices < 2:
+            raise ValueError('RotatingBloomFilter needs at least 2 slices')
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.slice_seconds = window / (slices - 1)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._filters = [BloomFilter(capacity, error_rate) for _ in range(slices)]
+        self._rotated_at = clock()
+
+    def _rotate(self):
+        now = self.clock()
+        elapsed = int((now - self._rotated_at) // self.slice_seconds)
+        if elapsed <= 0:
+            return
+        for _ in range(min(elapsed, len(self._filters))):
+            self._filters.pop()
+            self._filters.insert(0, BloomFilter(self.capacity, self.error_rate))
+        self._rotated_at += elapsed * self.slice_seconds
+
+    def __contains__(self, key):
+        with self._lock:
+            self._rotate()
+            return any(key in bloom for bloom in self._filters)
+
+    def check_and_add(self, key):
+        """Return True if key was seen inside the window, otherwise record it"""
+        with self._lock:
+            self._rotate()
+            if any(key in bloom for bloom in self._filters):
+                return True
+            self._filters[0].add(key)
+            return False
+
+    def stats(self):
+        with self._lock:
+            self._rotate()
+            not_fp = 1.0
+            for bloom in self._filters:
+                not_fp *= 1 - bloom.estimated_false_positive_rate()
+            return {
+                'slices': len(self._filters),
+                'items': [bloom.count for bloom in self._filters],
+                'memory_bytes': sum(bloom.memory_bytes for bloom in self._filters),
+                'bits_per_slice': self._filters[0].num_bits,
+                'hash_functions': self._filters[0].num_hashes,
+                'estimated_false_positive_rate': 1 - not_fp,
+            }
+
+
+def visitor_fingerprint(request):
+    """Stable-ish anonymous visitor key built from request headers"""
+    meta = request.META
+    return '|'.join([
+        meta.get('REMOTE_ADDR', ''),
+        meta.get('HTTP_USER_AGENT', ''),
+        meta.get('HTTP_ACCEPT_LANGUAGE', ''),
+    ])
+
+
+def build_filter():
+    return RotatingBloomFilter(
+        window=getattr(settings, 'VIEW_DEDUPE_WINDOW', 1800),
+        capacity=getattr(settings, 'VIEW_DEDUPE_CAPACITY', 100_000),
+        error_rate=getattr(settings, 'VIEW_DEDUPE_ERROR_RATE', 0.001),
+    )
+
+
+_view_filter = None
+_view_filter_lock = threading.Lock()
+
+
+def get_view_filter():
+    global _view_filter
+    if _view_filter is None:
+        with _view_filter_lock:
+            if _view_filter is None:
+                _view_filter = build_filter()
+    return _view_filter
+
+
+def is_repeat_view(request, article_id):
+    """True if this visitor already viewed the article within the window"""
+    key = f'{visitor_fingerprint(request)}:{article_id}'.encode()
+    return get_view_filter().check_and_add(key)
@@ -1,14 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.db.models import Q, F
 from django.core.paginator import Paginator
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, Http404
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
 import logging
-from .models import NewsArticle, Category, Tag, Comment
+from .models import NewsArticle, Category, Tag, Comment, ArchivedArticle
 from .forms import CommentForm
+from .view_tracking import is_repeat_view
+from .images import get_derivative
+from .storage import BLOB_DIR
+from .object_cache import article_cache
+from . import analytics
+from .archive import PUBLIC_STATUSES, search_archive
+from .facets import parse_filters, apply_filters, build_facets, facet_groups, filter_querystring, location_matches
+from .search_cache import search_cache, normalize_query, terms_filter
+from .api import encode_cursor, decode_cursor, ApiError
 
 
 # Logger for debugging
@@ -17,15 +29,16 @@ logger = logging.getLogger(__name__)
 
 def home_view(request):
     """Homepage with featured articles and latest news"""
-    featured_articles = NewsArticle.objects.filter(
+    # Cards only: never load article bodies for listings
+    featured_articles = NewsArticle.objects.cards().filter(
         status='published', is_featured=True
     )[:3]
     
-    breaking_news = NewsArticle.objects.filter(
+    breaking_news = NewsArticle.objects.cards().filter(
         status='published', is_breaking=True
     ).first()
     
-    latest_articles = NewsArticle.objects.filter(
+    latest_articles = NewsArticle.objects.cards().filter(
         status='published'
     ).exclude(is_featured=True)[:6]
     
@@ -44,20 +57,20 @@ def home_view(request):
 def article_detail_view(request, slug):
     """Individual article view with comment functionality"""
     
-    # Get article with related data
-    article = get_object_or_404(
-        NewsArticle.objects.select_related('category', 'author').prefetch_related('tags'),
-        slug=slug,
-        status='published'
-    )
+    # Get article with related data (cached snapshot, see object_cache.py)
+    article = article_cache.get_published(slug)
+    if article is None:
+        # Old URLs keep working after an article moved to the archive
+        return archived_article_view(request, slug)
     
-    # Increment view count (session-based to prevent abuse)
-    session_key = f'viewed_article_{article.id}'
-    if not request.session.get(session_key, False):
-        article.views_count += 1
-        article.save(update_fields=['views_count'])
-        request.session[session_key] = True
-        request.session.set_expiry(1800)  # 30 minutes
+    # Increment view count once per visitor per 30 minutes (no session needed).
+    # The count is not in the cached snapshot, so read it from the primary
+    counter = NewsArticle.objects.using('default').filter(pk=article.pk)
+    if not is_repeat_view(request, article.id):
+        counter.update(views_count=F('views_count') + 1)
+    article.views_count = counter.values_list('views_count', flat=True).first() or 0
+    if request.method == 'GET':
+        analytics.record_article_event(analytics.VIEW, article)
     
     # Initialize comment form
     comment_form = CommentForm()
@@ -78,6 +91,7 @@ def article_detail_view(request, slug):
                 
                 # Save to database
                 new_comment.save()
+                analytics.record_article_event(analytics.COMMENT, article)
                 
                 # Success message
                 messages.success(
@@ -109,7 +123,7 @@ def article_detail_view(request, slug):
     comments_count = comments.count()
     
     # Get related articles
-    related_articles = NewsArticle.objects.filter(
+    related_articles = NewsArticle.objects.cards().filter(
         category=article.category,
         status='published'
     ).exclude(id=article.id).order_by('-published_at')[:3]
@@ -126,14 +140,41 @@ def article_detail_view(request, slug):
     return render(request, 'news/article_detail.html', context)
 
 
+def archived_article_view(request, slug):
+    """Read-only page for an archived article; comments are closed"""
+    article = get_object_or_404(
+        ArchivedArticle.objects.select_related('category', 'author').prefetch_related('tags'),
+        slug=slug,
+        status__in=PUBLIC_STATUSES
+    )
+    
+    comments = article.comments.filter(is_approved=True).order_by('-created_at')
+    
+    related_articles = NewsArticle.objects.cards().filter(
+        category=article.category,
+        status='published'
+    ).order_by('-published_at')[:3]
+    
+    context = {
+        'article': article,
+        'related_articles': related_articles,
+        'comments': comments,
+        'comment_form': None,
+        'comments_count': comments.count(),
+    }
+    return render(request, 'news/article_detail.html', context)
+
+
 def category_view(request, category_name):
-    """Articles by category"""
+    """Articles by category, with tag/location/month facets"""
     category = get_object_or_404(Category, name=category_name, is_active=True)
+    filters = parse_filters(request, exclude=('category',))
     
-    articles_list = NewsArticle.objects.filter(
+    category_articles = NewsArticle.objects.cards().filter(
         category=category,
         status='published'
     )
+    articles_list = apply_filters(category_articles, filters)
     
     paginator = Paginator(articles_list, 12)
     page_number = request.GET.get('page')
@@ -142,33 +183,97 @@ def category_view(request, category_name):
     context = {
         'category': category,
         'articles': articles,
+        'filters': filters,
+        'facets': build_facets(category_articles, filters, exclude=('category',)),
+        'filter_query': filter_querystring(filters),
+        'clear_query': '',
     }
     return render(request, 'news/category.html', context)
 
 
+def location_view(request, location):
+    """Landing page for one area of Roorkee, with category/tag/month facets"""
+    filters = parse_filters(request, exclude=('location',))
+    location_articles = NewsArticle.objects.filter(location_matches([location]), status='published')
+    
+    articles_list = apply_filters(location_articles, filters).cards()
+    
+    paginator = Paginator(articles_list, 12)
+    articles = paginator.get_page(request.GET.get('page'))
+    if not filters and not paginator.count:
+        raise Http404("No articles for this location")
+    
+    context = {
+        'location': location,
+        'articles': articles,
+        'filters': filters,
+        'facets': build_facets(location_articles, filters, exclude=('location',)),
+        'filter_query': filter_querystring(filters),
+        'clear_query': '',
+    }
+    return render(request, 'news/location.html', context)
+
+
+TAG_PAGE_SIZE = 12
+
+
+def tag_view(request, slug):
+    """Articles with a tag, newest first, paged by a (published_at, id) cursor"""
+    tag = get_object_or_404(Tag.objects.select_related('stat'), slug=slug)
+    articles = (tag.articles.filter(status='published', published_at__isnull=False)
+                .cards()
+                .order_by('-published_at', '-id'))
+    
+    cursor = request.GET.get('after')
+    if cursor:
+        try:
+            published_at, pk = decode_cursor(cursor)
+        except ApiError:
+            raise Http404("Invalid page")
+        articles = articles.filter(Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=pk))
+    
+    # One extra row tells whether there is a next page, without a COUNT
+    page = list(articles[:TAG_PAGE_SIZE + 1])
+    next_cursor = encode_cursor(page[TAG_PAGE_SIZE - 1], 'published_at') if len(page) > TAG_PAGE_SIZE else None
+    
+    context = {
+        'tag': tag,
+        'articles': page[:TAG_PAGE_SIZE],
+        'article_count': getattr(getattr(tag, 'stat', None), 'published_count', None),
+        'is_first_page': not cursor,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'news/tag.html', context)
+
+
 def search_view(request):
     """Enhanced search functionality"""
     query = request.GET.get('q', '').strip()
+    include_archive = request.GET.get('archive') == '1'
+    filters = parse_filters(request)
     articles = []
+    archived_articles = []
     suggestions = []
+    facets = []
     
     if query:
-        # Search in title, content, excerpt, and subtitle
-        articles_list = NewsArticle.objects.filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query) |
-            Q(excerpt__icontains=query) |
-            Q(subtitle__icontains=query),
-            status='published'
-        ).select_related('category', 'author').order_by('-published_at', '-created_at')
+        # Popular queries are answered from the per-process search cache
+        terms = normalize_query(query)
+        result = search_cache.results(terms, filters)
+        facets = facet_groups(result.counts, result.labels, filters,
+                              q=query, archive='1' if include_archive else '')
+        
+        # Archived articles are only searched on request, with their own pages
+        if include_archive:
+            archived_articles = Paginator(search_archive(terms_filter(terms)), 10).get_page(request.GET.get('apage'))
         
         # Get search suggestions for empty results
-        if not articles_list.exists():
+        if not result.ids:
             suggestions = NewsArticle.objects.filter(
                 status='published'
             ).values_list('title', flat=True)[:5]
         
-        paginator = Paginator(articles_list, 10)
+        paginator = Paginator(result.ids, 10)
         page_number = request.GET.get('page')
         
         try:
@@ -177,10 +282,48 @@ def search_view(request):
             articles = paginator.page(1)
         except EmptyPage:
             articles = paginator.page(paginator.num_pages)
+        articles.object_list = search_cache.hydrate(articles.object_list)
+        
+        analytics.record(
+            analytics.SEARCH if paginator.count else analytics.ZERO_RESULT_SEARCH,
+            q=query[:200], n=paginator.count
+        )
     
     context = {
         'articles': articles,
         'query': query,
         'suggestions': suggestions,
+        'include_archive': include_archive,
+        'archived_articles': archived_articles,
+        'filters': filters,
+        'facets': facets,
+        'filter_query': filter_querystring(filters),
+        'clear_query': filter_querystring({}, q=query, archive='1' if include_archive else ''),
     }
-    return render(request, 'news/search.html', context)
\ No newline at end of file
+    return render(request, 'news/search.html', context)
+
+
+def image_derivative(request, digest, width, name):
+    """Resized copy of an uploaded image, generated on first request"""
+    try:
+        path = get_derivative(name, digest, width)
+    except (SuspiciousFileOperation, OSError):
+        path = None
+    if path is None:
+        raise Http404("Image not found")
+
+    response = FileResponse(open(path, 'rb'))
+    # The URL embeds the content hash of the original, so it never changes
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
+
+
+def media_blob(request, shard, filename):
+    """Content-addressed upload; the name is the SHA-256 of the content, so it never changes"""
+    name = f'{BLOB_DIR}/{shard}/{filename}'
+    if not filename.startswith(shard) or not default_storage.exists(name):
+        raise Http404("File not found")
+    
+    response = FileResponse(default_storage.open(name, 'rb'))
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
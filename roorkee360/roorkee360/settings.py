@@ -44,21 +44,37 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'news.profiling.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'news.middleware.InvalidationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'news.middleware.ReadReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 
-# Session settings (for view count tracking)
+# Sampling profiler (news/profiling.py). Requests with a valid signed
+# X-Profile header (`manage.py profile_report --token`) are always profiled.
+PROFILING_SAMPLE_RATE = 0.0  # e.g. 0.001 to profile 1 in 1000 requests
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_BYTES = 50 * 1024 * 1024
+
+
+# Session settings
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = False
 
+# View count de-duplication (news/view_tracking.py): in-memory rotating
+# Bloom filter, one per worker, instead of a session row per reader
+VIEW_DEDUPE_WINDOW = 1800  # 30 minutes
+VIEW_DEDUPE_CAPACITY = 100_000  # views per time slice
+VIEW_DEDUPE_ERROR_RATE = 0.001
+
 
 ROOT_URLCONF = 'roorkee360.urls'
 
@@ -84,13 +100,104 @@ WSGI_APPLICATION = 'roorkee360.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection-level SQLite tuning: trades a little durability/memory for fewer
+# disk round-trips. WAL (readers alongside a writer) is stored in the database
+# file, so it is a deployment step rather than a connection setting:
+#   python manage.py enable_wal
+# A WAL database keeps db.sqlite3-wal/-shm files next to it (git-ignored);
+# `enable_wal --disable` folds them back before the file is copied elsewhere.
+SQLITE_PRAGMAS = ';'.join([
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-20000',       # ~20 MB page cache per connection
+    'PRAGMA mmap_size=134217728',     # 128 MB memory-mapped I/O
+    'PRAGMA temp_store=MEMORY',
+])
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,          # reuse connections between requests
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,            # busy timeout (seconds) instead of "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS,
+        },
+    },
+    # Example read replica, refreshed with `python manage.py refresh_replica`:
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.sqlite3',
+    #     'NAME': BASE_DIR / 'db_replica.sqlite3',
+    #     'CONN_MAX_AGE': 600,
+    #     'OPTIONS': {'init_command': SQLITE_PRAGMAS + ';PRAGMA query_only=ON'},
+    #     'TEST': {'MIRROR': 'default'},
+    # },
+}
+
+# Read/write splitting (see news/routers.py). Public GET views in news.views
+# read from one of these aliases; writes and admin always use 'default'.
+DATABASE_ROUTERS = ['news.routers.ReadReplicaRouter']
+DATABASE_READ_REPLICAS = []  # e.g. ['replica']
+READ_REPLICA_PIN_SECONDS = 15  # read-your-writes window after a POST
+
+# Online backups of the database and MEDIA_ROOT (news/backups.py):
+# `manage.py backup` from cron, `manage.py restore_backup latest` to restore
+BACKUP_DIR = BASE_DIR / 'backups'
+BACKUP_KEEP = 14  # archives; media content no archive refers to is removed
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (Redis/Memcached) in production so all workers see the
+# same article snapshots and invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'roorkee360',
     }
 }
 
+# Two-tier article cache for the detail page (news/object_cache.py)
+ARTICLE_CACHE_ALIAS = 'default'
+ARTICLE_CACHE_TIMEOUT = 3600  # shared tier, seconds
+ARTICLE_CACHE_L1_SIZE = 512  # per-process LRU entries
+ARTICLE_CACHE_L1_TTL = 30  # per-process staleness bound without the invalidation bus, seconds
+
+# Per-process search result cache (news/search_cache.py)
+SEARCH_CACHE_MAX_IDS = 100000  # article ids kept over all cached queries (8 bytes each)
+SEARCH_CACHE_PROTECTED_SHARE = 0.8  # room for queries hit more than once
+SEARCH_CACHE_TTL = 300  # staleness bound without the invalidation bus, seconds
+
+# Tag cloud weights (news/tag_stats.py); rebuild with `manage.py rebuild_tag_stats`
+# after changing the half life
+TAG_CLOUD_BY_RECENCY = False  # rank by recent activity instead of total articles
+TAG_RECENCY_HALF_LIFE_DAYS = 30
+
+# Store promotions (news/promotions.py)
+PROMOTIONS_INDEX_TTL = 60  # seconds; fallback refresh, edits reach workers over the invalidation bus
+PROMOTIONS_IMPRESSION_FLUSH_SECONDS = 30
+PROMOTIONS_IMPRESSION_FLUSH_COUNT = 500
+
+# Live updates over Server-Sent Events (news/live.py); served by asgi.py only
+LIVE_HEARTBEAT_SECONDS = 25
+LIVE_QUEUE_SIZE = 32  # per client; the oldest message is dropped when full
+LIVE_MAX_SUBSCRIBERS = 10000  # per process
+LIVE_BUS_POLL_SECONDS = 0.5  # how often a worker with clients reads other workers' events
+
+# Near-duplicate flags in the article admin (news/near_duplicates.py);
+# re-flag existing articles with `manage.py find_near_duplicates`
+NEAR_DUPLICATE_THRESHOLD = 0.8  # estimated share of shared 4-word shingles
+
+
+# Cross-worker invalidation of in-process caches (news/invalidation.py).
+# A memory-mapped file shared by the workers on this host; None disables it
+# (caches then rely on their TTLs).
+INVALIDATION_BUS_PATH = str(BASE_DIR / 'run' / 'invalidation.bus')
+INVALIDATION_BUS_SLOTS = 4096  # events kept; a worker further behind drops everything
+INVALIDATION_BUS_MAX_IDS = 64  # per topic per transaction before sending "everything"
+CATEGORIES_CACHE_TTL = 300  # navigation categories, seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,6 +241,31 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Article body format: 'text' (paragraphs from line breaks) or 'markdown'
+# (requires the `markdown` package). Rendered once on save, see news/rendering.py
+NEWS_CONTENT_FORMAT = 'text'
+
+# Append-only analytics event log (news/analytics.py); roll segments up with
+# `python manage.py aggregate_analytics` from cron
+ANALYTICS_ENABLED = True
+ANALYTICS_DIR = BASE_DIR / 'analytics'
+ANALYTICS_SEGMENT_BYTES = 64 * 1024 * 1024
+ANALYTICS_FLUSH_INTERVAL = 2.0  # seconds
+
+# Widths generated on demand by the {% responsive_image %} tag (news/images.py)
+IMAGE_DERIVATIVE_WIDTHS = (320, 480, 640, 960, 1200)
+
+
+# Uploads are stored once per unique content under MEDIA_ROOT/blobs/ with a
+# reference count (news/storage.py); `manage.py dedupe_media` converts old files
+STORAGES = {
+    'default': {
+        'BACKEND': 'news.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 # For production, consider using:
 # DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'